@@ -1,59 +1,78 @@
+import json
+
 from django.contrib import admin, messages
-from .models import Payment, PaymentHistory
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+
+from core.admin_utils import LargeTableAdminMixin
+from .refunds import enqueue_batch
+from .models import (
+    AddressLedger,
+    DocumentJob,
+    GeneratedDocument,
+    Payment,
+    PaymentHistory,
+    PaymentPayload,
+    RefundBatch,
+    RefundBatchItem,
+    StripeWebhookEvent,
+)
 
 # Register your models here.
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("user", "amount_display",
                     "currency", "status", "created_at")
     list_filter = ("status", "currency", "created_at")
+    list_select_related = ("user",)
     search_fields = ("user__username", "stripe_payment_intent_id")
     ordering = ("-created_at",)
     actions = ["issue_refund"]
 
     @admin.action(description="Issue Stripe refund for selected payments")
     def issue_refund(self, request, queryset):
-        success = 0
-        fail = 0
-        for payment in queryset:
-            try:
-                if payment.status == "succeeded":
-                    payment.refund()
-                    success += 1
-                else:
-                    fail += 1
-            except Exception as e:
-                self.message_user(
-                    request, f"Refund failed for {payment}: {e}",
-                    level=messages.ERROR)
-                fail += 1
-
-        if success:
-            self.message_user(
-                request, f"✅ {success} refund(s) completed successfully.",
-                level=messages.SUCCESS)
-        if fail:
-            self.message_user(
-                request, f"⚠️ {fail} refund(s) could not be processed.",
-                level=messages.WARNING)
+        # Refunds run in the background (process_refund_batches); this
+        # request only records the batch.
+        batch = enqueue_batch(queryset, requested_by=request.user)
+        self.message_user(
+            request,
+            format_html(
+                "Refund batch #{} queued for {} payment(s) "
+                "({} skipped). <a href=\"{}\">View progress</a>",
+                batch.pk,
+                batch.total,
+                batch.skipped,
+                reverse("billing:refund_batch_progress", args=[batch.pk]),
+            ),
+            level=messages.SUCCESS,
+        )
 
 
 @admin.register(PaymentHistory)
-class PaymentHistoryAdmin(admin.ModelAdmin):
+class PaymentHistoryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = (
         "id",
         "user",
         "amount",
         "currency",
         "status",
+        "chain_summary",
         "created_at",
     )
     list_filter = ("status", "created_at")
-    search_fields = ("user__username", "stripe_payment_id", "service_address")
-    date_hierarchy = "created_at"
-    readonly_fields = ("created_at",)
+    list_select_related = ("user",)
+    search_fields = (
+        "user__username",
+        "stripe_payment_id",
+        "stripe_refund_id",
+        "service_address",
+    )
+    readonly_fields = ("created_at", "raw_payload")
 
     fieldsets = (
         ("Transaction Info", {
@@ -66,15 +85,147 @@ class PaymentHistoryAdmin(admin.ModelAdmin):
             )
         }),
         ("Stripe / Metadata", {
-            "fields": ("stripe_payment_id", "raw_data"),
+            "fields": ("stripe_payment_id", "stripe_refund_id",
+                       "raw_payload"),
         }),
         ("Timestamps", {
             "fields": ("created_at",),
         }),
     )
 
+    def get_queryset(self, request):
+        # Chain totals live on the root row; a child reads its parent's.
+        # One join instead of a parent lookup per row.
+        return super().get_queryset(request).annotate(
+            chain_original=Coalesce(F("parent__amount"), F("amount")),
+            chain_added=Coalesce(
+                F("parent__added_total_amt"), F("added_total_amt")),
+            chain_cancelled=Coalesce(
+                F("parent__cancelled_total_amt"), F("cancelled_total_amt")),
+            chain_net=Coalesce(
+                F("parent__net_total_amt"), F("net_total_amt")),
+        )
+
+    @admin.display(description="Chain Totals", ordering="chain_net")
+    def chain_summary(self, obj):
+        return (
+            f"Orig: ${obj.chain_original:.2f} | +${obj.chain_added:.2f} | "
+            f"{obj.chain_cancelled:.2f} | Net: ${obj.chain_net:.2f}"
+        )
+
+    @admin.display(description="Raw payload")
+    def raw_payload(self, obj):
+        # Only the change view shows this field, so the side table is
+        # read for one row at a time and never for the changelist.
+        payload = PaymentPayload.objects.filter(payment=obj).first()
+        if payload is None:
+            return "—"
+        return format_html(
+            "<pre style=\"white-space: pre-wrap\">{}</pre>",
+            json.dumps(payload.decoded(), indent=2, default=str),
+        )
+
+
+@admin.register(AddressLedger)
+class AddressLedgerAdmin(admin.ModelAdmin):
+    list_display = (
+        "user",
+        "address",
+        "paid_total",
+        "refund_total",
+        "net_total",
+        "active_bookings",
+        "cancelled_bookings",
+        "last_activity_at",
+    )
+    list_select_related = ("user",)
+    search_fields = ("user__username", "address")
+    readonly_fields = [f.name for f in AddressLedger._meta.fields]
+
+
+@admin.register(StripeWebhookEvent)
+class StripeWebhookEventAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = (
+        "event_id",
+        "event_type",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "stripe_created",
+        "processed_at",
+    )
+    list_filter = ("status", "event_type")
+    search_fields = ("event_id",)
+    readonly_fields = [f.name for f in StripeWebhookEvent._meta.fields]
+    actions = ["requeue"]
+
+    def get_queryset(self, request):
+        # Payloads are only needed on the change page, which loads the
+        # one it shows on access.
+        return super().get_queryset(request).defer("payload")
+
+    @admin.action(description="Requeue selected events for processing")
+    def requeue(self, request, queryset):
+        count = queryset.exclude(
+            status=StripeWebhookEvent.Status.PENDING
+        ).update(
+            status=StripeWebhookEvent.Status.PENDING,
+            attempts=0,
+            last_error="",
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"{count} event(s) requeued.")
+
+
+@admin.register(GeneratedDocument)
+class GeneratedDocumentAdmin(admin.ModelAdmin):
+    list_display = ("key", "kind", "user", "size", "created_at")
+    list_filter = ("kind",)
+    list_select_related = ("user",)
+    search_fields = ("key", "user__username")
+    exclude = ("content",)
+    readonly_fields = ("kind", "key", "user", "etag", "size", "created_at")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("content")
+
+
+@admin.register(DocumentJob)
+class DocumentJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "user", "status", "attempt", "created_at",
+                    "finished_at")
+    list_filter = ("kind", "status")
+    list_select_related = ("user",)
+    search_fields = ("key", "user__username")
+    readonly_fields = [f.name for f in DocumentJob._meta.fields]
+
+
+class RefundBatchItemInline(admin.TabularInline):
+    model = RefundBatchItem
+    extra = 0
+    can_delete = False
+    fields = ("payment", "status", "refund_id", "message", "processed_at")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("payment__user")
+
+
+@admin.register(RefundBatch)
+class RefundBatchAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "total", "succeeded", "failed",
+                    "skipped", "requested_by", "created_at", "progress")
+    list_filter = ("status",)
+    list_select_related = ("requested_by",)
+    readonly_fields = [f.name for f in RefundBatch._meta.fields]
+    inlines = [RefundBatchItemInline]
 
-@admin.display(description="Chain Totals")
-def chain_summary(obj):
-    o, a, c, n = obj.compute_sections()
-    return f"Orig: ${o:.2f} | +${a:.2f} | {c:.2f} | Net: ${n:.2f}"
+    @admin.display(description="Progress")
+    def progress(self, obj):
+        return format_html(
+            "<a href=\"{}\">View</a>",
+            reverse("billing:refund_batch_progress", args=[obj.pk]),
+        )
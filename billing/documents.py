@@ -0,0 +1,326 @@
+"""
+billing/documents.py
+Stored PDF documents and how they are served.
+
+Rendering a reportlab document is the expensive part of a download, so
+the bytes are kept in GeneratedDocument under a key that changes
+whenever the content would (e.g. root payment id + chain_version).
+Repeat downloads are served from the stored bytes with an ETag, so
+browsers revalidate with a 304, and single byte ranges are supported for
+resumable downloads.
+
+Yearly summaries for customers with many payment chains are rendered by
+`manage.py process_document_jobs` from a DocumentJob instead of inside
+the request; the browser polls until the document is stored.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum, Window
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+
+from .models import DocumentJob, GeneratedDocument, PaymentHistory
+from .pdfs import build_yearly_summary_pdf
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# A running job that hasn't been touched for this long is assumed to
+# belong to a dead worker and may be claimed again.
+STALE_JOB_MINUTES = 15
+
+# A failed document is queued again up to MAX_JOB_ATTEMPTS times, waiting
+# JOB_RETRY_SECONDS * 2**(attempt - 1) after each failure. Once the
+# attempts are used up, a new request after JOB_RETRY_RESET_MINUTES
+# starts over at attempt 1.
+MAX_JOB_ATTEMPTS = 3
+JOB_RETRY_SECONDS = 30
+JOB_RETRY_RESET_MINUTES = 60
+
+
+def get_or_build(kind, key, user, build, *, stale_prefix=None):
+    """
+    Return the stored document for `key`, rendering it with `build()`
+    (which returns bytes) on a miss. Older documents whose key starts
+    with `stale_prefix` are dropped when a new version is stored.
+    The content column is deferred until the response needs it.
+    """
+    doc = GeneratedDocument.objects.defer("content").filter(key=key).first()
+    if doc is not None:
+        return doc
+
+    content = build()
+    with transaction.atomic():
+        if stale_prefix:
+            GeneratedDocument.objects.filter(
+                user=user, kind=kind, key__startswith=stale_prefix,
+            ).exclude(key=key).delete()
+        doc, _ = GeneratedDocument.objects.get_or_create(
+            key=key,
+            defaults={
+                "kind": kind,
+                "user": user,
+                "content": content,
+                "etag": hashlib.sha256(content).hexdigest(),
+                "size": len(content),
+            },
+        )
+    return doc
+
+
+# _byte_range() result for a single range no byte of the body falls in.
+UNSATISFIABLE = "unsatisfiable"
+
+
+def _byte_range(header, size):
+    """
+    (start, end) inclusive for a single 'bytes=' range; UNSATISFIABLE if
+    it lies entirely past the end; None for anything else (malformed or
+    multiple ranges), which the caller ignores and answers with 200.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            return UNSATISFIABLE
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start > end:
+        return None
+    if start >= size:
+        return UNSATISFIABLE
+    return start, min(end, size - 1)
+
+
+def document_response(request, doc, filename, content_type="application/pdf"):
+    """
+    Serve a stored document honouring If-None-Match, Range and If-Range.
+    Only single byte ranges are served; other Range headers get the
+    full body.
+    """
+    etag = quote_etag(doc.etag)
+
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match:
+        tags = parse_etags(if_none_match)
+        if "*" in tags or etag in tags:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+    content = bytes(doc.content)
+    size = len(content)
+
+    range_header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _byte_range(range_header, size)
+    else:
+        byte_range = None
+
+    if byte_range == UNSATISFIABLE:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    if byte_range is not None:
+        start, end = byte_range
+        response = HttpResponse(
+            content[start:end + 1], status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        # No Range, a stale If-Range, or a Range we don't serve (several
+        # ranges, bad syntax): RFC 9110 lets us ignore it and send it all.
+        response = HttpResponse(content, content_type=content_type)
+
+    response["ETag"] = etag
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = "private, no-cache"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ---------------------------------------------------------
+# Yearly summaries
+# ---------------------------------------------------------
+def _yearly_roots(user, year, address=""):
+    roots = PaymentHistory.objects.filter(
+        user=user,
+        parent__isnull=True,
+        created_at__year=year,
+    )
+    if address:
+        roots = roots.filter(service_address__iexact=address)
+    return roots
+
+
+def yearly_summary_key(user, year, address=""):
+    """
+    Return (key, stale_prefix, chain_count) for a yearly summary.
+    The key fingerprints the chains it covers: a new or deleted chain
+    changes the count / last id, and any adjustment bumps a root's
+    chain_version and therefore the version sum.
+    """
+    stats = _yearly_roots(user, year, address).aggregate(
+        chains=Count("id"),
+        versions=Sum("chain_version"),
+        last_id=Max("id"),
+    )
+    scope = (
+        hashlib.sha256(address.strip().lower().encode()).hexdigest()[:12]
+        if address else "all"
+    )
+    prefix = f"yearly:{user.pk}:{year}:{scope}:"
+    fingerprint = (
+        f"{stats['chains']}-{stats['versions'] or 0}-{stats['last_id'] or 0}")
+    return f"{prefix}{fingerprint}", prefix, stats["chains"]
+
+
+def yearly_summary_rows(user, year, address=""):
+    """
+    Every root chain for the year with its maintained totals, plus the
+    per-address and grand net totals, in a single windowed query.
+    """
+    return list(
+        _yearly_roots(user, year, address)
+        .annotate(
+            address_total=Window(
+                Sum("net_total_amt"), partition_by=[F("service_address")]),
+            grand_total=Window(Sum("net_total_amt")),
+        )
+        .order_by("service_address", "-created_at")
+        .values(
+            "id",
+            "service_address",
+            "created_at",
+            "amount",
+            "added_total_amt",
+            "cancelled_total_amt",
+            "net_total_amt",
+            "address_total",
+            "grand_total",
+        )
+    )
+
+
+def build_yearly_summary(user, year, address, key, stale_prefix):
+    return get_or_build(
+        GeneratedDocument.Kind.YEARLY_SUMMARY,
+        key,
+        user,
+        lambda: build_yearly_summary_pdf(
+            user.username, year, yearly_summary_rows(user, year, address)),
+        stale_prefix=stale_prefix,
+    )
+
+
+# ---------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------
+def enqueue_job(user, kind, key, params):
+    """
+    Queue a document for the worker. A queued or running job for the
+    same key is returned instead of starting a second one.
+
+    If the last job for the key failed, a retry is queued with backoff.
+    When the attempts are used up, the failed job itself is returned
+    (created=False) until the reset window has passed.
+    """
+    with transaction.atomic():
+        last = (
+            DocumentJob.objects.select_for_update()
+            .filter(key=key)
+            .order_by("-created_at")
+            .first()
+        )
+        if last is not None and last.status in (DocumentJob.Status.QUEUED,
+                                                DocumentJob.Status.RUNNING):
+            return last, False
+
+        attempt = 1
+        run_after = timezone.now()
+        if last is not None and last.status == DocumentJob.Status.FAILED:
+            failed_at = last.finished_at or last.updated_at
+            reset = failed_at + timedelta(minutes=JOB_RETRY_RESET_MINUTES)
+            if run_after < reset:
+                if last.attempt >= MAX_JOB_ATTEMPTS:
+                    return last, False
+                attempt = last.attempt + 1
+                run_after = max(run_after, failed_at + timedelta(
+                    seconds=JOB_RETRY_SECONDS * 2 ** (last.attempt - 1)))
+
+        job = DocumentJob.objects.create(
+            kind=kind, key=key, params=params, user=user,
+            attempt=attempt, run_after=run_after)
+    return job, True
+
+
+def claim_job():
+    """
+    Claim the oldest due queued job (or a stale running one) for this
+    worker. Uses SKIP LOCKED where supported so workers never share a job.
+    """
+    now = timezone.now()
+    stale = now - timedelta(minutes=STALE_JOB_MINUTES)
+    claimable = Q(status=DocumentJob.Status.QUEUED, run_after__lte=now) | Q(
+        status=DocumentJob.Status.RUNNING, updated_at__lt=stale
+    )
+
+    with transaction.atomic():
+        job = (
+            DocumentJob.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = DocumentJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at", "updated_at"])
+    return job
+
+
+def _run_yearly_summary(job):
+    params = job.params
+    build_yearly_summary(
+        job.user,
+        params["year"],
+        params.get("address", ""),
+        job.key,
+        params["stale_prefix"],
+    )
+
+
+JOB_RUNNERS = {
+    GeneratedDocument.Kind.YEARLY_SUMMARY: _run_yearly_summary,
+}
+
+
+def execute_job(job):
+    """Render the job's document and record the outcome on the job."""
+    try:
+        JOB_RUNNERS[job.kind](job)
+    except Exception as e:
+        job.status = DocumentJob.Status.FAILED
+        job.error = str(e)[:2000]
+        job.finished_at = timezone.now()
+        job.save(update_fields=[
+            "status", "error", "finished_at", "updated_at"])
+        raise
+
+    job.status = DocumentJob.Status.COMPLETED
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at", "updated_at"])
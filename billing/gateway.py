@@ -0,0 +1,238 @@
+"""
+billing/gateway.py
+Single entry point for outbound Stripe API calls.
+
+- One pooled `requests` session is shared by every call in the process.
+- Transient failures (network errors, 429s, 5xx) are retried a bounded
+  number of times with exponential backoff and full jitter.
+- Writes carry deterministic idempotency keys derived from the cart,
+  booking or payment they belong to, so a retried or double-submitted
+  request never charges or refunds twice.
+- Every call is timed; `metrics()` returns per-operation counters and
+  slow calls are logged.
+- `STRIPE_API_BASE` points the client at stripe-mock for local tests
+  and benchmarks (e.g. http://localhost:12111).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from stripe.http_client import RequestsClient
+
+logger = logging.getLogger(__name__)
+
+# Backoff between retries: min(cap, base * 2**attempt) with full jitter.
+RETRY_BASE_SECONDS = 0.25
+RETRY_CAP_SECONDS = 4.0
+SLOW_CALL_MS = 2000
+
+_configure_lock = threading.Lock()
+_configured = False
+
+_metrics_lock = threading.Lock()
+_metrics = defaultdict(
+    lambda: {"calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0,
+             "max_ms": 0.0}
+)
+
+
+def _configure():
+    """Install the shared HTTP client and API settings once per process."""
+    global _configured
+    if _configured:
+        return
+    with _configure_lock:
+        if _configured:
+            return
+
+        pool_size = getattr(settings, "STRIPE_HTTP_POOL_SIZE", 10)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        stripe.default_http_client = RequestsClient(
+            timeout=getattr(settings, "STRIPE_TIMEOUT", 30),
+            session=session,
+        )
+        # Retries are handled here, with our own idempotency keys.
+        stripe.max_network_retries = 0
+
+        api_base = getattr(settings, "STRIPE_API_BASE", "")
+        if api_base:
+            stripe.api_base = api_base.rstrip("/")
+
+        _configured = True
+
+
+def _is_retryable(exc) -> bool:
+    if isinstance(exc, (stripe.error.APIConnectionError,
+                        stripe.error.RateLimitError)):
+        return True
+    if isinstance(exc, stripe.error.APIError):
+        return (exc.http_status or 500) >= 500
+    return False
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(
+        0, min(RETRY_CAP_SECONDS, RETRY_BASE_SECONDS * (2 ** attempt)))
+
+
+def _record(operation, elapsed_ms, *, retries, error):
+    with _metrics_lock:
+        m = _metrics[operation]
+        m["calls"] += 1
+        m["retries"] += retries
+        m["errors"] += int(error)
+        m["total_ms"] += elapsed_ms
+        m["max_ms"] = max(m["max_ms"], elapsed_ms)
+
+    if elapsed_ms >= SLOW_CALL_MS:
+        logger.warning("Stripe %s took %.0f ms (%s retries)",
+                       operation, elapsed_ms, retries)
+
+
+def _call(operation, func, **params):
+    """Run one Stripe call with pooling, bounded retries and timing."""
+    _configure()
+    max_retries = getattr(settings, "STRIPE_MAX_RETRIES", 2)
+
+    started = time.monotonic()
+    attempt = 0
+    try:
+        while True:
+            try:
+                result = func(**params)
+            except stripe.error.StripeError as e:
+                if attempt >= max_retries or not _is_retryable(e):
+                    raise
+                delay = _backoff(attempt)
+                attempt += 1
+                logger.info("Stripe %s failed (%s); retry %s in %.2fs",
+                            operation, e.__class__.__name__, attempt, delay)
+                time.sleep(delay)
+                continue
+            _record(operation, (time.monotonic() - started) * 1000,
+                    retries=attempt, error=False)
+            return result
+    except Exception:
+        _record(operation, (time.monotonic() - started) * 1000,
+                retries=attempt, error=True)
+        raise
+
+
+def metrics() -> dict:
+    """Per-operation call counts, retries, errors and latency (ms)."""
+    with _metrics_lock:
+        out = {}
+        for operation, m in _metrics.items():
+            avg = m["total_ms"] / m["calls"] if m["calls"] else 0.0
+            out[operation] = {**m, "avg_ms": round(avg, 1)}
+        return out
+
+
+def to_cents(amount) -> int:
+    return int(round(amount * 100))
+
+
+# ---------------------------------------------------------
+# Idempotency keys
+# ---------------------------------------------------------
+def checkout_key(cart, params) -> str:
+    """
+    Derived from the exact Checkout Session params (line items, metadata,
+    customer email, ...): a resubmit reuses the session, while any change
+    gets a new key instead of an IdempotencyError from Stripe.
+    """
+    canonical = json.dumps(
+        params, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(canonical.encode()).hexdigest()[:32]
+    return f"checkout-cart-{cart.pk}-{digest}"
+
+
+def cancellation_refund_key(root_payment, booking_ids) -> str:
+    """
+    One refund per root payment and exact set of cancelled bookings.
+    The amount is left out on purpose: if the refund policy tier changes
+    between a failed attempt and its retry, Stripe rejects the new amount
+    instead of refunding the same bookings twice.
+    """
+    ids = ",".join(str(pk) for pk in sorted(booking_ids))
+    digest = hashlib.sha256(ids.encode()).hexdigest()[:16]
+    return f"refund-root-{root_payment.pk}-{digest}"
+
+
+def unbooked_refund_key(root_payment, cart_item_ids) -> str:
+    """Refund for paid cart items whose slots were taken at checkout."""
+    ids = ",".join(str(pk) for pk in sorted(cart_item_ids))
+    digest = hashlib.sha256(ids.encode()).hexdigest()[:16]
+    return f"refund-unbooked-{root_payment.pk}-{digest}"
+
+
+def adjustment_key(booking, amount_cents) -> str:
+    """
+    Tied to the booking's state before the adjustment is applied. Every
+    adjustment saves the booking, so `updated_at` (to the microsecond;
+    two adjustments can land in the same second) moves on each time.
+    """
+    stamp = booking.updated_at
+    version = (
+        int(stamp.timestamp()) * 1_000_000 + stamp.microsecond
+        if stamp else 0
+    )
+    return f"adjustment-booking-{booking.pk}-{version}-{amount_cents}"
+
+
+def payment_refund_key(payment) -> str:
+    return f"refund-payment-{payment.pk}"
+
+
+# ---------------------------------------------------------
+# Operations
+# ---------------------------------------------------------
+def create_checkout_session(*, idempotency_key, **params):
+    return _call(
+        "checkout.Session.create",
+        stripe.checkout.Session.create,
+        idempotency_key=idempotency_key,
+        **params,
+    )
+
+
+def retrieve_checkout_session(session_id):
+    return _call(
+        "checkout.Session.retrieve",
+        stripe.checkout.Session.retrieve,
+        id=session_id,
+    )
+
+
+def create_payment_intent(*, idempotency_key, **params):
+    return _call(
+        "PaymentIntent.create",
+        stripe.PaymentIntent.create,
+        idempotency_key=idempotency_key,
+        **params,
+    )
+
+
+def create_refund(*, idempotency_key, **params):
+    return _call(
+        "Refund.create",
+        stripe.Refund.create,
+        idempotency_key=idempotency_key,
+        **params,
+    )
@@ -0,0 +1,72 @@
+# billing/management/commands/export_records.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing import exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream payment history, payments or bookings to CSV / NDJSON "
+        "with flat memory use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(exports.EXPORTS))
+        parser.add_argument(
+            "--format",
+            choices=sorted(exports.FORMATS),
+            default="csv",
+        )
+        parser.add_argument(
+            "--start",
+            type=exports.parse_day,
+            default=None,
+            help="First day included (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--end",
+            type=exports.parse_day,
+            default=None,
+            help="Last day included (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--address",
+            default="",
+            help="Only rows for this service address (case-insensitive).",
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write (default: stdout).",
+        )
+
+    def handle(self, *args, **options):
+        spec = exports.EXPORTS[options["dataset"]]
+        try:
+            rows = exports.filtered_rows(
+                spec,
+                start=options["start"],
+                end=options["end"],
+                address=options["address"].strip(),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = exports.iter_export(options["format"], spec, rows)
+        if options["output"] == "-":
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        written = -1 if options["format"] == "csv" else 0
+        with open(options["output"], "w", newline="",
+                  encoding="utf-8") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+                written += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. Rows={written} -> {options['output']}"))
@@ -0,0 +1,260 @@
+# billing/management/commands/generate_year_end_statements.py
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from decimal import Decimal
+from itertools import islice
+from multiprocessing import get_context
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.timezone import localdate
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_FIELDS = (
+    "user_id",
+    "username",
+    "file",
+    "chains",
+    "net_total",
+    "size",
+    "sha256",
+    "error",
+)
+
+ROOT_FIELDS = (
+    "id",
+    "user_id",
+    "service_address",
+    "created_at",
+    "amount",
+    "added_total_amt",
+    "cancelled_total_amt",
+    "net_total_amt",
+)
+
+
+# ---------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------
+# Workers are spawned, not forked: each starts a fresh interpreter with
+# its own database connection, so nothing here may import models at
+# module level (the module is imported before django.setup() runs).
+def _init_worker():
+    django.setup()
+
+
+def _statement_rows(roots):
+    """
+    Same row shape as documents.yearly_summary_rows(), built from
+    prefetched roots instead of a windowed query per user.
+    """
+    address_totals = {}
+    for root in roots:
+        address_totals[root.service_address] = (
+            address_totals.get(root.service_address, Decimal("0.00"))
+            + root.net_total_amt
+        )
+    grand_total = sum(address_totals.values(), Decimal("0.00"))
+
+    return [
+        {
+            "id": root.id,
+            "service_address": root.service_address,
+            "created_at": root.created_at,
+            "amount": root.amount,
+            "added_total_amt": root.added_total_amt,
+            "cancelled_total_amt": root.cancelled_total_amt,
+            "net_total_amt": root.net_total_amt,
+            "address_total": address_totals[root.service_address],
+            "grand_total": grand_total,
+        }
+        for root in roots
+    ]
+
+
+def _render_chunk(user_ids, year):
+    """
+    Load one chunk of users with their chains for `year` (one query for
+    the users, one prefetch for the chains) and render each statement.
+    Returns [(manifest_entry, pdf_bytes_or_None), ...].
+    """
+    from django.contrib.auth import get_user_model
+    from django.db.models import Prefetch
+
+    from billing.models import PaymentHistory
+    from billing.pdfs import build_yearly_summary_pdf
+
+    roots = (
+        PaymentHistory.objects.filter(
+            parent__isnull=True, created_at__year=year)
+        .only(*ROOT_FIELDS)
+        .order_by("service_address", "-created_at")
+    )
+    users = (
+        get_user_model().objects.filter(pk__in=user_ids)
+        .only("pk", "username")
+        .order_by("pk")
+        .prefetch_related(
+            Prefetch("paymenthistory_set", queryset=roots,
+                     to_attr="year_roots"))
+    )
+
+    results = []
+    for user in users.iterator(chunk_size=len(user_ids)):
+        rows = _statement_rows(user.year_roots)
+        entry = {
+            "user_id": user.pk,
+            "username": user.username,
+            "file": f"statement_{year}_{user.pk}.pdf",
+            "chains": len(rows),
+            "net_total": f"{rows[0]['grand_total']:.2f}" if rows else "0.00",
+            "size": 0,
+            "sha256": "",
+            "error": "",
+        }
+        try:
+            content = build_yearly_summary_pdf(user.username, year, rows)
+        except Exception as e:
+            entry["file"] = ""
+            entry["error"] = str(e)[:500]
+            results.append((entry, None))
+            continue
+
+        entry["size"] = len(content)
+        entry["sha256"] = hashlib.sha256(content).hexdigest()
+        results.append((entry, content))
+    return results
+
+
+# ---------------------------------------------------------
+# Command
+# ---------------------------------------------------------
+class Command(BaseCommand):
+    help = (
+        "Generate every customer's yearly statement PDF in parallel and "
+        "write them, with a manifest.csv, to a directory or .zip file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "output",
+            help="Output directory, or a path ending in .zip.",
+        )
+        parser.add_argument(
+            "--year",
+            type=int,
+            default=None,
+            help="Statement year (default: current year).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes rendering statements.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Users loaded and rendered per worker task.",
+        )
+
+    def handle(self, *args, **options):
+        from django.contrib.auth import get_user_model
+
+        year = options["year"] or localdate().year
+        workers = options["workers"]
+        chunk_size = options["chunk_size"]
+        if workers < 1 or chunk_size < 1:
+            raise CommandError("--workers and --chunk-size must be >= 1.")
+
+        output = options["output"]
+        if output.lower().endswith(".zip"):
+            # PDFs are already compressed; storing them keeps writes cheap.
+            archive = zipfile.ZipFile(output, "w", zipfile.ZIP_STORED)
+            write = archive.writestr
+        else:
+            archive = None
+            os.makedirs(output, exist_ok=True)
+
+            def write(name, data):
+                with open(os.path.join(output, name), "wb") as fh:
+                    fh.write(data)
+
+        manifest = io.StringIO()
+        writer = csv.DictWriter(manifest, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+
+        user_ids = (
+            get_user_model().objects.filter(
+                paymenthistory__parent__isnull=True,
+                paymenthistory__created_at__year=year,
+            )
+            .distinct()
+            .order_by("pk")
+            .values_list("pk", flat=True)
+            .iterator(chunk_size=chunk_size)
+        )
+        chunks = iter(lambda: list(islice(user_ids, chunk_size)), [])
+
+        counts = {"statements": 0, "failed": 0}
+        started = time.monotonic()
+
+        def collect(future):
+            for entry, content in future.result():
+                if content is None:
+                    counts["failed"] += 1
+                else:
+                    write(entry["file"], content)
+                    counts["statements"] += 1
+                writer.writerow(entry)
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{counts['statements']} statement(s) "
+                f"({counts['statements'] / max(elapsed, 1e-6):.1f}/s)"
+            )
+
+        # Nothing inherited from this process is shared with the workers.
+        connections.close_all()
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+            ) as pool:
+                pending = set()
+                for chunk in chunks:
+                    pending.add(pool.submit(_render_chunk, chunk, year))
+                    # Bounded in-flight work keeps parent memory flat.
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(
+                            pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future)
+                for future in pending:
+                    collect(future)
+
+            write(MANIFEST_NAME, manifest.getvalue().encode())
+        finally:
+            if archive is not None:
+                archive.close()
+
+        elapsed = time.monotonic() - started
+        rate = counts["statements"] / max(elapsed, 1e-6)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. Year={year} Statements={counts['statements']} "
+                f"Failed={counts['failed']} Elapsed={elapsed:.1f}s "
+                f"Rate={rate:.1f}/s -> {output}"
+            )
+        )
@@ -0,0 +1,53 @@
+# billing/management/commands/process_document_jobs.py
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from billing.documents import claim_job, execute_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Render queued documents (large yearly summaries). "
+        "Use --loop to run as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for queued jobs instead of exiting when idle.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls when nothing is queued.",
+        )
+
+    def handle(self, *args, **options):
+        completed = failed = 0
+
+        while True:
+            job = claim_job()
+            if job is None:
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            try:
+                execute_job(job)
+            except Exception as e:
+                # The job is marked failed with the error; keep serving.
+                self.stderr.write(f"Job {job.pk} failed: {e}")
+                failed += 1
+            else:
+                self.stdout.write(f"Job {job.pk}: {job.key}")
+                completed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. Completed={completed} Failed={failed}"))
@@ -0,0 +1,69 @@
+# billing/management/commands/process_refund_batches.py
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.refunds import claim_batch, execute_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Issue Stripe refunds for batches queued from the Payment admin. "
+        "Use --loop to run as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Stripe refund calls in flight at once.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for queued batches instead of exiting when "
+                 "idle.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls when nothing is queued.",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+
+        processed = 0
+
+        while True:
+            batch = claim_batch()
+            if batch is None:
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            self.stdout.write(f"Running {batch}")
+            try:
+                batch = execute_batch(
+                    batch, concurrency=options["concurrency"])
+            except Exception as e:
+                # The batch stays running with the error and is claimed
+                # again once stale; keep serving.
+                self.stderr.write(f"Batch {batch.pk} failed: {e}")
+            else:
+                if batch.status != batch.Status.COMPLETED:
+                    self.stderr.write(f"Batch {batch.pk}: {batch.error}")
+                self.stdout.write(
+                    f"Batch {batch.pk}: Succeeded={batch.succeeded} "
+                    f"Failed={batch.failed} Skipped={batch.skipped}"
+                )
+            processed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done. Batches={processed}"))
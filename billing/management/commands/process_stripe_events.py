@@ -0,0 +1,64 @@
+# billing/management/commands/process_stripe_events.py
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from billing.webhooks import process_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Process stored Stripe webhook events in creation order. "
+        "Use --loop to run as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Events handled per transaction.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new events instead of exiting when idle.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls when nothing was handled.",
+        )
+
+    def handle(self, *args, **options):
+        totals = {"processed": 0, "ignored": 0, "failed": 0}
+
+        while True:
+            processed, ignored, failed = process_pending(
+                options["batch_size"])
+            totals["processed"] += processed
+            totals["ignored"] += ignored
+            totals["failed"] += failed
+
+            if processed or ignored or failed:
+                self.stdout.write(
+                    f"Batch: Processed={processed} Ignored={ignored} "
+                    f"Failed={failed}"
+                )
+            if processed or ignored:
+                continue
+
+            # Idle, or only events that are still failing: back off.
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. Processed={totals['processed']} "
+                f"Ignored={totals['ignored']} Failed={totals['failed']}"
+            )
+        )
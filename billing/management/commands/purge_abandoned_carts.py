@@ -0,0 +1,153 @@
+# billing/management/commands/purge_abandoned_carts.py
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from billing.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete abandoned carts and expired sessions in bounded batches. "
+        "Guest carts and user carts have separate retention windows. "
+        "Safe to run repeatedly (e.g. daily from a scheduler)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--guest-days",
+            type=int,
+            default=7,
+            help="Delete guest (session) carts idle for this many days.",
+        )
+        parser.add_argument(
+            "--user-days",
+            type=int,
+            default=30,
+            help="Delete logged-in user carts idle for this many days.",
+        )
+        parser.add_argument(
+            "--session-days",
+            type=int,
+            default=0,
+            help=(
+                "Delete sessions that expired at least this many days ago. "
+                "0 removes every expired session."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per batch / transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count what would be deleted without writing changes.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        now = timezone.now()
+        guest_cutoff = now - timedelta(days=options["guest_days"])
+        user_cutoff = now - timedelta(days=options["user_days"])
+        session_cutoff = now - timedelta(days=options["session_days"])
+
+        totals = {"carts": 0, "cart_items": 0, "sessions": 0}
+
+        # -------------------------------------------------
+        # 1) Abandoned carts (guest + user), keyset by pk
+        # -------------------------------------------------
+        # The cart views touch updated_at on every item change; the item
+        # check also spares carts whose items changed before they did.
+        stale_carts = (
+            Cart.objects.filter(user__isnull=True, updated_at__lt=guest_cutoff)
+            .exclude(items__created_at__gte=guest_cutoff)
+            | Cart.objects.filter(user__isnull=False,
+                                  updated_at__lt=user_cutoff)
+            .exclude(items__created_at__gte=user_cutoff)
+        )
+        for cart_ids in self._keyset_batches(stale_carts, "pk", batch_size):
+            carts, items = self._delete_carts(cart_ids, dry_run)
+            totals["carts"] += carts
+            totals["cart_items"] += items
+
+        # -------------------------------------------------
+        # 2) Expired sessions + the guest carts still bound to them
+        # -------------------------------------------------
+        expired_sessions = Session.objects.filter(
+            expire_date__lt=session_cutoff)
+        for session_keys in self._keyset_batches(
+            expired_sessions, "session_key", batch_size
+        ):
+            orphan_ids = list(
+                Cart.objects.filter(
+                    user__isnull=True,
+                    session_key__in=session_keys,
+                ).values_list("pk", flat=True)
+            )
+            carts, items = self._delete_carts(orphan_ids, dry_run)
+            totals["carts"] += carts
+            totals["cart_items"] += items
+
+            if dry_run:
+                totals["sessions"] += len(session_keys)
+            else:
+                with transaction.atomic():
+                    deleted, _ = Session.objects.filter(
+                        session_key__in=session_keys
+                    ).delete()
+                totals["sessions"] += deleted
+
+        verb = "Would reclaim" if dry_run else "Reclaimed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. {verb}: Carts={totals['carts']} "
+                f"CartItems={totals['cart_items']} "
+                f"Sessions={totals['sessions']}"
+            )
+        )
+
+    @staticmethod
+    def _keyset_batches(queryset, key, batch_size):
+        """
+        Yield lists of primary keys in ascending order, `batch_size` at a time.
+        Uses `key > last_seen` instead of OFFSET so each batch is an index
+        range scan no matter how many rows were already processed.
+        """
+        last_seen = None
+        while True:
+            qs = queryset.order_by(key)
+            if last_seen is not None:
+                qs = qs.filter(**{f"{key}__gt": last_seen})
+            keys = list(qs.values_list(key, flat=True)[:batch_size])
+            if not keys:
+                return
+            yield keys
+            last_seen = keys[-1]
+
+    @staticmethod
+    def _delete_carts(cart_ids, dry_run):
+        """Delete one batch of carts and their items; return (carts, items)."""
+        if not cart_ids:
+            return 0, 0
+
+        if dry_run:
+            items = CartItem.objects.filter(cart_id__in=cart_ids).count()
+            return len(cart_ids), items
+
+        with transaction.atomic():
+            items, _ = CartItem.objects.filter(cart_id__in=cart_ids).delete()
+            carts, _ = Cart.objects.filter(pk__in=cart_ids).delete()
+        return carts, items
@@ -0,0 +1,146 @@
+# billing/management/commands/rebuild_address_ledgers.py
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, Max, Q, Sum, When
+
+from billing.models import AddressLedger, PaymentHistory
+from scheduling.models import Booking
+
+ZERO = Decimal("0.00")
+
+
+def _later(a, b):
+    return max(a, b) if a and b else a or b
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-(user, address) AddressLedger rows from "
+        "PaymentHistory and Booking using grouped aggregate queries. "
+        "On PostgreSQL the ledger table is locked while it is rebuilt; "
+        "elsewhere, run it while the site is idle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            default=None,
+            help="Only rebuild ledgers for this user id.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Ledger rows inserted per bulk_create batch.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        user_id = options["user"]
+
+        payments = PaymentHistory.objects.all()
+        bookings = Booking.objects.filter(user__isnull=False)
+        ledgers = AddressLedger.objects.all()
+        if user_id:
+            payments = payments.filter(user_id=user_id)
+            bookings = bookings.filter(user_id=user_id)
+            ledgers = ledgers.filter(user_id=user_id)
+
+        # Grouped by the exact stored address; rows are folded onto
+        # AddressLedger.key_for() below, the same key the live updates use.
+        money = DecimalField(max_digits=12, decimal_places=2)
+        payment_rows = (
+            payments.values("user_id", "service_address")
+            .annotate(
+                paid=Sum(
+                    Case(When(amount__gt=0, then="amount"),
+                         default=ZERO, output_field=money)
+                ),
+                refund=Sum(
+                    Case(When(amount__lt=0, then="amount"),
+                         default=ZERO, output_field=money)
+                ),
+                net=Sum("amount"),
+                last_payment=Max("created_at"),
+            )
+            .order_by()
+        )
+        booking_rows = (
+            bookings.values("user_id", "service_address")
+            .annotate(
+                active=Count("id", filter=~Q(status="Cancelled")),
+                cancelled=Count("id", filter=Q(status="Cancelled")),
+                last_booking=Max("updated_at"),
+            )
+            .order_by()
+        )
+
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # Live ledger updates run in the same transaction as the
+                # payment or booking write they mirror. Holding this lock
+                # from before the reads until the new rows are committed
+                # makes those writers wait and apply their deltas to the
+                # rebuilt rows, so none are lost or counted twice.
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"LOCK TABLE {AddressLedger._meta.db_table} "
+                        "IN EXCLUSIVE MODE"
+                    )
+
+            merged = {}
+
+            def row_for(entry):
+                address = (entry["service_address"] or "").strip()
+                lookup = (entry["user_id"], AddressLedger.key_for(address))
+                ledger = merged.get(lookup)
+                if ledger is None:
+                    ledger = merged[lookup] = AddressLedger(
+                        user_id=entry["user_id"],
+                        address_key=lookup[1],
+                        address=address or "Unknown",
+                        paid_total=ZERO,
+                        refund_total=ZERO,
+                        net_total=ZERO,
+                        active_bookings=0,
+                        cancelled_bookings=0,
+                    )
+                elif address and (
+                        ledger.address == "Unknown"
+                        or address < ledger.address):
+                    ledger.address = address
+                return ledger
+
+            for entry in payment_rows.iterator():
+                ledger = row_for(entry)
+                ledger.paid_total += entry["paid"] or ZERO
+                ledger.refund_total -= entry["refund"] or ZERO
+                ledger.net_total += entry["net"] or ZERO
+                ledger.last_payment_at = _later(
+                    ledger.last_payment_at, entry["last_payment"])
+                ledger.last_activity_at = ledger.last_payment_at
+
+            for entry in booking_rows.iterator():
+                ledger = row_for(entry)
+                ledger.active_bookings += entry["active"]
+                ledger.cancelled_bookings += entry["cancelled"]
+                ledger.last_activity_at = _later(
+                    ledger.last_activity_at, entry["last_booking"])
+
+            removed, _ = ledgers.delete()
+            AddressLedger.objects.bulk_create(
+                merged.values(), batch_size=options["batch_size"]
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. Removed={removed} Rebuilt={len(merged)} ledger(s)"
+            )
+        )
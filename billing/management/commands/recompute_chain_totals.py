@@ -0,0 +1,58 @@
+# billing/management/commands/recompute_chain_totals.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from billing.models import PaymentHistory
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized running totals (added, cancelled, net) "
+        "on root PaymentHistory rows from their child adjustments. "
+        "Use after manual data fixes or to verify drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Root payments recomputed per batch / transaction.",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            default=None,
+            help="Only recompute chains belonging to this user id.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        roots = PaymentHistory.objects.filter(parent__isnull=True)
+        if options["user"]:
+            roots = roots.filter(user_id=options["user"])
+
+        updated = 0
+        last_id = 0
+
+        while True:
+            ids = list(
+                roots.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            with transaction.atomic():
+                updated += PaymentHistory.objects.recompute_chain_totals(ids)
+            last_id = ids[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done. Recomputed={updated} root payment(s)")
+        )
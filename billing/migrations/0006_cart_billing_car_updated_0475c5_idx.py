@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0005_alter_payment_currency'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['updated_at'], name='billing_car_updated_0475c5_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:31
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_chain_totals(apps, schema_editor):
+    PaymentHistory = apps.get_model("billing", "PaymentHistory")
+
+    sums = {}
+    for parent_id, amount in (
+        PaymentHistory.objects.filter(parent__isnull=False)
+        .values_list("parent_id", "amount")
+        .iterator()
+    ):
+        added, cancelled = sums.get(parent_id, (Decimal("0.00"),) * 2)
+        if amount >= 0:
+            added += amount
+        else:
+            cancelled += amount
+        sums[parent_id] = (added, cancelled)
+
+    batch = []
+    for root in PaymentHistory.objects.filter(parent__isnull=True).iterator():
+        added, cancelled = sums.get(root.id, (Decimal("0.00"),) * 2)
+        root.added_total_amt = added
+        root.cancelled_total_amt = cancelled
+        root.adjustments_total_amt = added + cancelled
+        root.net_total_amt = root.amount + added + cancelled
+        batch.append(root)
+        if len(batch) >= 500:
+            PaymentHistory.objects.bulk_update(batch, [
+                "added_total_amt", "cancelled_total_amt",
+                "adjustments_total_amt", "net_total_amt",
+            ])
+            batch = []
+    if batch:
+        PaymentHistory.objects.bulk_update(batch, [
+            "added_total_amt", "cancelled_total_amt",
+            "adjustments_total_amt", "net_total_amt",
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_cart_billing_car_updated_0475c5_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymenthistory',
+            name='added_total_amt',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='paymenthistory',
+            name='cancelled_total_amt',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='paymenthistory',
+            name='net_total_amt',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(
+            backfill_chain_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:33
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_address_ledgers(apps, schema_editor):
+    PaymentHistory = apps.get_model("billing", "PaymentHistory")
+    AddressLedger = apps.get_model("billing", "AddressLedger")
+    Booking = apps.get_model("scheduling", "Booking")
+
+    ledgers = {}
+
+    def ledger_for(user_id, address):
+        key = (user_id, (address or "").strip().lower())
+        if key not in ledgers:
+            ledgers[key] = AddressLedger(
+                user_id=user_id,
+                address_key=key[1],
+                address=(address or "").strip() or "Unknown",
+            )
+        return ledgers[key]
+
+    for user_id, address, amount, created_at in (
+        PaymentHistory.objects.values_list(
+            "user_id", "service_address", "amount", "created_at"
+        ).iterator()
+    ):
+        ledger = ledger_for(user_id, address)
+        if amount > 0:
+            ledger.paid_total += amount
+        elif amount < 0:
+            ledger.refund_total -= amount
+        ledger.net_total += amount
+        if not ledger.last_payment_at or created_at > ledger.last_payment_at:
+            ledger.last_payment_at = created_at
+            ledger.last_activity_at = created_at
+
+    for user_id, address, status, updated_at in (
+        Booking.objects.filter(user__isnull=False)
+        .values_list("user_id", "service_address", "status", "updated_at")
+        .iterator()
+    ):
+        ledger = ledger_for(user_id, address)
+        if status == "Cancelled":
+            ledger.cancelled_bookings += 1
+        else:
+            ledger.active_bookings += 1
+        if not ledger.last_activity_at or updated_at > ledger.last_activity_at:
+            ledger.last_activity_at = updated_at
+
+    AddressLedger.objects.bulk_create(ledgers.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('billing', '0007_paymenthistory_added_total_amt_and_more'),
+        ('scheduling', '0003_jobassignment_scheduling__employe_a488b8_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AddressLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address_key', models.CharField(help_text='Trimmed, lower-cased service address.', max_length=255)),
+                ('address', models.CharField(help_text='Service address as first recorded (for display).', max_length=255)),
+                ('paid_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('refund_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('net_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('active_bookings', models.IntegerField(default=0)),
+                ('cancelled_bookings', models.IntegerField(default=0)),
+                ('last_payment_at', models.DateTimeField(blank=True, null=True)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='address_ledgers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_activity_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='addressledger',
+            constraint=models.UniqueConstraint(fields=('user', 'address_key'), name='unique_user_address_ledger'),
+        ),
+        migrations.RunPython(
+            backfill_address_ledgers, migrations.RunPython.noop),
+    ]
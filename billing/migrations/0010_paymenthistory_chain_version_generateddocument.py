@@ -0,0 +1,37 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('billing', '0009_stripewebhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymenthistory',
+            name='chain_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='GeneratedDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('yearly_summary', 'Yearly summary')], max_length=20)),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('content', models.BinaryField()),
+                ('etag', models.CharField(max_length=64)),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generated_documents', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'kind'], name='billing_gen_user_id_b63f62_idx')],
+            },
+        ),
+    ]
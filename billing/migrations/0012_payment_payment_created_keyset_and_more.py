@@ -0,0 +1,21 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0011_documentjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-created_at', '-id'], name='payment_created_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='paymenthistory',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['user', '-created_at', '-id'], name='paymenthistory_root_keyset'),
+        ),
+    ]
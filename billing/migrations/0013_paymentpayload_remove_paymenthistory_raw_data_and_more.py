@@ -0,0 +1,100 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:56
+
+import json
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_raw_data(apps, schema_editor):
+    """
+    Copy every non-empty raw_data blob into PaymentPayload and promote
+    the Stripe ids that adjustments kept in it to real columns.
+    """
+    PaymentHistory = apps.get_model("billing", "PaymentHistory")
+    PaymentPayload = apps.get_model("billing", "PaymentPayload")
+
+    taken_intents = set(
+        PaymentHistory.objects.exclude(stripe_payment_id__isnull=True)
+        .values_list("stripe_payment_id", flat=True)
+    )
+    payloads = []
+
+    rows = (
+        PaymentHistory.objects.exclude(raw_data={})
+        .only("id", "raw_data", "payment_type", "stripe_payment_id")
+        .iterator(chunk_size=500)
+    )
+    for row in rows:
+        data = row.raw_data
+        if not data:
+            continue
+
+        update = {}
+        if isinstance(data, dict):
+            refund_id = data.get("stripe_refund_id")
+            intent_id = data.get("stripe_payment_intent")
+            if refund_id:
+                update["stripe_refund_id"] = refund_id
+            if (intent_id and not row.stripe_payment_id
+                    and intent_id not in taken_intents):
+                update["stripe_payment_id"] = intent_id
+                taken_intents.add(intent_id)
+        if update:
+            PaymentHistory.objects.filter(pk=row.pk).update(**update)
+
+        raw = json.dumps(data, default=str, separators=(",", ":")).encode()
+        payloads.append(PaymentPayload(
+            payment_id=row.pk,
+            source=(
+                "adjustment" if row.payment_type == "ADJUSTMENT"
+                else "webhook"
+            ),
+            data=zlib.compress(raw),
+            size=len(raw),
+        ))
+        if len(payloads) >= 500:
+            PaymentPayload.objects.bulk_create(payloads)
+            payloads = []
+
+    PaymentPayload.objects.bulk_create(payloads)
+
+
+def restore_raw_data(apps, schema_editor):
+    PaymentHistory = apps.get_model("billing", "PaymentHistory")
+    PaymentPayload = apps.get_model("billing", "PaymentPayload")
+
+    for payload in PaymentPayload.objects.iterator(chunk_size=500):
+        PaymentHistory.objects.filter(pk=payload.payment_id).update(
+            raw_data=json.loads(zlib.decompress(bytes(payload.data))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0012_payment_payment_created_keyset_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentPayload',
+            fields=[
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='billing.paymenthistory')),
+                ('source', models.CharField(blank=True, max_length=50)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(help_text='Uncompressed size in bytes.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='paymenthistory',
+            name='stripe_refund_id',
+            field=models.CharField(blank=True, db_index=True, help_text='Stripe refund behind this row, if any.', max_length=255, null=True),
+        ),
+        migrations.RunPython(move_raw_data, restore_raw_data),
+        migrations.RemoveField(
+            model_name='paymenthistory',
+            name='raw_data',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0013_paymentpayload_remove_paymenthistory_raw_data_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', '-created_at'], name='payment_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='paymenthistory',
+            index=models.Index(fields=['-created_at', '-id'], name='paymenthistory_created'),
+        ),
+        migrations.AddIndex(
+            model_name='paymenthistory',
+            index=models.Index(fields=['status', '-created_at'], name='paymenthistory_status_created'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0015_refundbatch_refundbatchitem_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentjob',
+            name='attempt',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='documentjob',
+            name='run_after',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,13 +1,17 @@
+import json
 import logging
+import zlib
 from django.utils import timezone
 from decimal import Decimal
 from typing import TYPE_CHECKING
 from django.utils.timezone import now
-from django.core.mail import send_mail
 
 from django.conf import settings
-from django.db import models
-import stripe
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from . import gateway
 
 if TYPE_CHECKING:
     from django.http import HttpRequest
@@ -57,6 +61,16 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination in all_payments_admin.
+            models.Index(fields=["-created_at", "-id"],
+                         name="payment_created_keyset"),
+            # Admin status filter with the default newest-first order.
+            models.Index(fields=["status", "-created_at"],
+                         name="payment_status_created"),
+        ]
+
     def amount_display(self):
         """Readable currency string."""
         return f"${self.amount / 100:.2f}"
@@ -73,19 +87,20 @@ class Payment(models.Model):
             raise ValueError(
                 "No Stripe payment intent ID associated with this payment.")
 
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-
-        refund = stripe.Refund.create(
+        refund = gateway.create_refund(
             payment_intent=self.stripe_payment_intent_id,
             reason="requested_by_customer",
+            idempotency_key=gateway.payment_refund_key(self),
         )
 
-        # update model state
-        self.status = "refunded"
-        self.metadata["refund_id"] = refund.id
-        self.save(update_fields=["status", "metadata"])
+        self.mark_refunded(refund.id)
         return refund
 
+    def mark_refunded(self, refund_id):
+        self.status = "refunded"
+        self.metadata["refund_id"] = refund_id
+        self.save(update_fields=["status", "metadata", "updated_at"])
+
 
 class CartManager(models.Manager["Cart"]):
     """Custom manager with helper for resolving
@@ -159,6 +174,7 @@ class Cart(models.Model):
             models.Index(fields=["session_key"]),
             models.Index(fields=["user"]),
             models.Index(fields=["address_key"]),
+            models.Index(fields=["updated_at"]),
         ]
         ordering = ["-updated_at"]
         constraints = [
@@ -202,6 +218,15 @@ class Cart(models.Model):
     def clear(self):
         """Remove all items from this cart."""
         self.items.all().delete()
+        self.touch()
+
+    def touch(self):
+        """
+        Mark the cart as active. Item writes don't save the cart itself,
+        and `purge_abandoned_carts` judges carts by `updated_at`.
+        """
+        self.updated_at = now()
+        Cart.objects.filter(pk=self.pk).update(updated_at=self.updated_at)
 
     @property
     def item_count(self) -> int:
@@ -271,6 +296,87 @@ class CartItem(models.Model):
         return (self.unit_price * self.quantity).quantize(Decimal("0.01"))
 
 
+CHAIN_TOTAL_FIELDS = (
+    "adjustments_total_amt",
+    "added_total_amt",
+    "cancelled_total_amt",
+    "net_total_amt",
+)
+
+# Columns only ever written through F() updates; full saves skip them.
+CHAIN_MAINTAINED_FIELDS = CHAIN_TOTAL_FIELDS + ("chain_version",)
+
+
+class PaymentHistoryManager(models.Manager["PaymentHistory"]):
+    """Helpers for keeping root-chain running totals in sync."""
+
+    def record_adjustments(self, root_id, amounts, removed=()):
+        """
+        Fold child adjustment amounts into the root's running totals
+        with a single F()-based UPDATE (no read-modify-write race).
+        Mirrors compute_sections(): amount >= 0 counts as added,
+        amount < 0 as cancelled/refunded. `removed` amounts (edited or
+        deleted children) are backed out the same way.
+        """
+        added = Decimal("0.00")
+        cancelled = Decimal("0.00")
+        for amount, sign in [(a, 1) for a in amounts] + [
+                (a, -1) for a in removed]:
+            if amount >= 0:
+                added += sign * amount
+            else:
+                cancelled += sign * amount
+
+        delta = added + cancelled
+        return self.filter(pk=root_id).update(
+            added_total_amt=F("added_total_amt") + added,
+            cancelled_total_amt=F("cancelled_total_amt") + cancelled,
+            adjustments_total_amt=F("adjustments_total_amt") + delta,
+            net_total_amt=F("net_total_amt") + delta,
+            chain_version=F("chain_version") + 1,
+        )
+
+    def bump_chain_version(self, root_id):
+        """Invalidate cached documents (receipts) for this chain."""
+        return self.filter(pk=root_id).update(
+            chain_version=F("chain_version") + 1)
+
+    def recompute_chain_totals(self, root_ids):
+        """
+        Rebuild running totals for the given root ids from their children.
+        Two UPDATE statements: the sums first, then net from those sums.
+        """
+        children = self.model.objects.filter(parent=models.OuterRef("pk"))
+
+        def child_sum(qs):
+            return Coalesce(
+                models.Subquery(
+                    qs.order_by()
+                    .values("parent")
+                    .annotate(total=Sum("amount"))
+                    .values("total")[:1]
+                ),
+                Decimal("0.00"),
+                output_field=models.DecimalField(
+                    max_digits=10, decimal_places=2),
+            )
+
+        roots = self.filter(pk__in=root_ids, parent__isnull=True)
+        updated = roots.update(
+            added_total_amt=child_sum(children.filter(amount__gte=0)),
+            cancelled_total_amt=child_sum(children.filter(amount__lt=0)),
+        )
+        roots.update(
+            adjustments_total_amt=(
+                F("added_total_amt") + F("cancelled_total_amt")),
+            net_total_amt=(
+                F("amount") + F("added_total_amt") + F("cancelled_total_amt")
+            ),
+            chain_version=F("chain_version") + 1,
+        )
+        return updated
+
+
 class PaymentHistory(models.Model):
     STATUS_CHOICES = [
         ("Paid", "Paid"),
@@ -312,6 +418,22 @@ class PaymentHistory(models.Model):
         max_digits=10, decimal_places=2, default=Decimal("0.00")
     )
 
+    # Running totals for root rows, maintained by save() on every child
+    # adjustment (see PaymentHistoryManager.record_adjustments) and
+    # rebuilt by `manage.py recompute_chain_totals`.
+    added_total_amt = models.DecimalField(
+        max_digits=10, decimal_places=2, default=Decimal("0.00")
+    )
+    cancelled_total_amt = models.DecimalField(
+        max_digits=10, decimal_places=2, default=Decimal("0.00")
+    )
+    net_total_amt = models.DecimalField(
+        max_digits=10, decimal_places=2, default=Decimal("0.00")
+    )
+    # Bumped whenever anything shown on the chain's receipt changes;
+    # part of the GeneratedDocument cache key.
+    chain_version = models.PositiveIntegerField(default=1)
+
     currency = models.CharField(max_length=10, default="USD")
     service_address = models.TextField(blank=True)
 
@@ -329,10 +451,31 @@ class PaymentHistory(models.Model):
     )
     payment_type = models.CharField(max_length=50, blank=True)
     notes = models.TextField(blank=True)
-    raw_data = models.JSONField(default=dict, blank=True)
+    stripe_refund_id = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text="Stripe refund behind this row, if any.",
+    )
+
+    objects: PaymentHistoryManager = PaymentHistoryManager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination of a user's chains in payment_history.
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                condition=models.Q(parent__isnull=True),
+                name="paymenthistory_root_keyset",
+            ),
+            # Admin changelist: newest first, optionally by status.
+            models.Index(fields=["-created_at", "-id"],
+                         name="paymenthistory_created"),
+            models.Index(fields=["status", "-created_at"],
+                         name="paymenthistory_status_created"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} — ${self.amount:.2f} ({self.status})"
@@ -341,26 +484,45 @@ class PaymentHistory(models.Model):
     # 💰 Helper: compute all totals for this chain
     # ============================================================
     def compute_sections(self):
-        root = self if self.parent is None else self.parent
-        adjustments = getattr(root, "adjustments", None)
-
-        if not adjustments:
-            return (root.amount, Decimal("0.00"), Decimal("0.00"), root.amount)
-
-        add_total = Decimal("0.00")
-        cancel_total = Decimal("0.00")
-
-        for adj in adjustments.all():
-            if adj.amount >= 0:
-                add_total += adj.amount
-            else:
-                cancel_total += adj.amount
+        """
+        Return (original, added, cancelled, net) for this chain.
+        Reads the root's maintained running totals — no adjustment scan.
+        """
+        root = self if self.parent_id is None else self.parent
+        if getattr(root, "_chain_totals_stale", False):
+            # save() or a child's save/delete moved the totals with F().
+            root.refresh_from_db(fields=CHAIN_MAINTAINED_FIELDS)
+            root._chain_totals_stale = False
+        return (
+            root.amount,
+            root.added_total_amt,
+            root.cancelled_total_amt,
+            root.net_total_amt,
+        )
 
-        original_total = root.amount
-        net_total = (original_total + add_total + cancel_total).quantize(
-            Decimal("0.01")
+    def _sync_address_ledger(self, is_new, previous):
+        """Mirror this row's amount into the per-address ledger."""
+        if is_new:
+            AddressLedger.objects.record_payment(
+                self.user_id, self.service_address, self.amount,
+                at=self.created_at,
+            )
+            return
+
+        if not previous or (
+            previous["amount"] == self.amount
+            and AddressLedger.key_for(previous["service_address"])
+            == AddressLedger.key_for(self.service_address)
+        ):
+            return
+
+        AddressLedger.objects.record_payment(
+            previous["user_id"], previous["service_address"],
+            previous["amount"], reverse=True,
+        )
+        AddressLedger.objects.record_payment(
+            self.user_id, self.service_address, self.amount,
         )
-        return (original_total, add_total, cancel_total, net_total)
 
     # ============================================================
     # 🧾 Convenience: human-friendly label
@@ -384,36 +546,485 @@ class PaymentHistory(models.Model):
     # ============================================================
     def save(self, *args, **kwargs):
         is_new = self._state.adding
-        super().save(*args, **kwargs)
-
-        # Send email only when new record created
-        if (is_new and self.user
-                and self.status in ["Refunded", "Adjustment", "Cancelled"]):
-            try:
-                subject = f"Tucker & Dale’s — {self.status} Notification"
-                message = (
-                    f"Hello {self.user.username},\n\n"
-                    f"This is a confirmation "
-                    f"of a recent {self.status.lower()} "
-                    f"related to your booking at:\n\n"
-                    f"{self.service_address or '(No address specified)'}\n\n"
-                    f"Amount: ${abs(self.amount):.2f}\n"
-                    f"Status: {self.status}\n"
-                    f"Date: {timezone.now().strftime('%Y-%m-%d %H:%M')}\n\n"
-                    f"Thank you for choosing Tucker & Dale’s Home Services!"
+
+        if is_new and self.parent_id is None:
+            self.net_total_amt = (
+                self.amount + self.added_total_amt + self.cancelled_total_amt
+            )
+
+        update_fields = kwargs.get("update_fields")
+        if not is_new and self.parent_id is None and update_fields is None:
+            # Never write back possibly stale running totals from memory;
+            # children update them concurrently through F() expressions.
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key
+                and f.name not in CHAIN_MAINTAINED_FIELDS
+            ]
+
+        previous = None
+        if not is_new and (
+            update_fields is None
+            or {"amount", "service_address"} & set(update_fields)
+        ):
+            previous = (
+                PaymentHistory.objects.filter(pk=self.pk)
+                .values("user_id", "amount", "service_address")
+                .first()
+            )
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._sync_address_ledger(is_new, previous)
+
+            if is_new and self.parent_id is not None:
+                PaymentHistory.objects.record_adjustments(
+                    self.parent_id, [self.amount]
+                )
+            elif not is_new and self.parent_id is None:
+                values = {"chain_version": F("chain_version") + 1}
+                if update_fields is None or "amount" in update_fields:
+                    values["net_total_amt"] = (
+                        F("amount")
+                        + F("added_total_amt")
+                        + F("cancelled_total_amt")
+                    )
+                PaymentHistory.objects.filter(pk=self.pk).update(**values)
+            elif (previous is not None
+                    and previous["amount"] != self.amount):
+                PaymentHistory.objects.record_adjustments(
+                    self.parent_id, [self.amount],
+                    removed=[previous["amount"]],
                 )
+            elif not is_new:
+                PaymentHistory.objects.bump_chain_version(self.parent_id)
+            self._mark_chain_stale()
+
+            # Queue the notification in the same transaction (outbox);
+            # the send_queued_emails worker delivers it.
+            if (is_new and self.user
+                    and self.status in ["Refunded", "Adjustment",
+                                        "Cancelled"]):
+                self._queue_status_email()
+
+    def _mark_chain_stale(self):
+        """Make compute_sections() re-read the root's totals."""
+        if self.parent_id is None:
+            self._chain_totals_stale = True
+        elif PaymentHistory.parent.is_cached(self) and self.parent:
+            self.parent._chain_totals_stale = True
+
+    def _queue_status_email(self):
+        from core.outbox import enqueue_email  # avoid import cycle
+
+        subject = f"Tucker & Dale’s — {self.status} Notification"
+        message = (
+            f"Hello {self.user.username},\n\n"
+            f"This is a confirmation "
+            f"of a recent {self.status.lower()} "
+            f"related to your booking at:\n\n"
+            f"{self.service_address or '(No address specified)'}\n\n"
+            f"Amount: ${abs(self.amount):.2f}\n"
+            f"Status: {self.status}\n"
+            f"Date: {timezone.now().strftime('%Y-%m-%d %H:%M')}\n\n"
+            f"Thank you for choosing Tucker & Dale’s Home Services!"
+        )
 
-                send_mail(
+        try:
+            with transaction.atomic():
+                enqueue_email(
                     subject,
                     message,
-                    settings.DEFAULT_FROM_EMAIL,
                     [self.user.email],
-                    fail_silently=True,
+                    dedupe_key=f"payment-history:{self.pk}",
                 )
+        except Exception as e:
+            logger.error(
+                "Failed to queue %s email: %s",
+                self.status,
+                e,
+            )
 
-            except Exception as e:
-                logger.error(
-                    "Failed to send %s email: %s",
-                    self.status,
-                    e,
-                )
+
+class AddressLedgerManager(models.Manager["AddressLedger"]):
+    """Transactional F()-based updates for per-address ledger rows."""
+
+    def _apply(self, user_id, address, values, at=None, create=True):
+        """
+        UPDATE the (user, address) row with F() deltas, creating it on the
+        first write unless `create` is False. Must run inside the
+        caller's transaction.
+        """
+        if not user_id:
+            return
+        key = AddressLedger.key_for(address)
+        values = {**values, "last_activity_at": at or timezone.now()}
+
+        if self.filter(user_id=user_id, address_key=key).update(**values):
+            return
+        if not create:
+            return
+        self.get_or_create(
+            user_id=user_id,
+            address_key=key,
+            defaults={"address": (address or "").strip() or "Unknown"},
+        )
+        self.filter(user_id=user_id, address_key=key).update(**values)
+
+    def record_payment(self, user_id, address, amount, at=None,
+                       reverse=False):
+        """
+        Fold one PaymentHistory amount into the ledger.
+        Positive amounts count as paid, negative ones as refunded.
+        `reverse=True` backs a previously recorded amount out again.
+        """
+        paid = amount if amount > 0 else Decimal("0.00")
+        refund = -amount if amount < 0 else Decimal("0.00")
+        net = amount
+        if reverse:
+            paid, refund, net = -paid, -refund, -net
+
+        values = {
+            "paid_total": F("paid_total") + paid,
+            "refund_total": F("refund_total") + refund,
+            "net_total": F("net_total") + net,
+        }
+        if not reverse:
+            values["last_payment_at"] = at or timezone.now()
+        # Nothing to back out of a ledger that was never written (or was
+        # deleted along with its user).
+        self._apply(user_id, address, values, at=at, create=not reverse)
+
+    def record_bookings(self, user_id, address, active=0, cancelled=0,
+                        at=None):
+        """Shift the active / cancelled booking counters."""
+        if not active and not cancelled:
+            return
+        self._apply(
+            user_id,
+            address,
+            {
+                "active_bookings": F("active_bookings") + active,
+                "cancelled_bookings": F("cancelled_bookings") + cancelled,
+            },
+            at=at,
+        )
+
+    def for_user(self, user):
+        """Return {address_key: ledger} for all of a user's properties."""
+        return {
+            ledger.address_key: ledger
+            for ledger in self.filter(user=user)
+        }
+
+
+class AddressLedger(models.Model):
+    """
+    Precomputed account balance per (user, service address).
+    Kept in sync by PaymentHistory.save() and the booking write paths;
+    `manage.py rebuild_address_ledgers` recomputes it from scratch.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="address_ledgers",
+    )
+    address_key = models.CharField(
+        max_length=255,
+        help_text="Trimmed, lower-cased service address.",
+    )
+    address = models.CharField(
+        max_length=255,
+        help_text="Service address as first recorded (for display).",
+    )
+
+    paid_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    refund_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    net_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    active_bookings = models.IntegerField(default=0)
+    cancelled_bookings = models.IntegerField(default=0)
+
+    last_payment_at = models.DateTimeField(null=True, blank=True)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+
+    objects: AddressLedgerManager = AddressLedgerManager()
+
+    class Meta:
+        ordering = ["-last_activity_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "address_key"],
+                name="unique_user_address_ledger",
+            )
+        ]
+
+    def __str__(self):
+        return f"Ledger<{self.user_id}: {self.address}> ${self.net_total:.2f}"
+
+    @staticmethod
+    def key_for(address) -> str:
+        """Ledger key matching the views' `service_address__iexact`."""
+        return (address or "").strip().lower()
+
+
+class PaymentPayloadManager(models.Manager["PaymentPayload"]):
+    def store(self, payment, data, source=""):
+        """Compress and attach a raw provider payload to `payment`."""
+        raw = json.dumps(data, default=str, separators=(",", ":")).encode()
+        return self.update_or_create(
+            payment=payment,
+            defaults={
+                "source": source,
+                "data": zlib.compress(raw),
+                "size": len(raw),
+            },
+        )[0]
+
+
+class PaymentPayload(models.Model):
+    """
+    Raw provider payload for a PaymentHistory row, zlib-compressed JSON.
+    Kept out of PaymentHistory so the rows that history pages, invoices
+    and admin lists scan stay narrow; read only from the admin detail
+    view. Fields we query on are promoted to PaymentHistory columns.
+    """
+
+    payment = models.OneToOneField(
+        PaymentHistory,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="payload",
+    )
+    source = models.CharField(max_length=50, blank=True)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(
+        help_text="Uncompressed size in bytes.")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects: PaymentPayloadManager = PaymentPayloadManager()
+
+    def __str__(self):
+        return f"Payload for PaymentHistory #{self.payment_id}"
+
+    def decoded(self):
+        return json.loads(zlib.decompress(bytes(self.data)))
+
+
+class StripeWebhookEvent(models.Model):
+    """
+    Append-only store of verified Stripe webhook deliveries.
+    The webhook view only inserts here and returns 200; events are
+    handled afterwards by `manage.py process_stripe_events`.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        PROCESSED = "processed", "Processed"
+        IGNORED = "ignored", "Ignored"
+        FAILED = "failed", "Failed"
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100, db_index=True)
+    stripe_created = models.DateTimeField(
+        help_text="Event creation time reported by Stripe.")
+    livemode = models.BooleanField(default=False)
+    payload = models.JSONField(default=dict)
+
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Pending events are not picked up again before this time; pushed
+    # back exponentially after each failed attempt.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["stripe_created", "id"]
+        indexes = [
+            models.Index(fields=["status", "stripe_created", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
+
+
+class GeneratedDocument(models.Model):
+    """
+    Rendered PDF bytes, keyed by everything that determines their content
+    (e.g. root payment id + chain_version). Served as-is with an ETag and
+    Range support until the key changes.
+    """
+
+    class Kind(models.TextChoices):
+        RECEIPT = "receipt", "Receipt"
+        YEARLY_SUMMARY = "yearly_summary", "Yearly summary"
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    key = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="generated_documents",
+    )
+    content = models.BinaryField()
+    etag = models.CharField(max_length=64)
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "kind"]),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.size} bytes)"
+
+
+class DocumentJob(models.Model):
+    """
+    A document too large to render inside a request. Queued by the
+    download view, rendered by `manage.py process_document_jobs`, and
+    polled by the browser until the GeneratedDocument under `key` exists.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(
+        max_length=20, choices=GeneratedDocument.Kind.choices)
+    key = models.CharField(max_length=255, db_index=True)
+    params = models.JSONField(default=dict, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="document_jobs",
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    error = models.TextField(blank=True)
+    # Retries of a failed key are new jobs with the next attempt number,
+    # held back until run_after (see documents.enqueue_job).
+    attempt = models.PositiveSmallIntegerField(default=1)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} job #{self.pk} ({self.status})"
+
+
+class RefundBatch(models.Model):
+    """
+    Refunds requested together from the Payment admin. Processed by
+    `manage.py process_refund_batches`; progress and per-payment
+    results are shown on the batch's progress page.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    total = models.PositiveIntegerField(default=0)
+    succeeded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"Refund batch #{self.pk} ({self.status})"
+
+    @property
+    def done(self):
+        return self.succeeded + self.failed + self.skipped
+
+
+class RefundBatchItem(models.Model):
+    """One payment in a RefundBatch and the outcome of its refund."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+        SKIPPED = "skipped", "Skipped"
+
+    batch = models.ForeignKey(
+        RefundBatch,
+        on_delete=models.CASCADE,
+        related_name="items",
+    )
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name="refund_batch_items",
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    refund_id = models.CharField(max_length=255, blank=True)
+    message = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["batch", "payment"],
+                name="unique_refund_batch_payment",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Payment #{self.payment_id} in batch #{self.batch_id}"
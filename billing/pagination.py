@@ -0,0 +1,49 @@
+"""
+billing/pagination.py
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+Each page is one indexed range scan (`WHERE (created_at, id) < cursor
+ORDER BY created_at DESC, id DESC LIMIT n`), so page N costs the same as
+page 1 however long the history grows. The cursor is an opaque,
+URL-safe token for the last row of the previous page.
+"""
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(obj) -> str:
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """Return (created_at, pk); raises ValueError for a malformed token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created, pk = (
+            base64.urlsafe_b64decode(padded.encode()).decode().split("|"))
+        return datetime.fromisoformat(created), int(pk)
+    except (UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+def keyset_page(queryset, cursor=None, size=25):
+    """
+    Return (items, next_cursor) for the page after `cursor`.
+    `next_cursor` is None on the last page.
+    """
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
+
+    items = list(queryset.order_by("-created_at", "-pk")[:size + 1])
+    if len(items) <= size:
+        return items, None
+    items = items[:size]
+    return items, encode_cursor(items[-1])
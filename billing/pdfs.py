@@ -0,0 +1,237 @@
+"""
+billing/pdfs.py
+reportlab builders for customer documents. Each builder takes
+already-loaded rows and returns the PDF as bytes; callers decide how
+to cache and serve it (see billing/documents.py).
+"""
+from io import BytesIO
+
+from django.utils.timezone import now
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import (
+    Paragraph,
+    SimpleDocTemplate,
+    Spacer,
+    Table,
+    TableStyle
+)
+
+
+def build_receipt_pdf(root, adjustments):
+    """
+    Detailed receipt for one payment chain. `adjustments` are the root's
+    children ordered by created_at; totals come from the root's
+    maintained running totals.
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        leftMargin=0.75 * inch,
+        rightMargin=0.75 * inch,
+        topMargin=0.75 * inch,
+        bottomMargin=0.75 * inch,
+    )
+    styles = getSampleStyleSheet()
+    elements = []
+
+    elements.append(
+        Paragraph("<b>Tucker & Dale’s Home Services</b>", styles["Title"])
+    )
+    elements.append(
+        Paragraph(
+            f"Receipt generated: {now().strftime('%Y-%m-%d %H:%M')}",
+            styles["Normal"],
+        )
+    )
+    elements.append(Spacer(1, 0.25 * inch))
+
+    elements.append(
+        Paragraph(
+            f"<b>Service Address:</b> {root.service_address}",
+            styles["Normal"],
+        )
+    )
+    elements.append(
+        Paragraph(
+            f"<b>Transaction ID:</b> {root.stripe_payment_id or 'N/A'}",
+            styles["Normal"],
+        )
+    )
+    elements.append(
+        Paragraph(f"<b>Status:</b> {root.status}", styles["Normal"])
+    )
+    elements.append(Spacer(1, 0.25 * inch))
+
+    def make_table(title, rows, color):
+        elements.append(Paragraph(f"<b>{title}</b>", styles["Heading4"]))
+        data = [["Date", "Description", "Amount (USD)"]] + rows
+        table = Table(data, colWidths=[1.5 * inch, 3.5 * inch, 1.5 * inch])
+        table.setStyle(
+            TableStyle(
+                [
+                    ("BACKGROUND", (0, 0), (-1, 0), color),
+                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+                    ("ALIGN", (2, 1), (2, -1), "RIGHT"),
+                    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ]
+            )
+        )
+        elements.append(table)
+        elements.append(Spacer(1, 0.15 * inch))
+
+    make_table(
+        "Original Services",
+        [[
+            root.created_at.strftime("%Y-%m-%d"),
+            root.notes or "Initial Booking Payment",
+            f"${root.amount:.2f}",
+        ]],
+        colors.green,
+    )
+
+    cancelled = [adj for adj in adjustments if adj.amount < 0]
+    if cancelled:
+        rows = [
+            [
+                adj.created_at.strftime("%Y-%m-%d"),
+                adj.notes or "Cancelled Service",
+                f"-${abs(adj.amount):.2f}",
+            ]
+            for adj in cancelled
+        ]
+        make_table("Cancelled / Refunded Services", rows, colors.red)
+
+    added = [adj for adj in adjustments if adj.amount > 0]
+    if added:
+        rows = [
+            [
+                adj.created_at.strftime("%Y-%m-%d"),
+                adj.notes or "Added Service",
+                f"${adj.amount:.2f}",
+            ]
+            for adj in added
+        ]
+        make_table("Added Services / Adjustments", rows, colors.blue)
+
+    original_total, add_total, cancel_total, net_total = (
+        root.compute_sections())
+
+    summary_rows = [
+        ["Original Total", f"${original_total:.2f}"],
+        ["Added Services", f"${add_total:.2f}"],
+        ["Cancelled / Refunded", f"-${abs(cancel_total):.2f}"],
+        ["Net Total", f"${net_total:.2f}"],
+    ]
+    summary_table = Table(summary_rows, colWidths=[4.5 * inch, 2.0 * inch])
+    summary_table.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, -1), colors.whitesmoke),
+                ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+                ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+                ("FONTNAME", (0, 3), (-1, 3), "Helvetica-Bold"),
+                ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+            ]
+        )
+    )
+    elements.append(Spacer(1, 0.2 * inch))
+    elements.append(Paragraph("<b>Summary</b>", styles["Heading4"]))
+    elements.append(summary_table)
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+
+def build_yearly_summary_pdf(username, year, rows):
+    """
+    Summary of every payment chain in `rows`, grouped by service address.
+    `rows` come from documents.yearly_summary_rows(): one dict per root
+    with its maintained totals and the per-address / grand totals.
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        leftMargin=0.75 * inch,
+        rightMargin=0.75 * inch,
+        topMargin=0.75 * inch,
+        bottomMargin=0.75 * inch,
+    )
+    styles = getSampleStyleSheet()
+    elements = []
+
+    elements.append(
+        Paragraph("<b>Tucker & Dale’s Home Services</b>", styles["Title"]))
+    elements.append(
+        Paragraph(f"Annual Summary for {username} ({year})",
+                  styles["Normal"]))
+    elements.append(
+        Paragraph(
+            f"Generated: {now().strftime('%Y-%m-%d %H:%M')}", styles["Normal"])
+    )
+    elements.append(Spacer(1, 0.3 * inch))
+
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row["service_address"], []).append(row)
+
+    for address, chains in grouped.items():
+        elements.append(Paragraph(f"<b>🏠 {address}</b>", styles["Heading2"]))
+        elements.append(Spacer(1, 0.1 * inch))
+
+        for row in chains:
+            add_total = row["added_total_amt"]
+            cancel_total = row["cancelled_total_amt"]
+            data = [
+                ["Date", "Original", "Added", "Refunded", "Adjusted Total"],
+                [
+                    row["created_at"].strftime("%Y-%m-%d"),
+                    f"${row['amount']:.2f}",
+                    f"+${add_total:.2f}" if add_total > 0 else "$0.00",
+                    f"-${abs(cancel_total):.2f}" if cancel_total else "$0.00",
+                    f"${row['net_total_amt']:.2f}",
+                ],
+            ]
+            table = Table(
+                data,
+                colWidths=[1.3 * inch, 1.3 * inch,
+                           1.3 * inch, 1.3 * inch, 1.3 * inch],
+            )
+            table.setStyle(
+                TableStyle(
+                    [
+                        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+                        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                        ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+                        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+                    ]
+                )
+            )
+            elements.append(table)
+            elements.append(Spacer(1, 0.1 * inch))
+
+        elements.append(
+            Paragraph(
+                f"<b>Total for {address}:</b> "
+                f"${chains[0]['address_total']:.2f}",
+                styles["Normal"])
+        )
+        elements.append(Spacer(1, 0.3 * inch))
+
+    grand_total = rows[0]["grand_total"] if rows else 0
+
+    elements.append(Spacer(1, 0.5 * inch))
+    elements.append(
+        Paragraph("<b>Grand Total Across All Properties</b>",
+                  styles["Heading3"]))
+    elements.append(Paragraph(f"<b>${grand_total:.2f}</b>", styles["Title"]))
+    elements.append(Spacer(1, 0.3 * inch))
+
+    doc.build(elements)
+    return buffer.getvalue()
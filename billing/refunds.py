@@ -0,0 +1,199 @@
+"""
+billing/refunds.py
+Bulk refunds requested from the Payment admin.
+
+The admin action only records a RefundBatch with one item per payment.
+`manage.py process_refund_batches` claims queued batches and issues the
+refunds with a small thread pool: threads only talk to Stripe, every
+database write happens on the worker's main thread. Each refund carries
+the payment's idempotency key, so a batch that is retried after a crash
+never refunds the same payment twice.
+"""
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import gateway
+from .models import Payment, RefundBatch, RefundBatchItem
+
+logger = logging.getLogger(__name__)
+
+# A running batch that hasn't been touched for this long is assumed to
+# belong to a dead worker and may be claimed again.
+STALE_BATCH_MINUTES = 15
+
+
+def enqueue_batch(payments, *, requested_by=None):
+    """
+    Record a batch for `payments`. Payments that cannot be refunded are
+    logged as skipped straight away.
+    """
+    with transaction.atomic():
+        batch = RefundBatch.objects.create(requested_by=requested_by)
+        items = []
+        for payment in payments:
+            item = RefundBatchItem(batch=batch, payment=payment)
+            if payment.status != Payment.Status.SUCCEEDED:
+                item.status = RefundBatchItem.Status.SKIPPED
+                item.message = f"Payment is {payment.status}."
+            elif not payment.stripe_payment_intent_id:
+                item.status = RefundBatchItem.Status.SKIPPED
+                item.message = "No Stripe payment intent ID."
+            items.append(item)
+        RefundBatchItem.objects.bulk_create(items)
+
+        batch.total = len(items)
+        batch.skipped = sum(
+            1 for item in items
+            if item.status == RefundBatchItem.Status.SKIPPED
+        )
+        batch.save(update_fields=["total", "skipped", "updated_at"])
+    return batch
+
+
+def claim_batch():
+    """
+    Claim the oldest queued batch (or a stale running one) for this
+    worker. Uses SKIP LOCKED where supported so workers never share one.
+    """
+    stale = timezone.now() - timedelta(minutes=STALE_BATCH_MINUTES)
+    claimable = Q(status=RefundBatch.Status.QUEUED) | Q(
+        status=RefundBatch.Status.RUNNING, updated_at__lt=stale
+    )
+
+    with transaction.atomic():
+        batch = (
+            RefundBatch.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by("created_at")
+            .first()
+        )
+        if batch is None:
+            return None
+        batch.status = RefundBatch.Status.RUNNING
+        batch.started_at = batch.started_at or timezone.now()
+        batch.save(update_fields=["status", "started_at", "updated_at"])
+    return batch
+
+
+def _issue_refund(payment):
+    """Runs in a pool thread: Stripe only, no database access."""
+    return gateway.create_refund(
+        payment_intent=payment.stripe_payment_intent_id,
+        reason="requested_by_customer",
+        idempotency_key=gateway.payment_refund_key(payment),
+    )
+
+
+def _record(batch, item, *, refund=None, error=None, skipped=None):
+    item.processed_at = timezone.now()
+    if skipped is not None:
+        item.status = RefundBatchItem.Status.SKIPPED
+        item.message = skipped
+        counter = "skipped"
+    elif error is None:
+        item.status = RefundBatchItem.Status.SUCCEEDED
+        item.refund_id = refund.id
+        counter = "succeeded"
+    else:
+        item.status = RefundBatchItem.Status.FAILED
+        item.message = str(error)[:2000]
+        counter = "failed"
+
+    with transaction.atomic():
+        if refund is not None:
+            item.payment.mark_refunded(refund.id)
+        item.save(update_fields=[
+            "status", "refund_id", "message", "processed_at"])
+        RefundBatch.objects.filter(pk=batch.pk).update(
+            **{counter: F(counter) + 1},
+            updated_at=timezone.now(),
+        )
+
+
+def _record_safely(batch, item, **result):
+    """
+    _record() one item; returns False instead of raising so one bad write
+    doesn't lose the results of the other items.
+    """
+    try:
+        _record(batch, item, **result)
+    except Exception:
+        logger.exception(
+            "Could not record refund result for payment %s in batch %s",
+            item.payment_id, batch.pk)
+        return False
+    return True
+
+
+def execute_batch(batch, *, concurrency=4):
+    """
+    Refund every pending item of a claimed batch with at most
+    `concurrency` Stripe calls in flight, then mark the batch finished.
+
+    Payments refunded since the batch was queued are skipped. If any
+    result cannot be recorded, its item stays pending and the batch is
+    left running, so it is claimed again once stale; the idempotency key
+    makes the repeated Stripe call return the same refund.
+    """
+    items = []
+    unrecorded = 0
+    for item in (
+        batch.items.filter(status=RefundBatchItem.Status.PENDING)
+        .select_related("payment")
+    ):
+        if item.payment.status != Payment.Status.SUCCEEDED:
+            if not _record_safely(
+                    batch, item, skipped=f"Payment is {item.payment.status}."):
+                unrecorded += 1
+        else:
+            items.append(item)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {
+                pool.submit(_issue_refund, item.payment): item
+                for item in items
+            }
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    refund = future.result()
+                except Exception as e:
+                    logger.warning(
+                        "Refund failed for payment %s in batch %s: %s",
+                        item.payment_id, batch.pk, e)
+                    result = {"error": e}
+                else:
+                    result = {"refund": refund}
+                if not _record_safely(batch, item, **result):
+                    unrecorded += 1
+    except Exception as e:
+        # Leave it running; it is claimed again once stale.
+        RefundBatch.objects.filter(pk=batch.pk).update(
+            error=str(e)[:2000],
+            updated_at=timezone.now(),
+        )
+        raise
+
+    if unrecorded:
+        RefundBatch.objects.filter(pk=batch.pk).update(
+            error=f"{unrecorded} result(s) could not be recorded; "
+                  "the batch will be retried.",
+            updated_at=timezone.now(),
+        )
+    else:
+        RefundBatch.objects.filter(pk=batch.pk).update(
+            status=RefundBatch.Status.COMPLETED,
+            error="",
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    batch.refresh_from_db()
+    return batch
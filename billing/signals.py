@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from billing.models import AddressLedger, PaymentHistory
+
+
+@receiver(post_delete, sender=PaymentHistory)
+def back_out_deleted_payment(sender, instance, **kwargs):
+    """
+    Remove a deleted row's amount from its root's running totals and
+    from the address ledger. Covers admin and queryset deletes too.
+    """
+    with transaction.atomic():
+        AddressLedger.objects.record_payment(
+            instance.user_id, instance.service_address, instance.amount,
+            reverse=True,
+        )
+        if instance.parent_id is not None:
+            # A no-op when the root itself is being deleted (cascade).
+            PaymentHistory.objects.record_adjustments(
+                instance.parent_id, [], removed=[instance.amount])
+            instance._mark_chain_stale()
@@ -0,0 +1,456 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from billing import webhooks
+from billing.models import (
+    AddressLedger,
+    Cart,
+    CartItem,
+    PaymentHistory,
+    StripeWebhookEvent,
+)
+from billing.views import _materialize_bookings
+from scheduling.models import (
+    Booking,
+    Employee,
+    JobAssignment,
+    ServiceCategory,
+    SlotHold,
+    TimeSlot,
+)
+
+User = get_user_model()
+
+
+class PaymentHistoryQueryBudgetTests(TestCase):
+    """
+    payment_history loads a page of chains with a fixed number of
+    queries (page, adjustment and booking prefetches, ledgers), however
+    many chains, adjustments and bookings the user has.
+    """
+
+    # Queries for a full page: session, user, the root page, the two
+    # prefetches, ledgers, and the navbar cart lookups.
+    QUERY_BUDGET = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        # Staff users skip the verified-email check.
+        cls.user = User.objects.create_user(
+            "history", "history@example.com", "pw", is_staff=True)
+        cls.category = ServiceCategory.objects.create(name="Lawn Care")
+        cls.employee = Employee.objects.create(
+            name="Dale",
+            home_address="1 Main St, Dallas, TX 75201",
+            service_category=cls.category,
+        )
+        cls.slots = [
+            TimeSlot.objects.create(label="7:30-9:30"),
+            TimeSlot.objects.create(label="10:00-12:00"),
+        ]
+        cls.next_day = date.today() + timedelta(days=30)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        # The first visit creates the user's cart; measure steady state.
+        self.client.get(reverse("billing:payment_history"))
+
+    def add_chain(self, address, adjustments=2, bookings=2):
+        root = PaymentHistory.objects.create(
+            user=self.user,
+            amount=Decimal("120.00"),
+            service_address=address,
+            status="Paid",
+        )
+        for _ in range(bookings):
+            Booking.objects.create(
+                user=self.user,
+                service_address=address,
+                date=self.next_day,
+                time_slot=self.slots[0],
+                service_category=self.category,
+                employee=self.employee,
+                total_amount=Decimal("60.00"),
+                primary_payment_record=root,
+            )
+            self.slots.reverse()
+            if self.slots[0].label == "7:30-9:30":
+                self.next_day += timedelta(days=1)
+        for i in range(adjustments):
+            PaymentHistory.objects.create(
+                user=self.user,
+                parent=root,
+                amount=Decimal("15.00") if i % 2 == 0 else Decimal("-10.00"),
+                service_address=address,
+                status="Paid" if i % 2 == 0 else "Refunded",
+                payment_type="ADJUSTMENT",
+            )
+        return root
+
+    def history_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("billing:payment_history"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.add_chain("1 Elm St, Dallas, TX 75201")
+        baseline = self.history_queries()
+
+        for n in range(6):
+            self.add_chain(
+                f"{n % 3 + 2} Oak Ave, Plano, TX 75024",
+                adjustments=3,
+                bookings=2,
+            )
+        self.assertEqual(self.history_queries(), baseline)
+
+    def test_full_page_within_budget(self):
+        for n in range(8):
+            self.add_chain(f"{n % 4 + 1} Elm St, Dallas, TX 75201")
+
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(reverse("billing:payment_history"))
+        self.assertEqual(response.status_code, 200)
+
+
+class PaymentHistoryChainTotalsTests(TestCase):
+    """Child edits and deletes keep the root's running totals in step."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("chain", "chain@example.com")
+        self.root = PaymentHistory.objects.create(
+            user=self.user,
+            amount=Decimal("100.00"),
+            service_address="9 Birch St, Dallas, TX 75201",
+        )
+
+    def add_child(self, amount, status="Adjustment"):
+        return PaymentHistory.objects.create(
+            user=self.user,
+            parent=self.root,
+            amount=Decimal(amount),
+            service_address=self.root.service_address,
+            status=status,
+        )
+
+    def assertTotals(self, added, cancelled, net):
+        root = PaymentHistory.objects.get(pk=self.root.pk)
+        self.assertEqual(
+            root.compute_sections()[1:],
+            (Decimal(added), Decimal(cancelled), Decimal(net)),
+        )
+        self.assertEqual(root.adjustments_total_amt,
+                         Decimal(added) + Decimal(cancelled))
+
+    def test_editing_a_child_amount_applies_the_delta(self):
+        child = self.add_child("15.00")
+        child.amount = Decimal("-10.00")
+        child.status = "Refunded"
+        child.save()
+
+        self.assertTotals("0.00", "-10.00", "90.00")
+
+    def test_deleting_a_child_backs_out_its_amount(self):
+        self.add_child("15.00")
+        self.add_child("-10.00", status="Refunded").delete()
+        self.assertTotals("15.00", "0.00", "115.00")
+
+        PaymentHistory.objects.filter(parent=self.root).delete()
+        self.assertTotals("0.00", "0.00", "100.00")
+
+    def test_compute_sections_sees_updates_made_through_the_instance(self):
+        child = self.add_child("15.00")
+        self.assertEqual(self.root.compute_sections()[3], Decimal("115.00"))
+
+        child.amount = Decimal("25.00")
+        child.save()
+        self.assertEqual(self.root.compute_sections()[3], Decimal("125.00"))
+
+
+@mock.patch("billing.views.gateway.create_refund")
+class CancelSelectedServicesTests(TestCase):
+    """cancel_selected_services refunds each booking exactly once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            "canceller", "canceller@example.com", "pw", is_staff=True)
+        cls.category = ServiceCategory.objects.create(name="Gutters")
+        cls.employee = Employee.objects.create(
+            name="Tucker",
+            home_address="2 Main St, Dallas, TX 75201",
+            service_category=cls.category,
+        )
+        cls.slot = TimeSlot.objects.create(label="10:00-12:00")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.day = date.today() + timedelta(days=30)
+
+    def add_root(self, address, intent, bookings):
+        root = PaymentHistory.objects.create(
+            user=self.user,
+            amount=Decimal("60.00") * bookings,
+            service_address=address,
+            stripe_payment_id=intent,
+        )
+        created = []
+        for _ in range(bookings):
+            created.append(Booking.objects.create(
+                user=self.user,
+                service_address=address,
+                date=self.day,
+                time_slot=self.slot,
+                service_category=self.category,
+                employee=self.employee,
+                total_amount=Decimal("60.00"),
+                primary_payment_record=root,
+            ))
+            self.day += timedelta(days=1)
+        AddressLedger.objects.record_bookings(
+            self.user.id, address, active=bookings)
+        return root, created
+
+    def cancel(self, bookings):
+        return self.client.post(
+            reverse("billing:cancel_selected_services"),
+            {"selected_bookings": [b.pk for b in bookings]},
+        )
+
+    def refund_rows(self):
+        return PaymentHistory.objects.filter(
+            user=self.user, parent__isnull=False)
+
+    def test_double_submit_refunds_once(self, create_refund):
+        create_refund.return_value = SimpleNamespace(id="re_1")
+        _, bookings = self.add_root("1 Elm St", "pi_double", 2)
+
+        self.cancel(bookings)
+        self.cancel(bookings)
+
+        create_refund.assert_called_once()
+        self.assertEqual(self.refund_rows().count(), 2)
+        self.assertFalse(
+            Booking.objects.exclude(status="Cancelled").exists())
+
+    def test_one_refund_per_root_payment(self, create_refund):
+        create_refund.side_effect = [
+            SimpleNamespace(id="re_a"), SimpleNamespace(id="re_b")]
+        _, first = self.add_root("1 Elm St", "pi_first", 2)
+        _, second = self.add_root("2 Oak Ave", "pi_second", 1)
+
+        self.cancel(first + second)
+
+        calls = {
+            c.kwargs["payment_intent"]: c.kwargs
+            for c in create_refund.call_args_list
+        }
+        self.assertEqual(set(calls), {"pi_first", "pi_second"})
+        self.assertEqual(calls["pi_first"]["amount"], 12000)
+        self.assertEqual(calls["pi_second"]["amount"], 6000)
+        self.assertNotEqual(calls["pi_first"]["idempotency_key"],
+                            calls["pi_second"]["idempotency_key"])
+
+    def test_chain_totals_and_ledger_follow_the_refunds(self, create_refund):
+        create_refund.return_value = SimpleNamespace(id="re_1")
+        root, bookings = self.add_root("1 Elm St", "pi_totals", 2)
+
+        self.cancel(bookings[:1])
+
+        root.refresh_from_db()
+        self.assertEqual(root.cancelled_total_amt, Decimal("-60.00"))
+        self.assertEqual(root.net_total_amt, Decimal("60.00"))
+
+        ledger = AddressLedger.objects.get(
+            user=self.user, address_key="1 elm st")
+        self.assertEqual(ledger.paid_total, Decimal("120.00"))
+        self.assertEqual(ledger.refund_total, Decimal("60.00"))
+        self.assertEqual(ledger.net_total, Decimal("60.00"))
+        self.assertEqual(
+            (ledger.active_bookings, ledger.cancelled_bookings), (1, 1))
+
+
+class CheckoutBookingTests(TestCase):
+    """Paid carts become bookings; taken slots are refunded, not booked."""
+
+    address = "5 Cedar Ln, Dallas, TX 75201"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            "buyer", "buyer@example.com", "pw", is_staff=True)
+        cls.other = User.objects.create_user("rival", "rival@example.com")
+        cls.category = ServiceCategory.objects.create(name="Pressure Washing")
+        cls.employee = Employee.objects.create(
+            name="Dale",
+            home_address="1 Main St, Dallas, TX 75201",
+            service_category=cls.category,
+        )
+        cls.slots = [
+            TimeSlot.objects.create(label="7:30-9:30"),
+            TimeSlot.objects.create(label="10:00-12:00"),
+        ]
+        cls.day = date.today() + timedelta(days=14)
+
+    def make_cart(self, user=None):
+        cart = Cart.objects.create(
+            user=user or self.user, address_key=self.address)
+        for slot in self.slots:
+            CartItem.objects.create(
+                cart=cart,
+                service_address=self.address,
+                service_category=self.category,
+                employee=self.employee,
+                time_slot=slot,
+                date=self.day,
+                unit_price=Decimal("50.00"),
+            )
+        return cart
+
+    def test_materialize_bookings_writes_everything_for_the_cart(self):
+        cart = self.make_cart()
+        root = PaymentHistory.objects.create(
+            user=self.user, amount=cart.total, service_address=self.address)
+
+        bookings = _materialize_bookings(
+            self.user, root, self.address, list(cart.items.all()))
+
+        self.assertEqual(len(bookings), 2)
+        self.assertEqual(
+            set(Booking.objects.filter(primary_payment_record=root)
+                .values_list("time_slot_id", "status", "total_amount")),
+            {(slot.pk, "Booked", Decimal("50.00")) for slot in self.slots},
+        )
+        self.assertTrue(all(b.starts_at for b in bookings))
+        self.assertEqual(
+            JobAssignment.objects.filter(
+                booking__in=bookings,
+                employee=self.employee,
+                jobsite_address=self.address,
+            ).count(),
+            2,
+        )
+        self.assertEqual(
+            set(root.linked_bookings.values_list("pk", flat=True)),
+            {b.pk for b in bookings},
+        )
+        ledger = AddressLedger.objects.get(
+            user=self.user, address_key=AddressLedger.key_for(self.address))
+        self.assertEqual(ledger.active_bookings, 2)
+
+    def test_slot_hold_blocks_a_second_cart_until_it_expires(self):
+        mine = self.make_cart().items.first()
+        theirs = CartItem.objects.create(
+            cart=Cart.objects.create(user=self.other),
+            service_category=self.category,
+            employee=self.employee,
+            time_slot=mine.time_slot,
+            date=mine.date,
+        )
+
+        self.assertTrue(SlotHold.objects.acquire(mine))
+        self.assertTrue(SlotHold.objects.acquire(mine))  # refresh
+        self.assertFalse(SlotHold.objects.acquire(theirs))
+
+        SlotHold.objects.filter(cart_item=mine).update(
+            expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(SlotHold.objects.acquire(theirs))
+
+    @mock.patch("billing.views.gateway.create_refund")
+    @mock.patch("billing.views.gateway.retrieve_checkout_session")
+    def test_taken_slot_at_checkout_refunds_the_paid_items(
+            self, retrieve_session, create_refund):
+        cart = self.make_cart()
+        paid = cart.total
+        Booking.objects.create(
+            user=self.other,
+            service_address="9 Other St",
+            date=self.day,
+            time_slot=self.slots[0],
+            service_category=self.category,
+            employee=self.employee,
+        )
+        retrieve_session.return_value = SimpleNamespace(
+            payment_status="paid",
+            payment_intent="pi_taken",
+            metadata={"cart_id": str(cart.pk),
+                      "service_address": self.address},
+        )
+        create_refund.return_value = SimpleNamespace(id="re_taken")
+        self.client.force_login(self.user)
+
+        response = self.client.get(
+            reverse("billing:payment_success"), {"session_id": "cs_1"})
+
+        self.assertRedirects(
+            response, reverse("scheduling:search_by_date"),
+            fetch_redirect_response=False)
+        root = PaymentHistory.objects.get(stripe_payment_id="pi_taken")
+        self.assertFalse(root.linked_bookings_direct.exists())
+        create_refund.assert_called_once()
+        self.assertEqual(create_refund.call_args.kwargs["amount"],
+                         int(paid * 100))
+        self.assertEqual(
+            list(root.adjustments.values_list(
+                "amount", "status", "stripe_refund_id")),
+            [(-paid, "Refunded", "re_taken")],
+        )
+        root.refresh_from_db()
+        self.assertEqual(root.net_total_amt, Decimal("0.00"))
+        self.assertFalse(Cart.objects.filter(pk=cart.pk).exists())
+
+
+class WebhookRetryTests(TestCase):
+    """A failing handler is retried with backoff, then parked as failed."""
+
+    def setUp(self):
+        self.event = StripeWebhookEvent.objects.create(
+            event_id="evt_retry",
+            event_type="test.failing",
+            stripe_created=timezone.now(),
+        )
+
+    def make_due(self):
+        StripeWebhookEvent.objects.filter(pk=self.event.pk).update(
+            next_attempt_at=timezone.now())
+
+    @mock.patch.dict(
+        webhooks.HANDLERS,
+        {"test.failing": mock.Mock(side_effect=RuntimeError("boom"))},
+    )
+    def test_backs_off_then_fails_after_max_attempts(self):
+        with self.assertLogs(webhooks.logger, "ERROR"):
+            self.run_until_failed()
+
+        self.make_due()
+        self.assertEqual(webhooks.process_pending(), (0, 0, 0))
+
+    def run_until_failed(self):
+        for attempt in range(1, webhooks.MAX_ATTEMPTS):
+            before = timezone.now()
+            self.assertEqual(webhooks.process_pending(), (0, 0, 1))
+            self.event.refresh_from_db()
+            self.assertEqual(self.event.status, "pending")
+            self.assertEqual(self.event.attempts, attempt)
+            self.assertEqual(self.event.last_error, "boom")
+            self.assertGreaterEqual(
+                self.event.next_attempt_at,
+                before + webhooks.retry_delay(attempt))
+            # Not due yet: nothing to do.
+            self.assertEqual(webhooks.process_pending(), (0, 0, 0))
+            self.make_due()
+
+        self.assertEqual(webhooks.process_pending(), (0, 0, 1))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.status, "failed")
+        self.assertEqual(self.event.attempts, webhooks.MAX_ATTEMPTS)
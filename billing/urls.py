@@ -24,6 +24,8 @@ urlpatterns = [
          name="submit_adjustment"),
     path("summary/pdf/", views.download_yearly_summary_pdf,
          name="download_yearly_summary_pdf"),
+    path("summary/jobs/<int:job_id>/", views.document_job_status,
+         name="document_job_status"),
     path("receipt/pdf/<int:pk>/", views.download_receipt_pdf,
          name="download_receipt_pdf"),
 
@@ -39,5 +41,9 @@ urlpatterns = [
          name="all_payments_admin"),
     path("admin/refund/<int:pk>/", views.refund_payment,
          name="refund_payment"),
+    path("admin/refund-batches/<int:batch_id>/",
+         views.refund_batch_progress, name="refund_batch_progress"),
+    path("admin/export/<slug:dataset>/", views.export_records,
+         name="export_records"),
     path("webhook/", views.stripe_webhook, name="stripe_webhook"),
 ]
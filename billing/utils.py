@@ -1,11 +1,10 @@
 __all__ = ["_get_or_create_cart",
            "get_service_address", "lock_service_address"]
 import logging
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from django.conf import settings
 
+from decimal import Decimal
 from typing import Optional
 from datetime import datetime
 from urllib.parse import urlencode
@@ -13,6 +12,7 @@ from django.utils import timezone
 from django.utils.timezone import now
 from django.urls import reverse
 from billing.models import Cart
+from core.outbox import enqueue_email
 
 logger = logging.getLogger(__name__)
 
@@ -230,12 +230,18 @@ def merge_session_cart(old_session_key: str, user) -> Optional[Cart]:
             item.save(update_fields=["cart"])
             moved += 1
         sc.delete()
+    if moved:
+        main.touch()
 
     # Pin merged cart to session
     # NOTE: we cannot access request here directly; caller should set cart_id.
     return main
 
 
+# Customer-facing label for each refund percentage.
+REFUND_TIER_LABELS = {100: "Cancellable", 50: "Late Cancel", 0: "Locked"}
+
+
 def get_refund_policy(booking_datetime):
     """
     Determine refund eligibility and percentage based on time before service.
@@ -265,7 +271,7 @@ def get_refund_policy(booking_datetime):
 
 
 def send_payment_receipt_email(user, payment_record, bookings, request=None):
-    """Send a payment confirmation email after Stripe checkout."""
+    """Queue a payment confirmation email after Stripe checkout."""
     subject = "Your Receipt from Tucker & Dale’s Home Services"
 
     payment_history_url = ""
@@ -292,54 +298,64 @@ def send_payment_receipt_email(user, payment_record, bookings, request=None):
     html_message = render_to_string("emails/payment_receipt.html", context)
     plain_message = strip_tags(html_message)
 
-    send_mail(
+    enqueue_email(
         subject,
         plain_message,
-        settings.DEFAULT_FROM_EMAIL,
         [user.email],
-        html_message=html_message,
-        fail_silently=False,
+        html=html_message,
+        dedupe_key=f"receipt:{payment_record.pk}:{len(bookings)}",
     )
 
 
-def send_refund_confirmation_email(user, refund_record):
+def send_refund_summary_email(user, refund_records):
     """
-    Sends an email confirmation when a refund or cancellation is processed.
+    Queues one confirmation covering every refund / cancellation row
+    written by a single multi-service cancellation.
     """
+    if not refund_records:
+        return
+
     subject = "Your Tucker & Dale’s Refund Confirmation"
+    total = sum((abs(r.amount) for r in refund_records), Decimal("0.00"))
+    addresses = sorted({r.service_address or "Unknown Address"
+                        for r in refund_records})
+    statuses = sorted({r.status for r in refund_records})
+    lines = [
+        f"{r.booking.service_category} on {r.booking.date}: "
+        f"${abs(r.amount):.2f} ({r.status})"
+        for r in refund_records
+    ]
+    date = refund_records[0].created_at.strftime("%Y-%m-%d %H:%M")
 
-    # Build email context safely
     context = {
         "user": user,
-        "address": refund_record.service_address or "Unknown Address",
-        "amount": abs(refund_record.amount),
-        "status": refund_record.status,
-        "notes": refund_record.notes or "Refund processed successfully.",
-        "date": refund_record.created_at.strftime("%Y-%m-%d %H:%M"),
+        "address": "; ".join(addresses),
+        "amount": total,
+        "status": ", ".join(statuses),
+        "notes": "; ".join(lines),
+        "date": date,
     }
-
-    # ✅ HTML + Plain text versions
     html_body = render_to_string(
         "billing/email_refund_confirmation.html", context)
 
     text_body = (
         f"Hello {user.first_name or user.username},\n\n"
-        f"Your refund for services at {context['address']} "
-        f"has been processed successfully.\n"
-        f"Refund amount: ${context['amount']:.2f}\n"
-        f"Status: {context['status']}\n"
-        f"Date: {context['date']}\n\n"
+        f"Your cancellation of {len(refund_records)} service(s) at "
+        f"{context['address']} has been processed.\n\n"
+        + "\n".join(f"- {line}" for line in lines)
+        + f"\n\nTotal refund: ${total:.2f}\n"
+        f"Date: {date}\n\n"
         f"Thank you for choosing Tucker & Dale’s Home Services!"
     )
 
-    # ✅ Send both formats
-    send_mail(
+    enqueue_email(
         subject,
         text_body,
-        settings.DEFAULT_FROM_EMAIL,
         [user.email],
-        html_message=html_body,
-        fail_silently=False,
+        html=html_body,
+        dedupe_key=(
+            f"refund-batch:{refund_records[0].pk}:{len(refund_records)}"),
     )
 
-    logger.info("Sent refund confirmation to %s", user.email)
+    logger.info("Queued refund summary to %s (%s rows)",
+                user.email, len(refund_records))
@@ -3,7 +3,6 @@ billing/views.py
 Handles checkout, Stripe integration, payment tracking, and admin management.
 """
 import logging
-from io import BytesIO
 from datetime import datetime as dt
 from decimal import Decimal
 
@@ -12,14 +11,16 @@ import stripe
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db import models, transaction
-from django.db.models import Sum
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Concat
 from django.http import (
-    FileResponse,
     Http404,
     HttpResponse,
     HttpResponseBadRequest,
     JsonResponse,
+    StreamingHttpResponse,
 )
 from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, redirect, render
@@ -30,29 +31,41 @@ from django.utils.timezone import localdate, now
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.platypus import (
-    Paragraph,
-    SimpleDocTemplate,
-    Spacer,
-    Table,
-    TableStyle
+from billing.constants import SALES_TAX_RATE, SERVICE_PRICES
+from billing.models import (
+    AddressLedger,
+    Cart,
+    CartItem,
+    DocumentJob,
+    GeneratedDocument,
+    Payment,
+    PaymentHistory,
+    PaymentPayload,
+    RefundBatch,
 )
-
-from billing.constants import SERVICE_PRICES
-from billing.models import Cart, CartItem, Payment, PaymentHistory
-from billing.utils import send_payment_receipt_email
+from billing.utils import (
+    send_payment_receipt_email,
+    send_refund_summary_email,
+)
+from billing import documents, exports, gateway
+from billing.pagination import keyset_page
+from billing.pdfs import build_receipt_pdf
+from billing.webhooks import store_event
 
 from core.decorators import verified_email_required, login_required_json
-from scheduling.models import Booking
-from .utils import _get_or_create_cart, normalize_address, get_refund_policy
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from scheduling.models import Booking, JobAssignment, SlotHold
+from .utils import (
+    REFUND_TIER_LABELS,
+    _get_or_create_cart,
+    get_refund_policy,
+    normalize_address,
+)
 
 PENALTY_WINDOW_HOURS = 72
+PAYMENT_HISTORY_PAGE_SIZE = 20
+ALL_PAYMENTS_PAGE_SIZE = 50
+TOTAL_VOLUME_CACHE_KEY = "billing:all_payments:total_volume"
+TOTAL_VOLUME_CACHE_TTL = 60 * 5  # 5 minutes
 
 logger = logging.getLogger(__name__)
 
@@ -100,6 +113,7 @@ def checkout(request):
         ids_to_remove = request.POST.getlist("selected_items")
         if ids_to_remove:
             CartItem.objects.filter(cart=cart, id__in=ids_to_remove).delete()
+            cart.touch()
             cart.refresh_from_db()
             messages.success(
                 request,
@@ -240,8 +254,6 @@ def create_checkout_session(request):
     from billing.utils import get_active_cart_for_request
     from customers.models import CustomerProfile
 
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-
     cart = get_active_cart_for_request(request, create_if_missing=False)
     if not cart or not cart.items.exists():
         messages.warning(request, "Your cart is empty.")
@@ -284,6 +296,9 @@ def create_checkout_session(request):
     request.session["cart_id"] = cart.pk
     request.session.modified = True
 
+    # Keep the cart's slots reserved while the customer is on Stripe.
+    SlotHold.objects.extend_for_cart(cart)
+
     success_url = (
         request.build_absolute_uri(reverse("billing:payment_success"))
         + "?session_id={CHECKOUT_SESSION_ID}"
@@ -328,7 +343,10 @@ def create_checkout_session(request):
         if customer_email:
             session_kwargs["customer_email"] = customer_email
 
-        checkout_session = stripe.checkout.Session.create(**session_kwargs)
+        checkout_session = gateway.create_checkout_session(
+            idempotency_key=gateway.checkout_key(cart, session_kwargs),
+            **session_kwargs,
+        )
 
         request.session["last_checkout_session_id"] = checkout_session.id
         request.session.modified = True
@@ -352,267 +370,101 @@ def payment_cancel(request):
     return redirect("billing:checkout")
 
 
-# ----------------------------------------------------------------------
-# 🧾 Payment History helpers
-# ----------------------------------------------------------------------
-def _refresh_booking_statuses_for_user(user):
-    """Auto-refresh status for user's bookings (Completed / Active)."""
-    today = now().date()
-    bookings = Booking.objects.filter(user=user)
-    for booking in bookings:
-        if booking.date < today and booking.status != "Completed":
-            booking.status = "Completed"
-            booking.save(update_fields=["status"])
-        elif booking.date >= today and booking.status == "Completed":
-            booking.status = "Booked"
-            booking.save(update_fields=["status"])
-
-
 # ----------------------------------------------------------------------
 # 🧾 Download receipt PDF
 # ----------------------------------------------------------------------
 @login_required
 @verified_email_required
 def download_receipt_pdf(request, pk):
-    """Generate a detailed PDF receipt with grouped adjustments."""
+    """
+    Detailed PDF receipt with grouped adjustments. The rendered PDF is
+    stored per chain_version, so repeat downloads skip reportlab and
+    revalidate with ETag / Range.
+    """
     root = get_object_or_404(
         PaymentHistory, id=pk, user=request.user, parent__isnull=True
     )
 
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        leftMargin=0.75 * inch,
-        rightMargin=0.75 * inch,
-        topMargin=0.75 * inch,
-        bottomMargin=0.75 * inch,
+    key_prefix = f"receipt:{root.pk}:"
+    doc = documents.get_or_build(
+        GeneratedDocument.Kind.RECEIPT,
+        f"{key_prefix}v{root.chain_version}",
+        request.user,
+        lambda: build_receipt_pdf(
+            root, list(root.adjustments.order_by("created_at"))),
+        stale_prefix=key_prefix,
     )
-    styles = getSampleStyleSheet()
-    elements = []
-
-    elements.append(
-        Paragraph("<b>Tucker & Dale’s Home Services</b>", styles["Title"])
-    )
-    elements.append(
-        Paragraph(
-            f"Receipt generated: {now().strftime('%Y-%m-%d %H:%M')}",
-            styles["Normal"],
-        )
-    )
-    elements.append(Spacer(1, 0.25 * inch))
-
-    elements.append(
-        Paragraph(
-            f"<b>Service Address:</b> {root.service_address}",
-            styles["Normal"],
-        )
-    )
-    elements.append(
-        Paragraph(
-            f"<b>Transaction ID:</b> {root.stripe_payment_id or 'N/A'}",
-            styles["Normal"],
-        )
-    )
-    elements.append(
-        Paragraph(f"<b>Status:</b> {root.status}", styles["Normal"])
-    )
-    elements.append(Spacer(1, 0.25 * inch))
-
-    def make_table(title, rows, color):
-        elements.append(Paragraph(f"<b>{title}</b>", styles["Heading4"]))
-        data = [["Date", "Description", "Amount (USD)"]] + rows
-        table = Table(data, colWidths=[1.5 * inch, 3.5 * inch, 1.5 * inch])
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), color),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-                    ("ALIGN", (2, 1), (2, -1), "RIGHT"),
-                    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ]
-            )
-        )
-        elements.append(table)
-        elements.append(Spacer(1, 0.15 * inch))
-
-    make_table(
-        "Original Services",
-        [[
-            root.created_at.strftime("%Y-%m-%d"),
-            root.notes or "Initial Booking Payment",
-            f"${root.amount:.2f}",
-        ]],
-        colors.green,
-    )
-
-    cancelled = PaymentHistory.objects.filter(
-        parent=root,
-        amount__lt=0,
-    ).order_by("created_at")
-
-    if cancelled.exists():
-        rows = [
-            [
-                adj.created_at.strftime("%Y-%m-%d"),
-                adj.notes or "Cancelled Service",
-                f"-${abs(adj.amount):.2f}",
-            ]
-            for adj in cancelled
-        ]
-        make_table("Cancelled / Refunded Services", rows, colors.red)
-
-    added = PaymentHistory.objects.filter(
-        parent=root,
-        amount__gt=0,
-    ).order_by("created_at")
-
-    if added.exists():
-        rows = [
-            [
-                adj.created_at.strftime("%Y-%m-%d"),
-                adj.notes or "Added Service",
-                f"${adj.amount:.2f}",
-            ]
-            for adj in added
-        ]
-        make_table("Added Services / Adjustments", rows, colors.blue)
-
-    original_total, add_total, cancel_total, net_total = (
-        root.compute_sections())
-
-    summary_rows = [
-        ["Original Total", f"${original_total:.2f}"],
-        ["Added Services", f"${add_total:.2f}"],
-        ["Cancelled / Refunded", f"-${abs(cancel_total):.2f}"],
-        ["Net Total", f"${net_total:.2f}"],
-    ]
-    summary_table = Table(summary_rows, colWidths=[4.5 * inch, 2.0 * inch])
-    summary_table.setStyle(
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, -1), colors.whitesmoke),
-                ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-                ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-                ("FONTNAME", (0, 3), (-1, 3), "Helvetica-Bold"),
-                ("ALIGN", (1, 0), (1, -1), "RIGHT"),
-            ]
-        )
-    )
-    elements.append(Spacer(1, 0.2 * inch))
-    elements.append(Paragraph("<b>Summary</b>", styles["Heading4"]))
-    elements.append(summary_table)
-
-    doc.build(elements)
-    buffer.seek(0)
-
-    filename = f"receipt_{root.id}.pdf"
-    return FileResponse(buffer, as_attachment=True, filename=filename)
+    return documents.document_response(
+        request, doc, f"receipt_{root.id}.pdf")
 
 
 @login_required
 @verified_email_required
 def download_yearly_summary_pdf(request):
     """
-    Generate a combined summary PDF of all PaymentHistory chains
-    for this user, grouped by service_address.
+    Summary PDF of this user's payment chains for one year (?year=,
+    default current), optionally limited to one ?address=. Small
+    summaries render inline; larger ones are queued for the document
+    worker and this page refreshes until the stored PDF is ready.
     """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        leftMargin=0.75 * inch,
-        rightMargin=0.75 * inch,
-        topMargin=0.75 * inch,
-        bottomMargin=0.75 * inch,
-    )
-    styles = getSampleStyleSheet()
-    elements = []
-
-    elements.append(
-        Paragraph("<b>Tucker & Dale’s Home Services</b>", styles["Title"]))
-    elements.append(
-        Paragraph(f"Annual Summary for {request.user.username}",
-                  styles["Normal"]))
-    elements.append(
-        Paragraph(
-            f"Generated: {now().strftime('%Y-%m-%d %H:%M')}", styles["Normal"])
+    try:
+        year = int(request.GET.get("year", ""))
+    except ValueError:
+        year = localdate().year
+    address = (request.GET.get("address") or "").strip()
+
+    key, stale_prefix, chains = documents.yearly_summary_key(
+        request.user, year, address)
+    filename = f"Yearly_Summary_{request.user.username}_{year}.pdf"
+
+    doc = GeneratedDocument.objects.defer("content").filter(key=key).first()
+    if doc is None and chains <= settings.YEARLY_SUMMARY_INLINE_CHAINS:
+        doc = documents.build_yearly_summary(
+            request.user, year, address, key, stale_prefix)
+    if doc is not None:
+        return documents.document_response(request, doc, filename)
+
+    job, _ = documents.enqueue_job(
+        request.user,
+        GeneratedDocument.Kind.YEARLY_SUMMARY,
+        key,
+        {"year": year, "address": address, "stale_prefix": stale_prefix},
     )
-    elements.append(Spacer(1, 0.3 * inch))
-
-    roots = (
-        PaymentHistory.objects.filter(user=request.user, parent__isnull=True)
-        .select_related("user")
-        .order_by("service_address", "-created_at")
+    if job.status == DocumentJob.Status.FAILED:
+        # Retries are used up for now; enqueue_job starts over later.
+        messages.error(
+            request,
+            "We couldn't generate your summary. Please try again later.")
+        return redirect("billing:payment_history")
+    return render(
+        request,
+        "billing/document_pending.html",
+        {
+            "job": job,
+            "chains": chains,
+            "year": year,
+            "address": address,
+            "refresh_url": request.get_full_path(),
+        },
+        status=202,
     )
 
-    grouped = {}
-    for root in roots:
-        grouped.setdefault(root.service_address, []).append(root)
-
-    grand_total = Decimal("0.00")
-
-    for address, chains in grouped.items():
-        elements.append(Paragraph(f"<b>🏠 {address}</b>", styles["Heading2"]))
-        elements.append(Spacer(1, 0.1 * inch))
-
-        property_total = Decimal("0.00")
-
-        for root in chains:
-            original_total, add_total, cancel_total, net_total = (
-                root.compute_sections())
-            property_total += net_total
-
-            data = [
-                ["Date", "Original", "Added", "Refunded", "Adjusted Total"],
-                [
-                    root.created_at.strftime("%Y-%m-%d"),
-                    f"${original_total:.2f}",
-                    f"+${add_total:.2f}" if add_total > 0 else "$0.00",
-                    f"-${abs(cancel_total):.2f}" if cancel_total else "$0.00",
-                    f"${net_total:.2f}",
-                ],
-            ]
-            table = Table(
-                data,
-                colWidths=[1.3 * inch, 1.3 * inch,
-                           1.3 * inch, 1.3 * inch, 1.3 * inch],
-            )
-            table.setStyle(
-                TableStyle(
-                    [
-                        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-                        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                        ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
-                        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-                    ]
-                )
-            )
-            elements.append(table)
-            elements.append(Spacer(1, 0.1 * inch))
-
-        elements.append(
-            Paragraph(
-                f"<b>Total for {address}:</b> ${property_total:.2f}",
-                styles["Normal"])
-
-        )
-        elements.append(Spacer(1, 0.3 * inch))
-        grand_total += property_total
-
-    elements.append(Spacer(1, 0.5 * inch))
-    elements.append(
-        Paragraph("<b>Grand Total Across All Properties</b>",
-                  styles["Heading3"]))
-    elements.append(Paragraph(f"<b>${grand_total:.2f}</b>", styles["Title"]))
-    elements.append(Spacer(1, 0.3 * inch))
 
-    doc.build(elements)
-    buffer.seek(0)
-
-    filename = f"Yearly_Summary_{request.user.username}_{now().year}.pdf"
-    return FileResponse(buffer, as_attachment=True, filename=filename)
+@login_required
+def document_job_status(request, job_id):
+    """Polling endpoint for a queued document."""
+    job = get_object_or_404(DocumentJob, pk=job_id, user=request.user)
+    return JsonResponse({
+        "id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "attempt": job.attempt,
+        "run_after": job.run_after.isoformat(),
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at and job.started_at.isoformat(),
+        "finished_at": job.finished_at and job.finished_at.isoformat(),
+        "error": job.error,
+    })
 
 
 # ----------------------------------------------------------------------
@@ -620,14 +472,40 @@ def download_yearly_summary_pdf(request):
 # ----------------------------------------------------------------------
 @user_passes_test(lambda u: u.is_superuser)
 def all_payments_admin(request):
-    payments = Payment.objects.select_related("user").order_by("-created_at")
-    total_volume = payments.aggregate(Sum("amount"))["amount__sum"] or 0
+    """Newest payments first, one keyset page at a time."""
+    try:
+        payments, next_cursor = keyset_page(
+            Payment.objects.select_related("user"),
+            request.GET.get("cursor"),
+            ALL_PAYMENTS_PAGE_SIZE,
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor.")
+
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        return JsonResponse({
+            "html": render_to_string(
+                "billing/_all_payments_rows.html",
+                {"payments": payments},
+                request=request,
+            ),
+            "next_cursor": next_cursor,
+        })
+
+    # A full-table SUM; the figure may lag by up to the cache TTL.
+    total_volume = cache.get(TOTAL_VOLUME_CACHE_KEY)
+    if total_volume is None:
+        total_volume = (
+            Payment.objects.aggregate(Sum("amount"))["amount__sum"] or 0)
+        cache.set(TOTAL_VOLUME_CACHE_KEY, total_volume,
+                  TOTAL_VOLUME_CACHE_TTL)
 
     return render(
         request,
         "billing/all_payments_admin.html",
         {
             "payments": payments,
+            "next_cursor": next_cursor,
             "total_volume": total_volume / 100,
         },
     )
@@ -647,6 +525,65 @@ def refund_payment(request, pk):
     return redirect("billing:all_payments_admin")
 
 
+@user_passes_test(lambda u: u.is_superuser)
+def refund_batch_progress(request, batch_id):
+    """Progress and per-payment results of a bulk refund batch."""
+    batch = get_object_or_404(
+        RefundBatch.objects.select_related("requested_by"), pk=batch_id)
+    items = batch.items.select_related("payment__user")
+
+    return render(
+        request,
+        "billing/refund_batch_progress.html",
+        {
+            "batch": batch,
+            "items": items,
+            "in_progress": batch.status in (RefundBatch.Status.QUEUED,
+                                            RefundBatch.Status.RUNNING),
+        },
+    )
+
+
+@user_passes_test(lambda u: u.is_superuser)
+def export_records(request, dataset):
+    """
+    Stream payment history, payments or bookings as CSV / NDJSON.
+    Query params: format (csv|ndjson), start / end (YYYY-MM-DD,
+    inclusive) and address.
+    """
+    spec = exports.EXPORTS.get(dataset)
+    if spec is None:
+        raise Http404("Unknown export.")
+
+    fmt = request.GET.get("format", "csv")
+    if fmt not in exports.FORMATS:
+        return HttpResponseBadRequest("format must be csv or ndjson.")
+
+    try:
+        start = exports.parse_day(request.GET.get("start"))
+        end = exports.parse_day(request.GET.get("end"))
+    except ValueError:
+        return HttpResponseBadRequest("start / end must be YYYY-MM-DD.")
+
+    try:
+        rows = exports.filtered_rows(
+            spec,
+            start=start,
+            end=end,
+            address=(request.GET.get("address") or "").strip(),
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    response = StreamingHttpResponse(
+        exports.iter_export(fmt, spec, rows),
+        content_type=exports.FORMATS[fmt],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{dataset}.{fmt}"')
+    return response
+
+
 # ----------------------------------------------------------------------
 # 🌐 Stripe Webhook Listener
 # ----------------------------------------------------------------------
@@ -654,20 +591,13 @@ def refund_payment(request, pk):
 @require_POST
 def stripe_webhook(request):
     """
-    Handles Stripe webhook events safely and idempotently.
+    Verifies the Stripe signature, stores the event and acknowledges.
 
-    Important design rule:
-    - Webhook records the root PaymentHistory only.
-    - Webhook does NOT guess or relink Bookings by address.
-    - Booking creation/linking is finalized by payment_success(), which has
-      the validated checkout session + cart context.
-
-    Why:
-    - Prevents a cancelled booking from being reused and attached to a new
-      payment simply because it shares the same service address.
+    All processing happens later in `manage.py process_stripe_events`
+    (see billing/webhooks.py), so this endpoint stays fast during bursts
+    and Stripe does not retry because of slow responses. Redeliveries of
+    an already stored event id are acknowledged without a second insert.
     """
-    from django.contrib.auth import get_user_model
-
     payload = request.body
     sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
     endpoint_secret = getattr(settings, "STRIPE_WEBHOOK_SECRET", None)
@@ -685,66 +615,8 @@ def stripe_webhook(request):
         logger.error("Webhook signature error: %s", e)
         return HttpResponseBadRequest("Invalid signature")
 
-    event_type = event.get("type")
-
-    if event_type != "payment_intent.succeeded":
-        logger.info("Webhook event received: %s (ignored)", event_type)
-        return HttpResponse(status=200)
-
-    intent = event["data"]["object"]
-    stripe_payment_id = intent.get("id")
-    amount = Decimal(intent.get("amount_received", 0)) / Decimal("100")
-    metadata = intent.get("metadata", {}) or {}
-
-    user_id = metadata.get("user_id")
-    service_address = (metadata.get("service_address") or "").strip()
-    cart_id = metadata.get("cart_id")
-
-    User = get_user_model()
-    user = User.objects.filter(id=user_id).first() if user_id else None
-
-    # Idempotency: Stripe may retry delivery of the same event/payment intent.
-    existing_payment = PaymentHistory.objects.filter(
-        stripe_payment_id=stripe_payment_id,
-        parent__isnull=True,
-    ).first()
-
-    if existing_payment:
-        logger.info(
-            "Webhook skipped duplicate PaymentHistory for %s",
-            stripe_payment_id,
-        )
-        return HttpResponse(status=200)
-
-    payment = PaymentHistory.objects.create(
-        user=user,
-        amount=amount,
-        adjustments_total_amt=Decimal("0.00"),
-        currency="USD",
-        status="Paid",
-        payment_type="Stripe Webhook Payment",
-        stripe_payment_id=stripe_payment_id,
-        service_address=service_address or "Unknown",
-        raw_data=event,
-        notes=(
-            "Initial booking payment (via webhook)"
-            if not cart_id
-            else f"Initial booking payment (via webhook, cart_id={cart_id})"
-        ),
-    )
-
-    logger.info(
-        "[Webhook] PaymentHistory #%s recorded for user %s "
-        "(stripe_payment_id=%s, amount=$%s)",
-        payment.id,
-        user.username if user else "Unknown",
-        stripe_payment_id,
-        amount,
-    )
-
-    # Do NOT attach/reassign bookings here.
-    # payment_success() is the only place that should create/link Bookings
-    # using the validated checkout session + cart contents.
+    if not store_event(event):
+        logger.info("Webhook event %s already stored", event.get("id"))
 
     return HttpResponse(status=200)
 
@@ -761,6 +633,8 @@ def cart_add(request):
 
     Defensive validation:
     - blocks adding past-dated services to the cart
+    - blocks slots that are already booked or held by another cart;
+      a successful add holds the slot for SLOT_HOLD_MINUTES
     """
     cart = _get_or_create_cart(request)
 
@@ -840,6 +714,26 @@ def cart_add(request):
     if not created:
         item.unit_price = unit_price_pre_tax
         item.save(update_fields=["unit_price"])
+    cart.touch()
+
+    slot_taken = Booking.objects.filter(
+        employee=employee,
+        date=date_obj,
+        time_slot=slot,
+    ).exclude(status="Cancelled").exists()
+
+    if slot_taken or not SlotHold.objects.acquire(item):
+        item.delete()
+        return JsonResponse(
+            {
+                "ok": False,
+                "error": (
+                    f"Sorry, {employee} is no longer available for "
+                    f"{date_obj} at {slot}. Please search again."
+                ),
+            },
+            status=409,
+        )
 
     html = render_to_string("billing/_cart.html",
                             {"cart": cart}, request=request)
@@ -868,6 +762,7 @@ def cart_remove(request):
         return JsonResponse({"ok": False, "error": "Not found."}, status=404)
 
     item.delete()
+    cart.touch()
     return JsonResponse(
         {
             "ok": True,
@@ -912,6 +807,7 @@ def remove_selected_from_cart(request):
 
     removed_count = items.count()
     items.delete()
+    cart.touch()
     cart.refresh_from_db()
 
     html = render_to_string("billing/_cart.html",
@@ -991,81 +887,55 @@ def live_invoice_view_address(request, address):
     and running totals for a specific property address.
     """
     from urllib.parse import unquote
-    from django.utils import timezone
-    from billing.utils import get_refund_policy
 
     address = unquote(address)
 
-    bookings = Booking.objects.filter(
-        user=request.user,
-        service_address__iexact=address,
-    ).order_by("date", "time_slot__label")
+    # One booking query for the whole invoice. The latest refund row per
+    # booking is pulled in through a correlated subquery instead of one
+    # PaymentHistory lookup per cancelled booking.
+    latest_refund = (
+        PaymentHistory.objects.filter(
+            user=request.user,
+            booking=OuterRef("pk"),
+            amount__lt=0,
+        )
+        .order_by("-created_at")
+        .values("amount")[:1]
+    )
+    bookings = list(
+        Booking.objects.filter(
+            user=request.user,
+            service_address__iexact=address,
+        )
+        .select_related("service_category", "time_slot")
+        .with_refund_tier()
+        .annotate(
+            latest_refund_amount=Coalesce(
+                Subquery(latest_refund),
+                Decimal("0.00"),
+                output_field=models.DecimalField(
+                    max_digits=10, decimal_places=2),
+            )
+        )
+        .order_by("starts_at", "date")
+    )
 
-    payments = PaymentHistory.objects.filter(
+    ledger = AddressLedger.objects.filter(
         user=request.user,
-        service_address__iexact=address,
-    ).order_by("created_at")
+        address_key=AddressLedger.key_for(address),
+    ).first()
 
-    if not bookings.exists() and not payments.exists():
+    if ledger is None and not bookings:
         raise Http404("No invoice data found for this address.")
 
-    bookings_original = bookings.filter(status="Booked")
-    bookings_cancelled = bookings.filter(status="Cancelled")
-
-    latest_payment = payments.last()
-    if latest_payment:
-        bookings_added = bookings.filter(
-            created_at__gt=latest_payment.created_at,
-            status="Booked",
-        )
-    else:
-        bookings_added = Booking.objects.none()
-
-    def get_booking_dt(booking):
-        """
-        Build the real booking datetime using the slot start
-        time when possible.
-        Falls back to midnight if parsing fails.
-        """
-        try:
-            slot_label = getattr(booking.time_slot, "label", "") or ""
-            start_str = slot_label.split("–")[0].split("-")[0].strip()
-            start_time = dt.strptime(start_str, "%H:%M").time()
-            return timezone.make_aware(
-                dt.combine(booking.date, start_time),
-                timezone.get_current_timezone(),
-            )
-        except Exception:
-            return timezone.make_aware(
-                dt.combine(booking.date, dt.min.time()),
-                timezone.get_current_timezone(),
-            )
-
-    def get_refund_amount_for_booking(booking):
-        """
-        Find the latest negative PaymentHistory adjustment linked
-        to this booking.
-        Returns a positive display amount like 30.00, or 0.00 if none exists.
-        """
-        refund_entry = (
-            PaymentHistory.objects.filter(
-                user=request.user,
-                booking=booking,
-                amount__lt=0,
-            )
-            .order_by("-created_at")
-            .first()
-        )
-        if refund_entry:
-            return abs(refund_entry.amount)
-        return Decimal("0.00")
+    last_payment_at = ledger.last_payment_at if ledger else None
 
     def annotate_booking(booking):
-        booking_dt = get_booking_dt(booking)
-        status, refund_pct = get_refund_policy(booking_dt)
+        refund_pct = booking.refund_pct
+        status = REFUND_TIER_LABELS[refund_pct]
 
         refund_amount = (
-            get_refund_amount_for_booking(booking)
+            abs(booking.latest_refund_amount)
             if booking.status == "Cancelled"
             else Decimal("0.00")
         )
@@ -1082,17 +952,20 @@ def live_invoice_view_address(request, address):
             "is_completed": status == "Locked",
         }
 
-    bookings_original = [annotate_booking(b) for b in bookings_original]
-    bookings_cancelled = [annotate_booking(b) for b in bookings_cancelled]
-    bookings_added = [annotate_booking(b) for b in bookings_added]
+    bookings_original = []
+    bookings_cancelled = []
+    bookings_added = []
 
-    paid_total = sum(
-        payment.amount for payment in payments if payment.amount > 0
-    )
-    refund_total = abs(
-        sum(payment.amount for payment in payments if payment.amount < 0)
-    )
-    net_total = paid_total - refund_total
+    for booking in bookings:
+        row = annotate_booking(booking)
+        if booking.status == "Booked":
+            bookings_original.append(row)
+            if last_payment_at and booking.created_at > last_payment_at:
+                bookings_added.append(row)
+        elif booking.status == "Cancelled":
+            bookings_cancelled.append(row)
+
+    zero = Decimal("0.00")
 
     return render(
         request,
@@ -1102,10 +975,10 @@ def live_invoice_view_address(request, address):
             "bookings_original": bookings_original,
             "bookings_cancelled": bookings_cancelled,
             "bookings_added": bookings_added,
-            "payments": payments,
-            "paid_total": paid_total,
-            "refund_total": refund_total,
-            "net_total": net_total,
+            "ledger": ledger,
+            "paid_total": ledger.paid_total if ledger else zero,
+            "refund_total": ledger.refund_total if ledger else zero,
+            "net_total": ledger.net_total if ledger else zero,
         },
     )
 
@@ -1122,9 +995,21 @@ def cancel_selected_services(request):
     - Does NOT fall back to "latest payment for this address"
     - Prevents refunding more than the charge tied to that booking
     - Keeps user-facing messages and refund confirmation email behavior
-    """
-    stripe.api_key = settings.STRIPE_SECRET_KEY
 
+    Batching:
+    - The selection is loaded in one query and grouped by root payment
+    - One Stripe refund per payment intent for the group's combined amount
+    - Refund rows and booking status changes are bulk-written in one
+      transaction; chain totals and address ledgers are updated
+      explicitly because bulk writes bypass PaymentHistory.save()
+    - One summary email per cancellation request
+
+    Concurrency:
+    - The selected bookings are locked (SELECT ... FOR UPDATE) for the
+      whole cancellation and re-read under the lock, so a double submit
+      or a second tab finds them already cancelled instead of refunding
+      them again
+    """
     selected_ids = request.POST.getlist("selected_bookings")
 
     if not selected_ids:
@@ -1132,73 +1017,72 @@ def cancel_selected_services(request):
             request, "No services were selected for cancellation.")
         return redirect("billing:payment_history")
 
+    with transaction.atomic():
+        cancelled_count, refunded_count, locked_count = _cancel_bookings(
+            request, selected_ids)
+
+    if cancelled_count:
+        messages.success(
+            request,
+            f"{cancelled_count} service(s) cancelled. "
+            f"{refunded_count} refund(s) processed."
+        )
+
+    if locked_count:
+        messages.warning(
+            request,
+            (f"{locked_count} service(s) were inside"
+             "the non-cancellable window.")
+        )
+
+    return redirect(reverse("billing:payment_history")
+                    + f"?t={now().timestamp()}")
+
+
+def _cancel_bookings(request, selected_ids):
+    """
+    Body of cancel_selected_services; must run inside a transaction so
+    the booking locks are held until the refund rows are committed.
+    Returns (cancelled, refunded, locked) counts.
+    """
     cancelled_count = 0
     refunded_count = 0
     locked_count = 0
 
-    for booking_id in selected_ids:
-        try:
-            booking = Booking.objects.select_related(
-                "time_slot",
-                "primary_payment_record",
-                "service_category",
-            ).get(
-                id=booking_id,
-                user=request.user,
-            )
-        except Booking.DoesNotExist:
-
-            logger.warning(
-                "Booking %s not found for %s",
-                booking_id,
-                request.user.username,
-            )
-            continue
+    # Status is checked under the lock: a concurrent request that got
+    # here first has already marked these Cancelled.
+    bookings = list(
+        Booking.objects.select_for_update(of=("self",))
+        .select_related(
+            "time_slot",
+            "primary_payment_record",
+            "service_category",
+        ).filter(
+            id__in=[pk for pk in selected_ids if str(pk).isdigit()],
+            user=request.user,
+        ).exclude(status="Cancelled")
+        .order_by("pk")
+    )
 
-        # Build booking datetime from booking.date + timeslot start time
-        booking_dt = None
-        try:
-            slot_label = getattr(booking.time_slot, "label", "") or ""
-            start_str = slot_label.split("–")[0].split("-")[0].strip()
-            start_time = dt.strptime(start_str, "%H:%M").time()
-            booking_dt = timezone.make_aware(
-                dt.combine(booking.date, start_time),
-                timezone.get_current_timezone(),
-            )
-        except Exception:
-            booking_dt = timezone.make_aware(
-                dt.combine(booking.date, dt.min.time()),
-                timezone.get_current_timezone(),
-            )
+    missing = set(map(str, selected_ids)) - {str(b.id) for b in bookings}
+    for booking_id in missing:
+        logger.warning(
+            "Booking %s not found (or already cancelled) for %s",
+            booking_id,
+            request.user.username,
+        )
 
-        refund_label, refund_pct = get_refund_policy(booking_dt)
+    roots = _resolve_root_payments(request.user, bookings)
 
-        # ✅ Use the booking's own payment mapping first.
-        root_payment = booking.primary_payment_record
+    # root_id -> {"root": PaymentHistory, "items": [(booking, refund, note)]}
+    groups = {}
 
-        # Fallback 1: explicitly linked root payment for THIS booking
-        if not root_payment:
-            root_payment = (
-                PaymentHistory.objects.filter(
-                    user=request.user,
-                    linked_bookings=booking,
-                    parent__isnull=True,
-                )
-                .order_by("-created_at")
-                .first()
-            )
+    for booking in bookings:
+        # A slot label that doesn't parse leaves datetime_start None,
+        # which the policy treats as Locked (no midnight fallback).
+        refund_label, refund_pct = get_refund_policy(booking.datetime_start)
 
-        # Fallback 2: legacy direct booking link only
-        if not root_payment:
-            root_payment = (
-                PaymentHistory.objects.filter(
-                    user=request.user,
-                    booking=booking,
-                    parent__isnull=True,
-                )
-                .order_by("-created_at")
-                .first()
-            )
+        root_payment = roots.get(booking.id)
 
         # ❌ Intentionally NO address-level fallback here.
         if not root_payment:
@@ -1206,7 +1090,7 @@ def cancel_selected_services(request):
             logger.warning(
                 "No root payment record found for booking %s "
                 "(address fallback intentionally disabled)",
-                booking_id,
+                booking.id,
             )
 
             messages.error(
@@ -1238,121 +1122,196 @@ def cancel_selected_services(request):
             )
             continue
 
-        refund_status = "Cancelled"
+        # Defensive guard: never attempt to refund more than the charge
+        charge_amount = root_payment.amount or Decimal("0.00")
+        if refund_amt > charge_amount:
+            logger.warning(
+                "Refund amount exceeds charge for booking %s: "
+                "refund_amt=%s, charge_amount=%s, root_payment_id=%s, "
+                "stripe_payment_id=%s",
+                booking.id,
+                refund_amt,
+                charge_amount,
+                root_payment.id,
+                root_payment.stripe_payment_id,
+            )
+            messages.error(
+                request,
+                f"Refund failed for {booking.service_category} "
+                f"on {booking.date}: "
+                "refund exceeds original charge."
+            )
+            continue
 
-        try:
-            # Defensive guard: never attempt to refund more than the charge
-            charge_amount = root_payment.amount or Decimal("0.00")
-            if refund_amt > charge_amount:
-                logger.warning(
-                    "Refund amount exceeds charge for booking %s: "
-                    "refund_amt=%s, charge_amount=%s, root_payment_id=%s, "
-                    "stripe_payment_id=%s",
-                    booking.id,
-                    refund_amt,
-                    charge_amount,
-                    root_payment.id,
-                    root_payment.stripe_payment_id,
-                )
-                messages.error(
-                    request,
-                    f"Refund failed for {booking.service_category} "
-                    f"on {booking.date}: "
-                    "refund exceeds original charge."
-                )
-                continue
+        if refund_pct == 100:
+            note = "Service cancelled and fully refunded"
+        elif refund_pct == 50:
+            note = (
+                "Late cancellation inside 72 hours: 50% refunded, "
+                f"50% penalty retained (${penalty_amt:.2f})"
+            )
+        else:
+            note = "Service cancelled"
+
+        group = groups.setdefault(
+            root_payment.id, {"root": root_payment, "items": []})
+        group["items"].append((booking, refund_amt, note))
+
+    # One Stripe refund per root payment intent.
+    #
+    # The Stripe calls run while the booking locks are held, on purpose:
+    # the locks are what make a double submit wait and then find the
+    # bookings cancelled, rather than refund them a second time. Only
+    # this user's selected booking rows are locked (of=("self",)), and
+    # each call is bounded by the gateway's timeout and retry limits, so
+    # the wait is confined to a concurrent cancel of the same bookings.
+    refund_rows = []
+    for group in groups.values():
+        root_payment = group["root"]
+        items = group["items"]
+        group_total = sum((amt for _, amt, _ in items), Decimal("0.00"))
+        refund_status = "Cancelled"
+        refund_id = None
 
-            # Only talk to Stripe if there is money to refund
-            if refund_amt > 0 and root_payment.stripe_payment_id:
-                stripe.Refund.create(
+        # Only talk to Stripe if there is money to refund
+        if group_total > 0 and root_payment.stripe_payment_id:
+            cents = gateway.to_cents(group_total)
+            try:
+                refund = gateway.create_refund(
                     payment_intent=root_payment.stripe_payment_id,
-                    amount=int(refund_amt * 100),
+                    amount=cents,
+                    idempotency_key=gateway.cancellation_refund_key(
+                        root_payment, [b.id for b, _, _ in items]),
                 )
-                refund_status = "Refunded"
-                refunded_count += 1
-
-                logger.info(
-                    "Stripe refund successful for booking %s: "
-                    "$%s (%s%% refund) via root payment #%s",
-                    booking.id,
-                    refund_amt,
-                    refund_pct,
+            except Exception as e:
+                logger.error(
+                    "Refund failed for root payment %s (bookings %s): %s",
                     root_payment.id,
+                    [b.id for b, _, _ in items],
+                    e,
                 )
-            else:
-                logger.warning(
-                    "No Stripe refund issued for booking %s. "
-                    "refund_amt=%s, stripe_payment_id=%s",
-                    booking.id,
-                    refund_amt,
-                    root_payment.stripe_payment_id,
-                )
+                for booking, _, _ in items:
+                    messages.error(
+                        request,
+                        (f"Refund failed for {booking.service_category} "
+                         f"on {booking.date}."),
+                    )
+                continue
 
-            if refund_pct == 100:
-                note = "Service cancelled and fully refunded"
-            elif refund_pct == 50:
-                note = (
-                    "Late cancellation inside 72 hours: 50% refunded, "
-                    f"50% penalty retained (${penalty_amt:.2f})"
-                )
-            else:
-                note = "Service cancelled"
+            refund_status = "Refunded"
+            refund_id = refund.id
+            refunded_count += sum(1 for _, amt, _ in items if amt > 0)
 
-            refund_entry = PaymentHistory.objects.create(
-                user=request.user,
-                parent=root_payment,
-                booking=booking,
-                amount=-refund_amt,
-                adjustments_total_amt=Decimal("0.00"),
-                status=refund_status,
-                notes=note,
-                service_address=booking.service_address,
+            logger.info(
+                "Stripe refund successful for bookings %s: "
+                "$%s via root payment #%s",
+                [b.id for b, _, _ in items],
+                group_total,
+                root_payment.id,
+            )
+        else:
+            logger.warning(
+                "No Stripe refund issued for bookings %s. "
+                "refund_amt=%s, stripe_payment_id=%s",
+                [b.id for b, _, _ in items],
+                group_total,
+                root_payment.stripe_payment_id,
             )
 
-            booking.status = "Cancelled"
-            booking.save(update_fields=["status"])
-            cancelled_count += 1
-
-            logger.info(
-                "Booking %s cancelled — Refund record #%s ($%.2f, %s%%)",
-                booking.id,
-                refund_entry.id,
-                refund_amt,
-                refund_pct,
+        for booking, refund_amt, note in items:
+            refund_rows.append(
+                PaymentHistory(
+                    user=request.user,
+                    parent=root_payment,
+                    booking=booking,
+                    amount=-refund_amt,
+                    adjustments_total_amt=Decimal("0.00"),
+                    status=refund_status,
+                    notes=note,
+                    service_address=booking.service_address,
+                    stripe_refund_id=refund_id,
+                )
             )
 
+    if refund_rows:
+        with transaction.atomic():
+            refund_rows = PaymentHistory.objects.bulk_create(refund_rows)
+
+            Booking.objects.filter(
+                id__in=[row.booking_id for row in refund_rows]
+            ).update(status="Cancelled")
+
+            per_root = {}
+            per_address = {}
+            for row in refund_rows:
+                per_root.setdefault(row.parent_id, []).append(row.amount)
+                totals = per_address.setdefault(
+                    row.service_address, [Decimal("0.00"), 0])
+                totals[0] += row.amount
+                totals[1] += 1
+
+            for root_id, amounts in per_root.items():
+                PaymentHistory.objects.record_adjustments(root_id, amounts)
+            for address, (amount, count) in per_address.items():
+                AddressLedger.objects.record_payment(
+                    request.user.id, address, amount)
+                AddressLedger.objects.record_bookings(
+                    request.user.id, address, active=-count, cancelled=count)
+
             try:
-                from billing.utils import send_refund_confirmation_email
-                send_refund_confirmation_email(request.user, refund_entry)
+                send_refund_summary_email(request.user, refund_rows)
             except Exception as e:
                 logger.warning("Refund email failed: %s", e)
 
-        except Exception as e:
+        cancelled_count = len(refund_rows)
+        logger.info(
+            "Cancelled %s booking(s) for %s — refund records %s",
+            cancelled_count,
+            request.user.username,
+            [row.id for row in refund_rows],
+        )
 
-            logger.error("Refund failed for booking %s: %s", booking_id, e)
+    return cancelled_count, refunded_count, locked_count
 
-            messages.error(
-                request,
-                (f"Refund failed for {booking.service_category} "
-                 f"on {booking.date}."),
-            )
 
-    if cancelled_count:
-        messages.success(
-            request,
-            f"{cancelled_count} service(s) cancelled. "
-            f"{refunded_count} refund(s) processed."
-        )
+def _resolve_root_payments(user, bookings):
+    """
+    Map booking id -> root PaymentHistory, in at most three queries:
+    the booking's own primary_payment_record, then the newest root that
+    explicitly links it, then the legacy direct `booking` FK.
+    """
+    roots = {
+        b.id: b.primary_payment_record
+        for b in bookings
+        if b.primary_payment_record_id
+    }
 
-    if locked_count:
-        messages.warning(
-            request,
-            (f"{locked_count} service(s) were inside"
-             "the non-cancellable window.")
+    unresolved = [b.id for b in bookings if b.id not in roots]
+    if unresolved:
+        Link = PaymentHistory.linked_bookings.through
+        links = (
+            Link.objects.filter(
+                booking_id__in=unresolved,
+                paymenthistory__user=user,
+                paymenthistory__parent__isnull=True,
+            )
+            .select_related("paymenthistory")
+            .order_by("-paymenthistory__created_at")
         )
+        for link in links:
+            roots.setdefault(link.booking_id, link.paymenthistory)
+
+    unresolved = [b.id for b in bookings if b.id not in roots]
+    if unresolved:
+        legacy = PaymentHistory.objects.filter(
+            user=user,
+            booking_id__in=unresolved,
+            parent__isnull=True,
+        ).order_by("-created_at")
+        for root in legacy:
+            roots.setdefault(root.booking_id, root)
 
-    return redirect(reverse("billing:payment_history")
-                    + f"?t={now().timestamp()}")
+    return roots
 
 
 @login_required
@@ -1381,31 +1340,21 @@ def add_service_adjustment(request):
                              "error": "Adjustment amount cannot be zero."})
 
     stripe_charge = None
-    stripe_refund = None
     stripe_error = None
 
     try:
         if delta_amount > 0:
-            payment_intent = stripe.PaymentIntent.create(
-                amount=int(delta_amount * 100),
+            payment_intent = gateway.create_payment_intent(
+                amount=gateway.to_cents(delta_amount),
                 currency="USD",
                 automatic_payment_methods={"enabled": True},
                 metadata={"booking_id": booking.id, "type": "ADJUSTMENT"},
+                idempotency_key=gateway.adjustment_key(
+                    booking, gateway.to_cents(delta_amount)),
             )
             stripe_charge = payment_intent.id
-        else:
-            last_payment = (
-                PaymentHistory.objects.filter(
-                    linked_bookings=booking, amount__gt=0)
-                .order_by("-created_at")
-                .first()
-            )
-            if last_payment and last_payment.raw_data.get("payment_intent_id"):
-                stripe_refund = stripe.Refund.create(
-                    payment_intent=last_payment.raw_data.get(
-                        "payment_intent_id"),
-                    amount=int(abs(delta_amount) * 100),
-                )
+        # Negative adjustments are only recorded here; money goes back to
+        # the card through cancellation, which applies the refund policy.
     except stripe.error.StripeError as e:
         stripe_error = str(e)
 
@@ -1420,12 +1369,16 @@ def add_service_adjustment(request):
             payment_type="ADJUSTMENT",
             notes=f"{note} — {'Billed' if delta_amount > 0 else 'Refunded'}"
             "via adjustment.",
-            raw_data={
+            stripe_payment_id=stripe_charge,
+        )
+        PaymentPayload.objects.store(
+            adj_entry,
+            {
                 "stripe_payment_intent": stripe_charge,
-                "stripe_refund_id": getattr(stripe_refund, "id", None),
                 "stripe_error": stripe_error,
                 "delta_amount": f"{delta_amount:.2f}",
             },
+            source="adjustment",
         )
         adj_entry.linked_bookings.add(booking)
         booking.total_amount += delta_amount
@@ -1499,7 +1452,7 @@ def submit_adjustment(request):
 @require_POST
 def cart_clear(request):
     cart = _get_or_create_cart(request)
-    cart.items.all().delete()
+    cart.clear()
     return JsonResponse(
         {
             "ok": True,
@@ -1541,7 +1494,7 @@ def payment_success(request):
         return redirect("billing:checkout")
 
     try:
-        checkout_session = stripe.checkout.Session.retrieve(session_id)
+        checkout_session = gateway.retrieve_checkout_session(session_id)
     except Exception as e:
         logger.error("Stripe session retrieval error: %s", e)
         messages.error(request, "Could not verify your payment session.")
@@ -1670,87 +1623,89 @@ def payment_success(request):
         )
 
         today = timezone.localdate()
+        items = list(cart.items.select_related("employee", "time_slot"))
 
-        for item in cart.items.all():
-            if item.date < today:
-                messages.error(
-                    request,
-                    ("Past dates cannot be booked. Please rebuild "
-                     "your cart and try again."),
-                )
-                return redirect("billing:checkout")
+        if any(item.date < today for item in items):
+            messages.error(
+                request,
+                ("Past dates cannot be booked. Please rebuild "
+                 "your cart and try again."),
+            )
+            return redirect("billing:checkout")
 
+        # Idempotent guard for this same payment record (and for
+        # duplicate lines inside the cart itself)
+        pending_items = []
+        for item in items:
             booking_key = (
                 item.service_category_id,
                 item.employee_id,
                 item.date,
                 item.time_slot_id,
             )
-
-            # Idempotent guard for this same payment record
             if booking_key in existing_booking_keys:
                 continue
+            existing_booking_keys.add(booking_key)
+            pending_items.append(item)
 
-            # FINAL SERVER-SIDE DUPLICATE / SLOT-CONFLICT GUARD
-            # Checks ALL active bookings, not just current payment_record.
-            conflicting_booking = Booking.objects.filter(
-                employee_id=item.employee_id,
-                date=item.date,
-                time_slot_id=item.time_slot_id,
-            ).exclude(
-                status__iexact="Cancelled"
-            ).first()
-
-            if conflicting_booking:
+        # FINAL SERVER-SIDE DUPLICATE / SLOT-CONFLICT GUARD
+        # The partial unique constraint on Booking (employee, date, slot
+        # for non-cancelled rows) rejects any double booking, including
+        # concurrent checkouts; only the failure path scans for details.
+        if pending_items:
+            try:
+                created_bookings = _materialize_bookings(
+                    request.user, payment_record, service_address,
+                    pending_items,
+                )
+            except IntegrityError:
+                # The customer has already paid for these lines: refund
+                # them (or flag the payment for staff) and drop the cart
+                # so a reload of this page cannot refund twice.
+                taken = _first_taken_item(pending_items)
+                refunded = _refund_unbooked_items(
+                    request.user, payment_record, service_address,
+                    pending_items,
+                )
+                Cart.objects.filter(id=cart.id).delete()
+                request.session.pop("cart_id", None)
+                request.session.modified = True
                 messages.error(
                     request,
                     (
-                        f"Sorry, {item.employee} is no longer available for "
-                        f"{item.date} at {item.time_slot}. "
-                        "Please search again."
+                        f"Sorry, {taken.employee} is no longer available "
+                        f"for {taken.date} at {taken.time_slot}."
+                    ) if taken else (
+                        "Sorry, one of your selected slots is no longer "
+                        "available."
                     ),
                 )
+                if refunded:
+                    messages.info(
+                        request,
+                        "Nothing was booked and those services have been "
+                        "refunded. Please search again.",
+                    )
+                else:
+                    messages.warning(
+                        request,
+                        "Nothing was booked. Our team has been notified "
+                        "and will refund you shortly.",
+                    )
                 return redirect("scheduling:search_by_date")
 
-            booking = Booking.objects.create(
-                user=request.user,
-                service_address=service_address,
-                service_category=item.service_category,
-                employee=item.employee,
-                date=item.date,
-                time_slot=item.time_slot,
-                unit_price=item.unit_price,
-                total_amount=item.subtotal,
-                status="Booked",
-                primary_payment_record=payment_record,
-            )
-            created_bookings.append(booking)
-            existing_booking_keys.add(booking_key)
-
-        if created_bookings:
-            payment_record.linked_bookings.add(*created_bookings)
-            payment_record.save()
-
-        paid_cart_id = cart.id
         paid_address_key = (cart.address_key or "").strip()
 
-        cart.items.all().delete()
-        cart.delete()
-
-        stale_carts = Cart.objects.filter(
-            user=request.user
-        ).exclude(id=paid_cart_id)
-
+        stale_carts = models.Q(user=request.user)
         if paid_address_key:
-            stale_carts = stale_carts.filter(
+            stale_carts &= (
                 models.Q(address_key__iexact=paid_address_key)
                 | models.Q(address_key__isnull=True)
                 | models.Q(address_key__exact="")
             )
 
-        for stale_cart in stale_carts:
-            stale_cart.items.all().delete()
-            stale_cart.delete()
+        # The paid cart and stale carts go in one DELETE (items cascade)
+        Cart.objects.filter(models.Q(id=cart.id) | stale_carts).delete()
 
         request.session.pop("cart_id", None)
         request.session.pop("last_checkout_session_id", None)
@@ -1764,12 +1719,12 @@ def payment_success(request):
                     )
                     .select_related("service_category",
                                     "time_slot", "employee")
-                    .order_by("date", "time_slot__label")
+                    .order_by("starts_at", "date")
                 )
                 send_payment_receipt_email(
                     request.user, payment_record, all_bookings, request
                 )
-                logger.info("Sent receipt to %s", request.user.email)
+                logger.info("Queued receipt for %s", request.user.email)
             except Exception as e:
                 logger.warning("Payment receipt email failed: %s", e)
 
@@ -1790,6 +1745,141 @@ def payment_success(request):
         return redirect("billing:checkout")
 
 
+def _materialize_bookings(user, payment_record, service_address, items):
+    """
+    Turn paid cart items into Bookings, JobAssignments and payment links
+    with one bulk INSERT each, in a single transaction. Raises
+    IntegrityError if any slot was booked in the meantime.
+    """
+    with transaction.atomic():
+        created_bookings = Booking.objects.bulk_create([
+            Booking(
+                user=user,
+                service_address=service_address,
+                service_category_id=item.service_category_id,
+                employee_id=item.employee_id,
+                date=item.date,
+                time_slot_id=item.time_slot_id,
+                starts_at=Booking.start_for(item.date, item.time_slot),
+                unit_price=item.unit_price,
+                total_amount=item.subtotal,
+                status="Booked",
+                primary_payment_record=payment_record,
+            )
+            for item in items
+        ])
+
+        JobAssignment.objects.bulk_create([
+            JobAssignment(
+                employee_id=booking.employee_id,
+                booking=booking,
+                jobsite_address=service_address,
+            )
+            for booking in created_bookings
+            if booking.employee_id
+        ])
+
+        PaymentHistory.linked_bookings.through.objects.bulk_create(
+            [
+                PaymentHistory.linked_bookings.through(
+                    paymenthistory_id=payment_record.pk,
+                    booking_id=booking.pk,
+                )
+                for booking in created_bookings
+            ],
+            ignore_conflicts=True,
+        )
+
+        payment_record.save()
+        AddressLedger.objects.record_bookings(
+            user.id,
+            service_address,
+            active=len(created_bookings),
+        )
+
+    return created_bookings
+
+
+def _refund_unbooked_items(user, payment_record, service_address, items):
+    """
+    Refund paid cart items that could not be booked and record the
+    refund on the payment chain. If Stripe refuses, the root payment is
+    flagged in its notes for staff instead. Returns True if refunded.
+    """
+    # The customer paid tax on these lines too (see Cart.total).
+    subtotal = sum((item.subtotal for item in items), Decimal("0.00"))
+    tax = (subtotal * Decimal(str(SALES_TAX_RATE))).quantize(Decimal("0.01"))
+    total = subtotal + tax
+    if total <= 0:
+        return True
+
+    refund_id = None
+    if payment_record.stripe_payment_id:
+        try:
+            refund = gateway.create_refund(
+                payment_intent=payment_record.stripe_payment_id,
+                amount=gateway.to_cents(total),
+                idempotency_key=gateway.unbooked_refund_key(
+                    payment_record, [item.pk for item in items]),
+            )
+            refund_id = refund.id
+        except Exception as e:
+            logger.error(
+                "Refund for unbookable items failed on payment %s: %s",
+                payment_record.id,
+                e,
+            )
+
+    if refund_id is None:
+        logger.error(
+            "Payment %s needs a manual refund of $%s: slots taken at "
+            "checkout",
+            payment_record.id,
+            total,
+        )
+        PaymentHistory.objects.filter(pk=payment_record.pk).update(
+            notes=Concat(
+                "notes",
+                Value(f"\nREFUND NEEDED: ${total:.2f} for slots taken "
+                      "at checkout."),
+                output_field=models.TextField(),
+            ),
+        )
+        return False
+
+    if not PaymentHistory.objects.filter(stripe_refund_id=refund_id).exists():
+        PaymentHistory.objects.create(
+            user=user,
+            parent=payment_record,
+            amount=-total,
+            status="Refunded",
+            notes="Slot no longer available at checkout; refunded",
+            service_address=service_address,
+            stripe_refund_id=refund_id,
+        )
+    return True
+
+
+def _first_taken_item(items):
+    """The first cart item whose slot already has a live booking."""
+    slot_filter = models.Q()
+    for item in items:
+        slot_filter |= models.Q(
+            employee_id=item.employee_id,
+            date=item.date,
+            time_slot_id=item.time_slot_id,
+        )
+    taken_slots = set(
+        Booking.objects.filter(slot_filter)
+        .exclude(status="Cancelled")
+        .values_list("employee_id", "date", "time_slot_id")
+    )
+    for item in items:
+        if (item.employee_id, item.date, item.time_slot_id) in taken_slots:
+            return item
+    return None
+
+
 @login_required
 @verified_email_required
 def payment_history(request):
@@ -1798,114 +1888,102 @@ def payment_history(request):
 
     Inside each property card, group data by root payment transaction so the
     user can clearly see which scheduled services belong to which
-    payment chain.
+    payment chain. Chains are paged newest first with a keyset cursor;
+    "load more" requests (XHR) get the next page's cards as JSON.
     """
     user = request.user
 
-    roots = list(
-        PaymentHistory.objects.filter(user=user, parent__isnull=True)
-        .select_related("user")
-        .order_by("-created_at")
-    )
+    # One keyset page of root chains plus two prefetches (adjustments and
+    # bookings) and the page's ledgers; the cost of a page does not grow
+    # with the length of the user's history. compute_sections() reads the
+    # root's running totals, so no per-root queries happen below.
+    try:
+        roots, next_cursor = keyset_page(
+            PaymentHistory.objects.filter(user=user, parent__isnull=True)
+            .select_related("user")
+            .prefetch_related(
+                Prefetch(
+                    "adjustments",
+                    queryset=PaymentHistory.objects.order_by("created_at"),
+                ),
+                Prefetch(
+                    "linked_bookings_direct",
+                    queryset=(
+                        Booking.objects.select_related(
+                            "service_category", "time_slot", "employee"
+                        ).order_by("starts_at", "date")
+                    ),
+                ),
+            ),
+            request.GET.get("cursor"),
+            PAYMENT_HISTORY_PAGE_SIZE,
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor.")
 
+    # Roots arrive newest first, so cards keep first-seen order.
     grouped = {}
-
     for root in roots:
-        raw_address = (root.service_address or "Unknown").strip() or "Unknown"
-        address_key = normalize_address(raw_address) or raw_address.lower()
+        raw_address = normalize_address(root.service_address) or "Unknown"
+        address_key = AddressLedger.key_for(raw_address)
 
         if address_key not in grouped:
             grouped[address_key] = {
                 "address": raw_address,
-                "roots": [],
-                "latest_created_at": root.created_at,
+                "address_key": address_key,
+                "transactions": [],
             }
 
-        grouped[address_key]["roots"].append(root)
-
-        if root.created_at > grouped[address_key]["latest_created_at"]:
-            grouped[address_key]["latest_created_at"] = root.created_at
-
-    cards = []
-
-    for _, group in grouped.items():
-        address = group["address"]
-        transactions = []
-
-        original_total = Decimal("0.00")
-        add_total = Decimal("0.00")
-        cancel_total = Decimal("0.00")
-
-        for root in sorted(
-            group["roots"],
-            key=lambda r: r.created_at,
-            reverse=True
-        ):
-            entries = list(
-                PaymentHistory.objects.filter(
-                    models.Q(id=root.id) | models.Q(parent=root)
-                ).order_by("created_at")
-            )
-
-            bookings = list(
-                Booking.objects.filter(primary_payment_record=root)
-                .select_related("service_category", "time_slot", "employee")
-                .order_by("date", "time_slot__label")
-            )
-
-            r_original, r_add, r_cancel, r_net = root.compute_sections()
-            original_total += r_original
-            add_total += r_add
-            cancel_total += r_cancel
-
-            transaction_id = root.stripe_payment_id or f"payment-{root.id}"
-            short_transaction_id = (
-                transaction_id[:18] + "..."
-                if len(transaction_id) > 18
-                else transaction_id
-            )
-
-            transactions.append(
-                {
-                    "root": root,
-                    "transaction_id": transaction_id,
-                    "short_transaction_id": short_transaction_id,
-                    "payment_date": root.created_at,
-                    "entries": entries,
-                    "bookings": bookings,
-                    "original_total": r_original,
-                    "add_total": r_add,
-                    "cancel_total": r_cancel,
-                    "net_total": r_net,
-                }
-            )
-
-        net_total = original_total + add_total + cancel_total
+        r_original, r_add, r_cancel, r_net = root.compute_sections()
+        transaction_id = root.stripe_payment_id or f"payment-{root.id}"
+        short_transaction_id = (
+            transaction_id[:18] + "..."
+            if len(transaction_id) > 18
+            else transaction_id
+        )
 
-        cards.append(
+        grouped[address_key]["transactions"].append(
             {
-                "address": address,
-                "transactions": transactions,
-                "original_total": original_total,
-                "add_total": add_total,
-                "cancel_total": cancel_total,
-                "net_total": net_total,
-                "latest_created_at": group["latest_created_at"],
+                "root": root,
+                "transaction_id": transaction_id,
+                "short_transaction_id": short_transaction_id,
+                "payment_date": root.created_at,
+                "entries": sorted(
+                    [root, *root.adjustments.all()],
+                    key=lambda p: p.created_at,
+                ),
+                "bookings": list(root.linked_bookings_direct.all()),
+                "original_total": r_original,
+                "add_total": r_add,
+                "cancel_total": r_cancel,
+                "net_total": r_net,
             }
         )
 
-    cards.sort(
-        key=lambda c: (c["latest_created_at"], c["address"].lower()),
-        reverse=True,
-    )
+    # Property totals come from the maintained ledger, not from the
+    # chains on this page.
+    ledgers = {
+        ledger.address_key: ledger
+        for ledger in AddressLedger.objects.filter(
+            user=user, address_key__in=list(grouped))
+    }
+    cards = [
+        {**group, "ledger": ledgers.get(key)}
+        for key, group in grouped.items()
+    ]
+
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        return JsonResponse({
+            "html": render_to_string(
+                "billing/_payment_history_cards.html",
+                {"cards": cards},
+                request=request,
+            ),
+            "next_cursor": next_cursor,
+        })
 
-    logger.info(
-        "Found %s consolidated property cards for %s",
-        len(cards),
-        user.username,
-    )
     return render(
         request,
         "billing/payment_history.html",
-        {"cards": cards},
+        {"cards": cards, "next_cursor": next_cursor},
     )
@@ -0,0 +1,242 @@
+"""
+billing/webhooks.py
+Background processing of stored Stripe webhook events.
+
+`stripe_webhook` only verifies the signature and inserts a
+StripeWebhookEvent row. `process_pending()` (run by
+`manage.py process_stripe_events`) then handles stored events in Stripe
+creation order. Every handler is idempotent, because Stripe may deliver
+the same object change under several events.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import (
+    Payment,
+    PaymentHistory,
+    PaymentPayload,
+    StripeWebhookEvent,
+)
+
+logger = logging.getLogger(__name__)
+
+# Handler failures are retried on later passes, RETRY_BASE_SECONDS *
+# 2**(attempts - 1) apart (capped at RETRY_MAX_SECONDS), so a short
+# database or Stripe outage doesn't burn every attempt in seconds. After
+# MAX_ATTEMPTS the event is parked as failed for a human to look at in
+# the admin.
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 60 * 60
+
+
+def retry_delay(attempts: int) -> timedelta:
+    seconds = RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, RETRY_MAX_SECONDS))
+
+
+def store_event(event) -> bool:
+    """
+    Persist a verified Stripe event. Returns False for a redelivery of an
+    event that is already stored.
+    """
+    created = event.get("created")
+    stripe_created = (
+        datetime.fromtimestamp(created, tz=dt_timezone.utc)
+        if created else timezone.now()
+    )
+    try:
+        with transaction.atomic():
+            StripeWebhookEvent.objects.create(
+                event_id=event["id"],
+                event_type=event.get("type", ""),
+                stripe_created=stripe_created,
+                livemode=bool(event.get("livemode")),
+                payload=event.to_dict_recursive()
+                if hasattr(event, "to_dict_recursive") else dict(event),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+# ---------------------------------------------------------
+# Handlers
+# ---------------------------------------------------------
+def _payment_intent_succeeded(event):
+    """
+    Record the root PaymentHistory only. Bookings are created and linked
+    by payment_success(), which has the validated checkout session and
+    cart; the webhook never relinks bookings by address.
+    """
+    intent = event["data"]["object"]
+    stripe_payment_id = intent.get("id")
+    amount = Decimal(intent.get("amount_received", 0)) / Decimal("100")
+    metadata = intent.get("metadata", {}) or {}
+
+    user_id = metadata.get("user_id")
+    service_address = (metadata.get("service_address") or "").strip()
+    cart_id = metadata.get("cart_id")
+
+    Payment.objects.filter(stripe_payment_intent_id=stripe_payment_id).update(
+        status=Payment.Status.SUCCEEDED,
+        updated_at=timezone.now(),
+    )
+
+    if PaymentHistory.objects.filter(
+        stripe_payment_id=stripe_payment_id,
+        parent__isnull=True,
+    ).exists():
+        logger.info(
+            "Webhook skipped duplicate PaymentHistory for %s",
+            stripe_payment_id,
+        )
+        return
+
+    User = get_user_model()
+    user = User.objects.filter(id=user_id).first() if user_id else None
+
+    payment = PaymentHistory.objects.create(
+        user=user,
+        amount=amount,
+        adjustments_total_amt=Decimal("0.00"),
+        currency="USD",
+        status="Paid",
+        payment_type="Stripe Webhook Payment",
+        stripe_payment_id=stripe_payment_id,
+        service_address=service_address or "Unknown",
+        notes=(
+            "Initial booking payment (via webhook)"
+            if not cart_id
+            else f"Initial booking payment (via webhook, cart_id={cart_id})"
+        ),
+    )
+    PaymentPayload.objects.store(payment, event, source="webhook")
+
+    logger.info(
+        "[Webhook] PaymentHistory #%s recorded for user %s "
+        "(stripe_payment_id=%s, amount=$%s)",
+        payment.id,
+        user.username if user else "Unknown",
+        stripe_payment_id,
+        amount,
+    )
+
+
+def _payment_intent_status(status):
+    def handler(event):
+        intent = event["data"]["object"]
+        Payment.objects.filter(
+            stripe_payment_intent_id=intent.get("id"),
+        ).exclude(status=status).update(
+            status=status,
+            updated_at=timezone.now(),
+        )
+    return handler
+
+
+def _checkout_session_completed(event):
+    session = event["data"]["object"]
+    Payment.objects.filter(
+        stripe_checkout_session_id=session.get("id"),
+        stripe_payment_intent_id__isnull=True,
+    ).update(
+        stripe_payment_intent_id=session.get("payment_intent"),
+        updated_at=timezone.now(),
+    )
+
+
+def _charge_refunded(event):
+    charge = event["data"]["object"]
+    if not charge.get("refunded"):
+        # Partial refunds are recorded as PaymentHistory adjustments by
+        # the cancellation flow; the payment itself stays succeeded.
+        return
+    Payment.objects.filter(
+        stripe_payment_intent_id=charge.get("payment_intent"),
+    ).exclude(status="refunded").update(
+        status="refunded",
+        updated_at=timezone.now(),
+    )
+
+
+HANDLERS = {
+    "payment_intent.succeeded": _payment_intent_succeeded,
+    "payment_intent.processing": _payment_intent_status(
+        Payment.Status.PROCESSING),
+    "payment_intent.requires_action": _payment_intent_status(
+        Payment.Status.REQUIRES_ACTION),
+    "payment_intent.payment_failed": _payment_intent_status(
+        Payment.Status.REQUIRES_PAYMENT_METHOD),
+    "payment_intent.canceled": _payment_intent_status(
+        Payment.Status.CANCELED),
+    "checkout.session.completed": _checkout_session_completed,
+    "charge.refunded": _charge_refunded,
+}
+
+
+# ---------------------------------------------------------
+# Processing
+# ---------------------------------------------------------
+def process_pending(batch_size: int = 100):
+    """
+    Handle up to `batch_size` pending events that are due, in Stripe
+    creation order. Returns (processed, ignored, failed). Each event runs
+    in its own savepoint, so a failing handler leaves no partial writes
+    behind.
+    """
+    processed = ignored = failed = 0
+
+    with transaction.atomic():
+        events = list(
+            StripeWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=StripeWebhookEvent.Status.PENDING,
+                next_attempt_at__lte=timezone.now(),
+            )
+            .order_by("stripe_created", "id")[:batch_size]
+        )
+
+        for stored in events:
+            handler = HANDLERS.get(stored.event_type)
+            stored.attempts += 1
+
+            if handler is None:
+                stored.status = StripeWebhookEvent.Status.IGNORED
+                stored.processed_at = timezone.now()
+                ignored += 1
+            else:
+                try:
+                    with transaction.atomic():
+                        handler(stored.payload)
+                except Exception as e:
+                    logger.exception(
+                        "Stripe event %s (%s) failed",
+                        stored.event_id,
+                        stored.event_type,
+                    )
+                    stored.last_error = str(e)[:2000]
+                    if stored.attempts >= MAX_ATTEMPTS:
+                        stored.status = StripeWebhookEvent.Status.FAILED
+                    else:
+                        stored.next_attempt_at = (
+                            timezone.now() + retry_delay(stored.attempts))
+                    failed += 1
+                else:
+                    stored.status = StripeWebhookEvent.Status.PROCESSED
+                    stored.processed_at = timezone.now()
+                    stored.last_error = ""
+                    processed += 1
+
+            stored.save(update_fields=[
+                "status", "attempts", "last_error", "processed_at",
+                "next_attempt_at"])
+
+    return processed, ignored, failed
@@ -1,6 +1,11 @@
 from django.contrib import admin
 
-from .models import Address, NewsletterSubscription
+from .models import (
+    Address,
+    NewsletterRun,
+    NewsletterSubscription,
+    OutboundEmail,
+)
 
 
 @admin.register(Address)
@@ -24,3 +29,41 @@ class NewsletterSubscriptionAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "user__email", "token")
     list_filter = ("unsubscribed", "next_send_on", "created_at")
     readonly_fields = ("token", "created_at", "updated_at")
+
+
+@admin.register(NewsletterRun)
+class NewsletterRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "send_date",
+        "force",
+        "source",
+        "shard",
+        "shards",
+        "status",
+        "sent",
+        "failed",
+        "total",
+        "last_id",
+        "created_at",
+    )
+    list_filter = ("status", "force", "source")
+    readonly_fields = ("source", "created_at", "started_at", "finished_at",
+                       "updated_at", "last_id", "sent", "failed", "total")
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "subject",
+        "to",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("subject", "dedupe_key")
+    readonly_fields = ("created_at", "sent_at", "claimed_at", "last_error")
+    ordering = ("-created_at",)
@@ -0,0 +1,55 @@
+"""
+core/admin_utils.py
+Changelist helpers for admin pages over large tables.
+
+An unfiltered changelist normally runs `SELECT COUNT(*)` over the whole
+table on every page view, and a filtered one runs it twice (filtered
+and full). On PostgreSQL the unfiltered count is replaced with the
+planner's estimate once a table is big enough for the difference not
+to matter; the full count next to filtered results is switched off.
+"""
+from __future__ import annotations
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+# Below this many (estimated) rows an exact count is cheap enough.
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+def estimated_row_count(queryset):
+    """Planner row estimate for the queryset's table (PostgreSQL only)."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 for a table that has never been analyzed.
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Uses the row estimate for unfiltered querysets on large tables."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_row_count(queryset)
+            if estimate is not None and (
+                    estimate >= ESTIMATED_COUNT_THRESHOLD):
+                return estimate
+        return super().count
+
+
+class LargeTableAdminMixin:
+    """Cheap changelist counts for models with millions of rows."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,69 @@
+# core/management/commands/process_newsletter_runs.py
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.newsletter import claim_run, execute_run
+
+
+class Command(BaseCommand):
+    help = (
+        "Execute newsletter runs queued from the staff 'send now' button. "
+        "Use --loop to run as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Subscriptions loaded, sent and checkpointed per batch.",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help="Max messages per second (default: no cap).",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for queued runs instead of exiting when idle.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls when nothing is queued.",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+
+        while True:
+            run = claim_run()
+            if run is None:
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            self.stdout.write(f"Running {run}")
+            try:
+                execute_run(
+                    run,
+                    batch_size=options["batch_size"],
+                    rate=options["rate"],
+                )
+            except Exception as e:
+                # The run is marked failed with the error; keep serving.
+                self.stderr.write(f"Run {run.pk} failed: {e}")
+            else:
+                self.stdout.write(
+                    f"Run {run.pk}: Sent={run.sent} Failed={run.failed}")
+            processed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done. Runs={processed}"))
@@ -1,20 +1,22 @@
 # core/management/commands/send_monthly_newsletter.py
 from __future__ import annotations
 
-from django.conf import settings
-from django.core.mail import send_mail
-from django.core.management.base import BaseCommand
-from django.template.loader import render_to_string
-from django.utils import timezone
+import time
 
-from core.models import NewsletterSubscription, first_day_next_month
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import NewsletterRun
+from core.newsletter import claim_cli_run, execute_run, start_cli_run
 
 
 class Command(BaseCommand):
     help = (
         "Send monthly newsletter to subscribed users. "
         "Default mode sends only to users due today. "
-        "Use --force to send immediately to all subscribed users."
+        "Use --force to send immediately to all subscribed users. "
+        "Run several copies with --shards/--shard to split the list "
+        "across parallel workers. Progress is checkpointed per batch; "
+        "use --resume to continue an interrupted run."
     )
 
     def add_arguments(self, parser):
@@ -26,86 +28,125 @@ class Command(BaseCommand):
                 "ignoring next_send_on."
             ),
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Subscriptions loaded, sent and updated per batch.",
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=1,
+            help="Total number of parallel workers splitting this run.",
+        )
+        parser.add_argument(
+            "--shard",
+            type=int,
+            default=0,
+            help="Which shard this worker handles (0-based, id % shards).",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help="Max messages per second for this worker (default: no cap).",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help=(
+                "Continue the latest unfinished run for this mode and shard "
+                "from its last checkpoint instead of starting a new one."
+            ),
+        )
+        parser.add_argument(
+            "--run",
+            type=int,
+            default=None,
+            help="Execute (or resume) the NewsletterRun with this id.",
+        )
 
     def handle(self, *args, **options):
-        today = timezone.localdate()
         force = options.get("force", False)
-
-        qs = NewsletterSubscription.objects.select_related("user").filter(
-            unsubscribed=False,
-        )
-
-        if not force:
-            qs = qs.filter(next_send_on__lte=today)
-
-        sent = 0
-        failed = 0
-
-        base_url = getattr(settings, "SITE_BASE_URL", "").rstrip("/")
-
-        for sub in qs:
-            user = sub.user
-
-            if not user.email:
-                failed += 1
-                self.stdout.write(
-                    self.style.WARNING(
-                        f"Skipping user {user.pk} - no email address."
-                    )
-                )
-                continue
-
-            ctx = {
-                "user": user,
-                "send_date": today.strftime("%Y-%m-%d"),
-                "unsubscribe_url": (
-                    f"{base_url}/newsletter/unsubscribe/{sub.token}/"
-                    if base_url
-                    else f"/newsletter/unsubscribe/{sub.token}/"
-                ),
-            }
-
-            subject = "🗞️ Your Tucker & Dale’s Monthly Newsletter"
-            html_body = render_to_string(
-                "emails/newsletter_monthly.html",
-                ctx,
-            )
-            text_body = render_to_string(
-                "emails/newsletter_monthly.txt",
-                ctx,
+        shards = options["shards"]
+        shard = options["shard"]
+
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if shards < 1 or not 0 <= shard < shards:
+            raise CommandError("--shard must be between 0 and --shards - 1.")
+
+        run = self._get_run(options, force=force, shards=shards, shard=shard)
+        if run.last_id:
+            self.stdout.write(
+                f"Resuming run {run.pk} after id={run.last_id} "
+                f"(sent={run.sent} failed={run.failed})"
             )
 
-            try:
-                send_mail(
-                    subject,
-                    text_body,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [user.email],
-                    html_message=html_body,
-                    fail_silently=False,
-                )
-                sent += 1
+        sent_before = run.sent
+        started = time.monotonic()
 
-                if not force:
-                    sub.next_send_on = first_day_next_month(today)
-                    sub.save(update_fields=["next_send_on", "updated_at"])
+        def report(run, result):
+            self.stdout.write(
+                f"Batch up to id={result.last_id}: "
+                f"sent={len(result.sent_ids)} failed={result.failed}"
+            )
 
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Sent newsletter to {user.email}"
-                    )
-                )
-            except Exception as e:
-                failed += 1
-                self.stdout.write(
-                    self.style.ERROR(
-                        f"Failed to send to {user.email}: {e}"
-                    )
-                )
+        execute_run(
+            run,
+            batch_size=options["batch_size"],
+            rate=options["rate"],
+            on_batch=report,
+        )
 
-        mode = "FORCE" if force else "SCHEDULED"
+        elapsed = max(time.monotonic() - started, 1e-6)
+        mode = "FORCE" if run.force else "SCHEDULED"
         self.stdout.write(
             self.style.SUCCESS(
-                f"Done. Mode={mode} Sent={sent} Failed={failed}"
+                f"Done. Mode={mode} Sent={run.sent} Failed={run.failed} "
+                f"Rate={(run.sent - sent_before) / elapsed:.1f}/s"
             )
         )
+
+    def _get_run(self, options, *, force, shards, shard):
+        """
+        Claim the run to send, marked RUNNING before this returns so the
+        background worker and other copies of this command leave it alone.
+        """
+        unfinished = [NewsletterRun.Status.QUEUED,
+                      NewsletterRun.Status.RUNNING,
+                      NewsletterRun.Status.FAILED]
+
+        if options["run"]:
+            runs = NewsletterRun.objects.filter(pk=options["run"])
+            run = runs.first()
+            if run is None:
+                raise CommandError(f"NewsletterRun {options['run']} not found.")
+            if run.status not in unfinished:
+                raise CommandError(f"NewsletterRun {run.pk} is {run.status}.")
+            claimed = claim_cli_run(runs)
+            if claimed is None:
+                raise CommandError(
+                    f"NewsletterRun {run.pk} is being sent by another "
+                    "process.")
+            return claimed
+
+        if options["resume"]:
+            run = claim_cli_run(
+                NewsletterRun.objects.filter(
+                    status__in=unfinished, force=force,
+                    shards=shards, shard=shard,
+                    source=NewsletterRun.Source.CLI,
+                )
+            )
+            if run is not None:
+                return run
+            self.stdout.write("No unfinished run to resume; starting a new one.")
+
+        run, created = start_cli_run(force=force, shards=shards, shard=shard)
+        if not created:
+            raise CommandError(
+                f"NewsletterRun {run.pk} for this mode and shard is being "
+                "sent by another process.")
+        return run
@@ -0,0 +1,72 @@
+# core/management/commands/send_queued_emails.py
+from __future__ import annotations
+
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from core.outbox import deliver_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued emails from the OutboundEmail outbox in batches "
+        "over one reused connection. Use --loop to run as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Emails claimed and sent per batch.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new emails instead of exiting when idle.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls when the outbox is empty.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        loop = options["loop"]
+
+        totals = {"sent": 0, "retried": 0, "failed": 0}
+        connection = get_connection()
+
+        try:
+            while True:
+                sent, retried, failed = deliver_batch(
+                    batch_size, connection=connection)
+                totals["sent"] += sent
+                totals["retried"] += retried
+                totals["failed"] += failed
+
+                if sent or retried or failed:
+                    self.stdout.write(
+                        f"Batch: Sent={sent} Retried={retried} "
+                        f"Failed={failed}"
+                    )
+                    continue
+
+                if not loop:
+                    break
+                # Do not hold an idle SMTP session open between polls.
+                connection.close()
+                time.sleep(options["sleep"])
+        finally:
+            connection.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. Sent={totals['sent']} Retried={totals['retried']} "
+                f"Failed={totals['failed']}"
+            )
+        )
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:10
+
+from django.db import migrations, models
+
+
+def mark_cli_runs(apps, schema_editor):
+    """Only the staff 'send now' button records who requested a run."""
+    NewsletterRun = apps.get_model("core", "NewsletterRun")
+    NewsletterRun.objects.filter(requested_by__isnull=True).update(
+        source="cli")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_newsletterrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletterrun',
+            name='source',
+            field=models.CharField(choices=[('worker', 'Worker'), ('cli', 'Command line')], default='worker', max_length=10),
+        ),
+        migrations.RunPython(mark_cli_runs, migrations.RunPython.noop),
+    ]
@@ -76,3 +76,119 @@ class NewsletterSubscription(models.Model):
             f"NewsletterSubscription<{self.user}> "
             f"unsub={self.unsubscribed}, next={self.next_send_on}"
         )
+
+
+class NewsletterRun(models.Model):
+    """
+    One newsletter send (optionally one shard of it), checkpointed per
+    batch. `last_id` is a keyset cursor over NewsletterSubscription ids,
+    so an interrupted run resumes after the last committed batch instead
+    of rescanning or resending.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    class Source(models.TextChoices):
+        # Queued by `newsletter_send_now`; only process_newsletter_runs
+        # claims these.
+        WORKER = "worker", "Worker"
+        # Started by `send_monthly_newsletter`, which sends it itself.
+        CLI = "cli", "Command line"
+
+    force = models.BooleanField(default=False)
+    source = models.CharField(
+        max_length=10,
+        choices=Source.choices,
+        default=Source.WORKER,
+    )
+    send_date = models.DateField(default=timezone.localdate)
+    shards = models.PositiveSmallIntegerField(default=1)
+    shard = models.PositiveSmallIntegerField(default=0)
+
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    last_id = models.BigIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    requested_by = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        mode = "FORCE" if self.force else "SCHEDULED"
+        return (
+            f"NewsletterRun<{self.pk} {mode} {self.send_date} "
+            f"shard {self.shard}/{self.shards}> {self.status}"
+        )
+
+
+class OutboundEmail(models.Model):
+    """
+    Durable email outbox. Request paths enqueue rows here (inside their own
+    transaction) and `manage.py send_queued_emails` delivers them in batches
+    over a single SMTP connection, with retries and backoff.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENDING = "sending", "Sending"
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+
+    dedupe_key = models.CharField(
+        max_length=200,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Optional idempotency key; duplicates are not enqueued.",
+    )
+    subject = models.CharField(max_length=255)
+    body_text = models.TextField()
+    body_html = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"OutboundEmail<{self.subject!r} → {self.to}> {self.status}"
@@ -0,0 +1,407 @@
+# core/newsletter.py
+"""
+Batch newsletter delivery used by `manage.py send_monthly_newsletter`.
+
+The newsletter body is rendered once per run with placeholder tokens for
+the few per-subscriber fields; each message then only needs two string
+substitutions. Subscribers are walked with a keyset cursor on id and sent
+over one reused mail connection. After every batch, `next_send_on` and the
+NewsletterRun cursor are committed together, so a crashed run resumes
+from the last checkpoint.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Mod
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import NewsletterRun, NewsletterSubscription, first_day_next_month
+
+logger = logging.getLogger(__name__)
+
+SUBJECT = "🗞️ Your Tucker & Dale’s Monthly Newsletter"
+NAME_TOKEN = "__NEWSLETTER_NAME__"
+UNSUBSCRIBE_TOKEN = "__NEWSLETTER_UNSUBSCRIBE_URL__"
+
+# A running run whose checkpoint has not moved for this long belongs to a
+# dead worker and may be claimed again.
+STALE_RUN_MINUTES = 15
+# While sending, a run touches `updated_at` at least this often so a
+# slow batch is never mistaken for a dead one.
+HEARTBEAT_SECONDS = 60
+
+
+@dataclass
+class RenderedNewsletter:
+    subject: str
+    text: str
+    html: str
+
+
+@dataclass
+class BatchResult:
+    last_id: int
+    sent_ids: list = field(default_factory=list)
+    failed: int = 0
+
+
+def render_newsletter(send_date) -> RenderedNewsletter:
+    """Render the shared body once, with tokens for per-user fields."""
+    ctx = {
+        "user": SimpleNamespace(first_name=NAME_TOKEN, username=NAME_TOKEN),
+        "send_date": send_date.strftime("%Y-%m-%d"),
+        "unsubscribe_url": UNSUBSCRIBE_TOKEN,
+    }
+    return RenderedNewsletter(
+        subject=SUBJECT,
+        text=render_to_string("emails/newsletter_monthly.txt", ctx),
+        html=render_to_string("emails/newsletter_monthly.html", ctx),
+    )
+
+
+def unsubscribe_url(token: str) -> str:
+    base_url = getattr(settings, "SITE_BASE_URL", "").rstrip("/")
+    path = f"/newsletter/unsubscribe/{token}/"
+    return f"{base_url}{path}" if base_url else path
+
+
+def build_message(sub, rendered: RenderedNewsletter, connection=None):
+    """Personalise the pre-rendered newsletter for one subscription."""
+    user = sub.user
+    name = user.first_name or user.username
+    url = unsubscribe_url(sub.token)
+
+    text = rendered.text.replace(NAME_TOKEN, name).replace(
+        UNSUBSCRIBE_TOKEN, url)
+    html = rendered.html.replace(NAME_TOKEN, escape(name)).replace(
+        UNSUBSCRIBE_TOKEN, escape(url))
+
+    message = EmailMultiAlternatives(
+        rendered.subject,
+        text,
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+        connection=connection,
+    )
+    message.attach_alternative(html, "text/html")
+    return message
+
+
+def subscriptions_for_run(today, *, force=False, shards=1, shard=0):
+    """
+    Subscriptions to deliver for this run, optionally restricted to one
+    shard (`id % shards == shard`) so several workers can split the list.
+    """
+    qs = NewsletterSubscription.objects.filter(unsubscribed=False)
+    if not force:
+        qs = qs.filter(next_send_on__lte=today)
+    if shards > 1:
+        qs = qs.annotate(shard=Mod(F("id"), shards)).filter(shard=shard)
+    return qs
+
+
+def iter_batches(queryset, batch_size, after_id=0):
+    """Keyset-paginate `queryset` by id, yielding lists of subscriptions."""
+    last_id = after_id
+    while True:
+        batch = list(
+            queryset.select_related("user")
+            .filter(id__gt=last_id)
+            .order_by("id")[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+class RateLimiter:
+    """Simple pacing: at most `rate` calls to wait() per second."""
+
+    def __init__(self, rate: float | None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+class Heartbeat:
+    """Touch the run's `updated_at` at most every HEARTBEAT_SECONDS."""
+
+    def __init__(self, run, interval=HEARTBEAT_SECONDS):
+        self.run_pk = run.pk
+        self.interval = interval
+        self._next = time.monotonic() + interval
+
+    def __call__(self):
+        now = time.monotonic()
+        if now < self._next:
+            return
+        NewsletterRun.objects.filter(pk=self.run_pk).update(
+            updated_at=timezone.now())
+        self._next = now + self.interval
+
+
+def send_batch(batch, rendered, connection, *, limiter=None,
+               heartbeat=None):
+    """
+    Send one batch over an open connection. The only database write is
+    the optional `heartbeat()`, called once per subscription.
+    """
+    result = BatchResult(last_id=batch[-1].id)
+    limiter = limiter or RateLimiter(None)
+
+    for sub in batch:
+        if heartbeat:
+            heartbeat()
+        if not sub.user.email:
+            result.failed += 1
+            logger.warning("Newsletter skipped user %s: no email.",
+                           sub.user_id)
+            continue
+
+        limiter.wait()
+        try:
+            connection.send_messages([build_message(sub, rendered)])
+            result.sent_ids.append(sub.id)
+        except Exception as e:
+            result.failed += 1
+            logger.error("Newsletter to %s failed: %s", sub.user.email, e)
+            # Reset a possibly broken SMTP session before the next send.
+            connection.close()
+            try:
+                connection.open()
+            except Exception:
+                pass
+
+    return result
+
+
+def commit_batch(run, result):
+    """
+    Checkpoint one delivered batch: advance `next_send_on` for the sent
+    subscriptions and move the run cursor, in a single transaction.
+    """
+    with transaction.atomic():
+        if result.sent_ids and not run.force:
+            NewsletterSubscription.objects.filter(
+                id__in=result.sent_ids
+            ).update(
+                next_send_on=first_day_next_month(run.send_date),
+                updated_at=timezone.now(),
+            )
+        NewsletterRun.objects.filter(pk=run.pk).update(
+            last_id=result.last_id,
+            sent=F("sent") + len(result.sent_ids),
+            failed=F("failed") + result.failed,
+            updated_at=timezone.now(),
+        )
+    run.last_id = result.last_id
+    run.sent += len(result.sent_ids)
+    run.failed += result.failed
+
+
+def execute_run(run, *, batch_size=500, rate=None, connection=None,
+                on_batch=None):
+    """
+    Deliver (or resume) a NewsletterRun from its cursor to the end.
+    `on_batch(run, result)` is called after each committed batch.
+    """
+    qs = subscriptions_for_run(
+        run.send_date, force=run.force, shards=run.shards, shard=run.shard)
+
+    run.status = NewsletterRun.Status.RUNNING
+    run.started_at = run.started_at or timezone.now()
+    run.error = ""
+    if not run.total:
+        run.total = qs.count()
+    run.save(update_fields=[
+        "status", "started_at", "error", "total", "updated_at"])
+
+    rendered = render_newsletter(run.send_date)
+    limiter = RateLimiter(rate)
+    heartbeat = Heartbeat(run)
+    own_connection = connection is None
+    connection = connection or get_connection()
+
+    try:
+        connection.open()
+        for batch in iter_batches(qs, batch_size, after_id=run.last_id):
+            result = send_batch(batch, rendered, connection,
+                                limiter=limiter, heartbeat=heartbeat)
+            commit_batch(run, result)
+            if on_batch:
+                on_batch(run, result)
+    except BaseException as e:
+        run.status = NewsletterRun.Status.FAILED
+        run.error = str(e)[:2000] or e.__class__.__name__
+        run.save(update_fields=["status", "error", "updated_at"])
+        raise
+    finally:
+        if own_connection:
+            connection.close()
+
+    run.status = NewsletterRun.Status.COMPLETED
+    run.finished_at = timezone.now()
+    run.save(update_fields=["status", "finished_at", "updated_at"])
+    return run
+
+
+def enqueue_run(*, force=True, requested_by=None):
+    """
+    Queue a run for the background worker. An identical worker run that
+    is still queued or running is returned instead of starting a second
+    one; CLI runs never block it, since the worker cannot resume them.
+    """
+    with transaction.atomic():
+        existing = (
+            NewsletterRun.objects.select_for_update()
+            .filter(
+                source=NewsletterRun.Source.WORKER,
+                force=force,
+                shards=1,
+                status__in=[NewsletterRun.Status.QUEUED,
+                            NewsletterRun.Status.RUNNING],
+            )
+            .order_by("created_at")
+            .first()
+        )
+        if existing is not None:
+            return existing, False
+        run = NewsletterRun.objects.create(
+            force=force,
+            send_date=timezone.localdate(),
+            requested_by=requested_by,
+        )
+    return run, True
+
+
+def _stale_cutoff():
+    return timezone.now() - timedelta(minutes=STALE_RUN_MINUTES)
+
+
+def claim_run():
+    """
+    Claim the oldest queued worker run (or a stale running one) for this
+    worker. Runs started by `send_monthly_newsletter` are never touched.
+    Uses SKIP LOCKED where supported so workers never share a run.
+    """
+    claimable = Q(status=NewsletterRun.Status.QUEUED) | Q(
+        status=NewsletterRun.Status.RUNNING, updated_at__lt=_stale_cutoff()
+    )
+
+    with transaction.atomic():
+        run = (
+            NewsletterRun.objects.select_for_update(skip_locked=True)
+            .filter(claimable, source=NewsletterRun.Source.WORKER)
+            .order_by("created_at")
+            .first()
+        )
+        if run is None:
+            return None
+        run.status = NewsletterRun.Status.RUNNING
+        run.save(update_fields=["status", "updated_at"])
+    return run
+
+
+def claim_cli_run(runs):
+    """
+    Take the newest unfinished run in `runs` for the command line,
+    marking it RUNNING in the same transaction. A run another process is
+    still sending (fresh heartbeat) is never taken. Returns None if
+    nothing is claimable.
+    """
+    claimable = Q(
+        status__in=[NewsletterRun.Status.QUEUED, NewsletterRun.Status.FAILED]
+    ) | Q(status=NewsletterRun.Status.RUNNING, updated_at__lt=_stale_cutoff())
+
+    with transaction.atomic():
+        run = (
+            runs.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by("-created_at")
+            .first()
+        )
+        if run is None:
+            return None
+        run.status = NewsletterRun.Status.RUNNING
+        run.source = NewsletterRun.Source.CLI
+        run.started_at = run.started_at or timezone.now()
+        run.save(update_fields=[
+            "status", "source", "started_at", "updated_at"])
+    return run
+
+
+def start_cli_run(*, force, shards=1, shard=0):
+    """
+    Create a run for the command line, already RUNNING, unless a live
+    run for the same mode and shard is being sent. Returns
+    (run, created), like `enqueue_run`.
+    """
+    with transaction.atomic():
+        busy = (
+            NewsletterRun.objects.select_for_update()
+            .filter(
+                force=force,
+                shards=shards,
+                shard=shard,
+                status=NewsletterRun.Status.RUNNING,
+                updated_at__gte=_stale_cutoff(),
+            )
+            .first()
+        )
+        if busy is not None:
+            return busy, False
+        run = NewsletterRun.objects.create(
+            force=force,
+            send_date=timezone.localdate(),
+            shards=shards,
+            shard=shard,
+            source=NewsletterRun.Source.CLI,
+            status=NewsletterRun.Status.RUNNING,
+            started_at=timezone.now(),
+        )
+    return run, True
+
+
+def run_progress(run) -> dict:
+    """Structured counters for the progress endpoint."""
+    done = run.sent + run.failed
+    rate = 0.0
+    if run.started_at and run.sent:
+        end = run.finished_at or timezone.now()
+        elapsed = (end - run.started_at).total_seconds()
+        rate = round(run.sent / max(elapsed, 1e-6), 1)
+
+    return {
+        "id": run.pk,
+        "status": run.status,
+        "mode": "FORCE" if run.force else "SCHEDULED",
+        "total": run.total,
+        "queued": max(run.total - done, 0),
+        "sent": run.sent,
+        "failed": run.failed,
+        "rate": rate,
+        "created_at": run.created_at.isoformat(),
+        "started_at": run.started_at and run.started_at.isoformat(),
+        "finished_at": run.finished_at and run.finished_at.isoformat(),
+        "error": run.error,
+    }
@@ -0,0 +1,174 @@
+# core/outbox.py
+"""
+Email outbox helpers.
+
+`enqueue_email` is what request-path code calls instead of `send_mail`;
+`deliver_batch` is used by the `send_queued_emails` worker command.
+"""
+from __future__ import annotations
+
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------
+# 🔹 Tunables
+# -----------------------------------------------------
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 60 * 60 * 6
+STALE_CLAIM_MINUTES = 15
+
+
+def enqueue_email(subject, body_text, to, *, html=None, from_email=None,
+                  dedupe_key=None):
+    """
+    Store an email for background delivery and return the outbox row.
+
+    When `dedupe_key` is given, a second enqueue with the same key is a
+    no-op and returns the existing row.
+    """
+    recipients = [to] if isinstance(to, str) else list(to)
+    fields = {
+        "subject": subject,
+        "body_text": body_text,
+        "body_html": html or "",
+        "from_email": from_email or settings.DEFAULT_FROM_EMAIL,
+        "to": recipients,
+    }
+
+    if not dedupe_key:
+        return OutboundEmail.objects.create(**fields)
+
+    try:
+        with transaction.atomic():
+            return OutboundEmail.objects.create(dedupe_key=dedupe_key, **fields)
+    except IntegrityError:
+        return OutboundEmail.objects.get(dedupe_key=dedupe_key)
+
+
+def _backoff(attempts: int) -> timedelta:
+    """Exponential backoff with full jitter, capped."""
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempts)
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+
+def claim_batch(batch_size: int):
+    """
+    Atomically claim up to `batch_size` due emails for this worker.
+    Rows stuck in `sending` (crashed worker) are reclaimed after
+    STALE_CLAIM_MINUTES. Uses SKIP LOCKED where the database supports it,
+    so several workers can run side by side.
+    """
+    now = timezone.now()
+    stale = now - timedelta(minutes=STALE_CLAIM_MINUTES)
+    due = Q(status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now) | Q(
+        status=OutboundEmail.Status.SENDING, claimed_at__lt=stale
+    )
+
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=ids).update(
+            status=OutboundEmail.Status.SENDING,
+            claimed_at=now,
+        )
+
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by("id"))
+
+
+def _mark_failed(email, error) -> bool:
+    """Schedule a retry (or give up); return True when given up."""
+    attempts = email.attempts + 1
+    gave_up = attempts >= MAX_ATTEMPTS
+    OutboundEmail.objects.filter(id=email.id).update(
+        status=(OutboundEmail.Status.FAILED if gave_up
+                else OutboundEmail.Status.PENDING),
+        attempts=attempts,
+        next_attempt_at=timezone.now() + _backoff(attempts),
+        last_error=str(error)[:2000],
+    )
+    if gave_up:
+        logger.error(
+            "Outbox email #%s failed permanently: %s", email.id, error)
+    else:
+        logger.warning(
+            "Outbox email #%s failed (attempt %s): %s",
+            email.id, attempts, error)
+    return gave_up
+
+
+def deliver_batch(batch_size: int = 100, connection=None):
+    """
+    Claim and send one batch over a single (reused) mail connection.
+    Returns (sent, retried, failed).
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0, 0
+
+    sent_ids = []
+    retried = 0
+    failed = 0
+
+    own_connection = connection is None
+    connection = connection or get_connection()
+
+    try:
+        connection.open()
+    except Exception as e:
+        # Mail server unreachable: the whole batch goes back to the queue.
+        for email in emails:
+            if _mark_failed(email, e):
+                failed += 1
+            else:
+                retried += 1
+        return 0, retried, failed
+
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                email.subject,
+                email.body_text,
+                email.from_email or settings.DEFAULT_FROM_EMAIL,
+                email.to,
+                connection=connection,
+            )
+            if email.body_html:
+                message.attach_alternative(email.body_html, "text/html")
+
+            try:
+                message.send(fail_silently=False)
+                sent_ids.append(email.id)
+            except Exception as e:
+                # Drop a possibly broken connection; the next send reopens.
+                connection.close()
+                if _mark_failed(email, e):
+                    failed += 1
+                else:
+                    retried += 1
+    finally:
+        if sent_ids:
+            OutboundEmail.objects.filter(id__in=sent_ids).update(
+                status=OutboundEmail.Status.SENT,
+                sent_at=timezone.now(),
+                last_error="",
+            )
+        if own_connection:
+            connection.close()
+
+    return len(sent_ids), retried, failed
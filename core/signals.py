@@ -2,7 +2,6 @@ from allauth.account.signals import email_confirmed, user_signed_up
 from allauth.account.utils import perform_login
 
 from django.conf import settings
-from django.core.mail import send_mail
 from django.dispatch import receiver
 from django.shortcuts import redirect
 from django.template.loader import render_to_string
@@ -11,6 +10,7 @@ from django.utils import timezone
 from django.utils.html import strip_tags
 
 from .models import NewsletterSubscription, first_day_next_month
+from .outbox import enqueue_email
 
 import logging
 logger = logging.getLogger(__name__)
@@ -61,18 +61,16 @@ def send_welcome_email(request, user, **kwargs):
         )
         plain_message = strip_tags(html_message)
 
-        sent_count = send_mail(
+        enqueue_email(
             subject,
             plain_message,
-            settings.DEFAULT_FROM_EMAIL,
             [user.email],
-            html_message=html_message,
-            fail_silently=False,
+            html=html_message,
+            dedupe_key=f"welcome:{user.pk}",
         )
-        print(
-            f"Welcome email send_mail returned {sent_count} for {user.email}")
-    except Exception as e:
-        print(f"Failed to send welcome email to {user.email}: {e}")
+        logger.info("Welcome email queued for %s", user.email)
+    except Exception:
+        logger.exception("Failed to queue welcome email to %s", user.email)
 
     try:
         next_on = first_day_next_month(timezone.localdate())
@@ -98,18 +96,19 @@ def send_welcome_email(request, user, **kwargs):
         txt = render_to_string(
             "emails/newsletter_welcome.txt", ctx, request=request)
 
-        sent_count = send_mail(
+        enqueue_email(
             "You’re subscribed to Tucker & Dale’s Monthly Newsletter",
             txt,
-            settings.DEFAULT_FROM_EMAIL,
             [user.email],
-            html_message=html,
-            fail_silently=False,
+            html=html,
+            dedupe_key=f"newsletter-welcome:{user.pk}",
         )
-        print(
-            f"Newsletter send_mail returned {sent_count} for {user.email}; "
-            f"first issue {next_on} "
-            f"({'created' if created else 'already existed'})"
+        logger.info(
+            "Newsletter welcome queued for %s; first issue %s (%s)",
+            user.email,
+            next_on,
+            "created" if created else "already existed",
         )
-    except Exception as e:
-        print(f"Newsletter auto-subscribe/notify failed for {user.email}: {e}")
+    except Exception:
+        logger.exception(
+            "Newsletter auto-subscribe/notify failed for %s", user.email)
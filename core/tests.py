@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+
+from core import outbox
+from core.models import OutboundEmail
+
+
+class FailingConnection:
+    """Mail connection that opens fine but rejects every message."""
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        raise OSError("mail server said no")
+
+
+class OutboxTests(TestCase):
+    """enqueue_email / deliver_batch: claim, deliver, retry with backoff."""
+
+    def enqueue(self, **kwargs):
+        return outbox.enqueue_email(
+            "Hello", "Body", ["customer@example.com"], **kwargs)
+
+    def test_dedupe_key_enqueues_once(self):
+        first = self.enqueue(dedupe_key="receipt:1")
+        second = self.enqueue(dedupe_key="receipt:1")
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_due_email_is_delivered_once(self):
+        email = self.enqueue()
+
+        self.assertEqual(outbox.deliver_batch(), (1, 0, 0))
+        self.assertEqual(outbox.deliver_batch(), (0, 0, 0))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.SENT)
+        self.assertIsNotNone(email.sent_at)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["customer@example.com"])
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        email = self.enqueue()
+
+        with self.assertLogs(outbox.logger, "WARNING"):
+            for attempt in range(1, outbox.MAX_ATTEMPTS + 1):
+                before = timezone.now()
+                sent, retried, failed = outbox.deliver_batch(
+                    connection=FailingConnection())
+                email.refresh_from_db()
+                self.assertEqual(email.attempts, attempt)
+                self.assertEqual(email.last_error, "mail server said no")
+                if attempt < outbox.MAX_ATTEMPTS:
+                    self.assertEqual((sent, retried, failed), (0, 1, 0))
+                    self.assertEqual(email.status,
+                                     OutboundEmail.Status.PENDING)
+                    self.assertGreater(email.next_attempt_at, before)
+                    # Not claimed again before its retry time.
+                    self.assertEqual(outbox.claim_batch(10), [])
+                    OutboundEmail.objects.filter(pk=email.pk).update(
+                        next_attempt_at=timezone.now())
+
+        self.assertEqual((sent, retried, failed), (0, 0, 1))
+        self.assertEqual(email.status, OutboundEmail.Status.FAILED)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_stale_claim_is_reclaimed(self):
+        email = self.enqueue()
+        self.assertEqual(outbox.claim_batch(10), [email])
+        self.assertEqual(outbox.claim_batch(10), [])
+
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            claimed_at=timezone.now()
+            - timedelta(minutes=outbox.STALE_CLAIM_MINUTES + 1))
+        self.assertEqual(outbox.claim_batch(10), [email])
@@ -12,6 +12,8 @@ urlpatterns = [
         name="newsletter_resubscribe",),
     path("newsletter/send-now/", views.newsletter_send_now,
          name="newsletter_send_now"),
+    path("newsletter/runs/<int:run_id>/progress/",
+         views.newsletter_run_progress, name="newsletter_run_progress"),
     path("", views.home, name="home"),
 
     path("test-500/", views.test_500, name="test_500"),
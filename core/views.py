@@ -6,12 +6,14 @@ from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
 from customers.models import CustomerProfile
 
-from .models import NewsletterSubscription, first_day_next_month
+from .models import NewsletterRun, NewsletterSubscription, first_day_next_month
+from .newsletter import enqueue_run, run_progress
 
 logger = logging.getLogger(__name__)
 
@@ -98,49 +100,28 @@ def newsletter_resubscribe(request):
 
 @staff_member_required
 def newsletter_send_now(request):
-    import re
-    from io import StringIO
-    from django.core.management import call_command
-
-    out = StringIO()
-
-    try:
-        call_command(
-            "send_monthly_newsletter",
-            force=True,
-            stdout=out,
-        )
-
-        output = out.getvalue()
-
-        # Remove ANSI color codes from management command output
-        clean_output = re.sub(r"\x1b\[[0-9;]*m", "", output)
-
-        sent = 0
-        failed = 0
+    """
+    Queue a forced newsletter run for the background worker and return
+    at once; progress is polled from `newsletter_run_progress`.
+    """
+    run, created = enqueue_run(force=True, requested_by=request.user)
+    progress_url = reverse("core:newsletter_run_progress", args=[run.pk])
 
-        for line in clean_output.splitlines():
-            if "Done." in line:
-                match_sent = re.search(r"Sent=(\d+)", line)
-                match_failed = re.search(r"Failed=(\d+)", line)
+    if created:
+        message = f"Newsletter queued (run {run.pk})."
+    else:
+        message = f"Newsletter run {run.pk} is already {run.status}."
 
-                if match_sent:
-                    sent = int(match_sent.group(1))
-                if match_failed:
-                    failed = int(match_failed.group(1))
+    return HttpResponse(
+        f"{message} Progress: {progress_url}",
+        status=202,
+    )
 
-        return HttpResponse(
-            (
-                f"Newsletter forced successfully. "
-                f"Sent: {sent}, Failed: {failed}."
-            )
-        )
 
-    except Exception as e:
-        return HttpResponse(
-            f"Newsletter send failed: {e}",
-            status=500,
-        )
+@staff_member_required
+def newsletter_run_progress(request, run_id):
+    run = get_object_or_404(NewsletterRun, pk=run_id)
+    return JsonResponse(run_progress(run))
 
 
 def test_500(request):
@@ -0,0 +1,60 @@
+# customers/management/commands/rebuild_customer_search.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from customers.models import CustomerProfile
+from customers.search import (
+    build_search_document,
+    ensure_search_index,
+    rebuild_search_index,
+)
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every CustomerProfile.search_document and rebuild the "
+        "customer search index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        connection = connections[using]
+        profiles = (
+            CustomerProfile.objects.using(using)
+            .select_related("user")
+            .order_by("pk")
+        )
+
+        changed = 0
+        batch = []
+        with transaction.atomic(using=using):
+            for profile in profiles.iterator(chunk_size=BATCH_SIZE):
+                document = build_search_document(profile, profile.user)
+                if document == profile.search_document:
+                    continue
+                profile.search_document = document
+                batch.append(profile)
+                if len(batch) >= BATCH_SIZE:
+                    CustomerProfile.objects.using(using).bulk_update(
+                        batch, ["search_document"])
+                    changed += len(batch)
+                    batch = []
+            if batch:
+                CustomerProfile.objects.using(using).bulk_update(
+                    batch, ["search_document"])
+                changed += len(batch)
+
+            if not ensure_search_index(connection):
+                rebuild_search_index(connection)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. Documents updated={changed}, "
+                f"index={connection.vendor}"))
@@ -0,0 +1,142 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:01
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copies of the customers.search helpers as of this migration, so
+# later changes to that module cannot change what this migration does.
+# customers.search.ensure_search_index() still runs after every migrate
+# (post_migrate) and brings the index up to the current definition.
+FTS_TABLE = "customers_customerprofile_fts"
+TRGM_INDEX = "customerprofile_search_trgm"
+
+FTS_TRIGGERS = (
+    (
+        f"{FTS_TABLE}_ai",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+        AFTER INSERT ON customers_customerprofile BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, search_document)
+            VALUES (new.id, new.search_document);
+        END
+        """,
+    ),
+    (
+        f"{FTS_TABLE}_ad",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+        AFTER DELETE ON customers_customerprofile BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+        END
+        """,
+    ),
+    (
+        f"{FTS_TABLE}_au",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF search_document ON customers_customerprofile BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+            INSERT INTO {FTS_TABLE}(rowid, search_document)
+            VALUES (new.id, new.search_document);
+        END
+        """,
+    ),
+)
+
+
+def build_search_document(profile, user):
+    phone = profile.phone or ""
+    parts = [
+        user.first_name,
+        user.last_name,
+        user.username,
+        user.email,
+        profile.email,
+        phone,
+        re.sub(r"\D", "", phone),
+        profile.company,
+        profile.billing_street_address,
+        profile.billing_city,
+        profile.billing_state,
+        profile.billing_zipcode,
+        profile.service_street_address,
+        profile.service_city,
+        profile.service_state,
+        profile.service_zipcode,
+    ]
+    text = " ".join(p.strip() for p in parts if p and p.strip())
+    return " ".join(text.lower().split())
+
+
+def fill_search_documents(apps, schema_editor):
+    CustomerProfile = apps.get_model("customers", "CustomerProfile")
+
+    batch = []
+    rows = CustomerProfile.objects.select_related("user").iterator(
+        chunk_size=500)
+    for profile in rows:
+        profile.search_document = build_search_document(profile, profile.user)
+        batch.append(profile)
+        if len(batch) >= 500:
+            CustomerProfile.objects.bulk_update(batch, ["search_document"])
+            batch = []
+    if batch:
+        CustomerProfile.objects.bulk_update(batch, ["search_document"])
+
+
+def install_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("PRAGMA compile_options")
+            if not any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall()):
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "search_document, "
+                "content='customers_customerprofile', "
+                "content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            for _name, sql in FTS_TRIGGERS:
+                cursor.execute(sql)
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == "postgresql":
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} "
+                "ON customers_customerprofile "
+                "USING gin (search_document gin_trgm_ops)"
+            )
+
+
+def remove_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            for name, _sql in FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == "postgresql":
+            cursor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_alter_customerprofile_phone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerprofile',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(install_search_index, remove_search_index),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from customers.search import build_search_document
+
 # Create your models here.
 
 
@@ -47,6 +49,10 @@ class CustomerProfile(models.Model):
     service_zipcode = models.CharField(max_length=20, blank=True)
     service_region = models.CharField(max_length=2, blank=True)
 
+    # Denormalized text behind the staff customer search (see
+    # customers/search.py). Rebuilt on every save.
+    search_document = models.TextField(blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -58,6 +64,14 @@ class CustomerProfile(models.Model):
     def __str__(self) -> str:
         return f"CustomerProfile<{self.user.username}>"
 
+    def save(self, *args, **kwargs):
+        self.search_document = build_search_document(self, self.user)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and (
+                "search_document" not in update_fields):
+            kwargs["update_fields"] = [*update_fields, "search_document"]
+        super().save(*args, **kwargs)
+
     # ── Helpers the views/templates call ──
     def has_valid_billing_address(self) -> bool:
         return all(
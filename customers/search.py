@@ -0,0 +1,248 @@
+"""
+customers/search.py
+Indexed customer search for the staff customer list.
+
+Every CustomerProfile carries a denormalized `search_document`: the
+lower-cased names, username, emails, phone and addresses in one column,
+rebuilt whenever the profile (or its user's name/email) is saved.
+
+The column is indexed per database:
+
+* SQLite - an external-content FTS5 table kept in sync by triggers, so
+  a query is one MATCH ranked by bm25 (`rank`).
+* PostgreSQL - a pg_trgm GIN index on the column; each term is a
+  trigram-indexed substring match, ranked by word similarity.
+* Anything else (or SQLite built without FTS5) - substring matches on
+  the single column, ordered by name.
+
+Terms are ANDed. Pages are fetched with one extra row to tell whether
+there is a next page, so no COUNT(*) runs.
+"""
+from __future__ import annotations
+
+import re
+
+from django.db import connections
+
+FTS_TABLE = "customers_customerprofile_fts"
+TRGM_INDEX = "customerprofile_search_trgm"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+# (trigger name, SQL) for the FTS5 table's external content.
+_FTS_TRIGGERS = (
+    (
+        f"{FTS_TABLE}_ai",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+        AFTER INSERT ON customers_customerprofile BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, search_document)
+            VALUES (new.id, new.search_document);
+        END
+        """,
+    ),
+    (
+        f"{FTS_TABLE}_ad",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+        AFTER DELETE ON customers_customerprofile BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+        END
+        """,
+    ),
+    (
+        f"{FTS_TABLE}_au",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF search_document ON customers_customerprofile BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+            INSERT INTO {FTS_TABLE}(rowid, search_document)
+            VALUES (new.id, new.search_document);
+        END
+        """,
+    ),
+)
+
+
+def build_search_document(profile, user) -> str:
+    """
+    The text indexed for one customer. Takes plain attribute holders so
+    migrations can call it with historical models.
+    """
+    phone = profile.phone or ""
+    parts = [
+        user.first_name,
+        user.last_name,
+        user.username,
+        user.email,
+        profile.email,
+        phone,
+        re.sub(r"\D", "", phone),
+        profile.company,
+        profile.billing_street_address,
+        profile.billing_city,
+        profile.billing_state,
+        profile.billing_zipcode,
+        profile.service_street_address,
+        profile.service_city,
+        profile.service_state,
+        profile.service_zipcode,
+    ]
+    text = " ".join(p.strip() for p in parts if p and p.strip())
+    return " ".join(text.lower().split())
+
+
+def search_terms(query: str) -> list[str]:
+    """Lower-cased word terms, split the way the FTS5 tokenizer splits."""
+    return _TERM_RE.findall((query or "").lower())
+
+
+# ---------------------------------------------------------------------
+# Index installation
+# ---------------------------------------------------------------------
+def fts5_available(connection) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(
+            row[0] == "ENABLE_FTS5" for row in cursor.fetchall())
+
+
+def _sqlite_objects(connection, kind):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = %s", [kind])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def ensure_search_index(connection) -> bool:
+    """
+    Create whatever part of the search index is missing on `connection`
+    and (re)fill it. Returns True if anything was created.
+
+    Idempotent; runs from the customers migration and after every
+    `migrate`, because SQLite's table rebuilds drop the triggers.
+    """
+    table = "customers_customerprofile"
+    with connection.cursor() as cursor:
+        if table not in connection.introspection.table_names(cursor):
+            return False
+        columns = connection.introspection.get_table_description(
+            cursor, table)
+    if "search_document" not in {c.name for c in columns}:
+        return False  # migrated back to before the column existed
+
+    if connection.vendor == "sqlite":
+        if not fts5_available(connection):
+            return False
+        created = False
+        with connection.cursor() as cursor:
+            if FTS_TABLE not in _sqlite_objects(connection, "table"):
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    "search_document, "
+                    "content='customers_customerprofile', "
+                    "content_rowid='id', "
+                    "tokenize='unicode61 remove_diacritics 2')"
+                )
+                created = True
+            triggers = _sqlite_objects(connection, "trigger")
+            for name, sql in _FTS_TRIGGERS:
+                if name not in triggers:
+                    cursor.execute(sql)
+                    created = True
+            if created:
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        return created
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [TRGM_INDEX])
+            if cursor.fetchone()[0] is not None:
+                return False
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX {TRGM_INDEX} ON customers_customerprofile "
+                "USING gin (search_document gin_trgm_ops)"
+            )
+        return True
+
+    return False
+
+
+def drop_search_index(connection):
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            for name, _sql in _FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+
+
+def rebuild_search_index(connection):
+    """Refill the FTS5 table from the column (no-op elsewhere)."""
+    if (connection.vendor == "sqlite"
+            and FTS_TABLE in _sqlite_objects(connection, "table")):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+# ---------------------------------------------------------------------
+# Querying
+# ---------------------------------------------------------------------
+def _fts_match(terms) -> str:
+    # Each term is quoted (no FTS syntax leaks through) and prefix-matched.
+    return " AND ".join(
+        '"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _ranked_fts_ids(connection, terms, offset, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            "ORDER BY rank LIMIT %s OFFSET %s",
+            [_fts_match(terms), limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_customers(query, *, offset=0, limit=12, using="default"):
+    """
+    Up to `limit` CustomerProfiles matching every term of `query`, best
+    match first, skipping the first `offset` matches.
+    """
+    from .models import CustomerProfile
+
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    connection = connections[using]
+    profiles = CustomerProfile.objects.using(using).select_related("user")
+    names = ("user__last_name", "user__first_name", "user__username")
+
+    if (connection.vendor == "sqlite"
+            and FTS_TABLE in _sqlite_objects(connection, "table")):
+        ids = _ranked_fts_ids(connection, terms, offset, limit)
+        found = profiles.in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
+
+    for term in terms:
+        profiles = profiles.filter(search_document__contains=term)
+
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        profiles = profiles.annotate(
+            search_rank=TrigramWordSimilarity(
+                " ".join(terms), "search_document"),
+        ).order_by("-search_rank", *names)
+    else:
+        profiles = profiles.order_by(*names)
+
+    return list(profiles[offset:offset + limit])
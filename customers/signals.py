@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import CustomerProfile
+from .search import build_search_document, ensure_search_index
+
+# User fields that end up in CustomerProfile.search_document.
+SEARCHED_USER_FIELDS = {"first_name", "last_name", "username", "email"}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_customer_search_document(sender, instance, created, raw,
+                                     update_fields=None, **kwargs):
+    """Keep the profile's search text current when the user is renamed."""
+    if created or raw:
+        return
+    if update_fields is not None and not (
+            SEARCHED_USER_FIELDS & set(update_fields)):
+        return  # e.g. the last_login update on every sign-in
+
+    profile = CustomerProfile.objects.filter(user=instance).first()
+    if profile is None:
+        return
+    document = build_search_document(profile, instance)
+    if document != profile.search_document:
+        CustomerProfile.objects.filter(pk=profile.pk).update(
+            search_document=document)
+
+
+def install_search_index(sender, using="default", **kwargs):
+    """SQLite table rebuilds during migrate drop the FTS triggers."""
+    from django.db import connections
+
+    ensure_search_index(connections[using])
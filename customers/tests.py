@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from customers.models import CustomerProfile
+from customers.search import search_customers
+
+User = get_user_model()
+
+
+class CustomerSearchSyncTests(TestCase):
+    """The search index follows renames, profile edits and deletes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "hbramble", "hank@example.com",
+            first_name="Hank", last_name="Bramble")
+        self.profile = CustomerProfile.objects.create(
+            user=self.user,
+            email="hank@example.com",
+            phone="(214) 555-0142",
+            service_city="Plano",
+        )
+
+    def found(self, query):
+        return [p.pk for p in search_customers(query)]
+
+    def test_profile_is_searchable_by_name_phone_and_city(self):
+        for query in ("bramble", "Hank Bram", "2145550142", "plano"):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [self.profile.pk])
+        self.assertEqual(self.found("bramble frisco"), [])
+
+    def test_renaming_the_user_updates_the_index(self):
+        self.user.last_name = "Thornbury"
+        self.user.save()
+
+        self.assertEqual(self.found("thornbury"), [self.profile.pk])
+        self.assertEqual(self.found("bramble"), [])
+
+    def test_editing_the_profile_updates_the_index(self):
+        self.profile.service_city = "Frisco"
+        self.profile.save(update_fields=["service_city"])
+
+        self.assertEqual(self.found("frisco"), [self.profile.pk])
+        self.assertEqual(self.found("plano"), [])
+
+    def test_deleted_customers_drop_out_of_the_index(self):
+        self.profile.delete()
+        self.assertEqual(self.found("bramble"), [])
+
+        other = User.objects.create_user("tbramble", "t@example.com")
+        CustomerProfile.objects.create(
+            user=other, email="t@example.com", phone="0")
+        other.delete()
+        self.assertEqual(self.found("tbramble"), [])
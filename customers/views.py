@@ -6,18 +6,19 @@ from django.contrib import messages
 from django.contrib.auth import get_backends, login
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.core.paginator import Paginator
-from django.db.models import Q
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
 from billing.utils import merge_session_cart
 from customers.models import CustomerProfile
+from customers.search import search_customers
 from core.decorators import verified_email_required
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+CUSTOMER_LIST_PAGE_SIZE = 12
+
 
 def superuser_required(user):
     return user.is_authenticated and user.is_superuser
@@ -46,43 +47,45 @@ def profile_view(request):
 # ============================================================
 @user_passes_test(superuser_required)
 def customer_list(request):
+    """
+    Staff customer directory. With `q`, results come from the search
+    index ranked best-first (customers/search.py); without it, by name.
+    Pages are fetched one row long instead of counting every match.
+    """
     query = request.GET.get("q", "").strip()
-
-    customers = CustomerProfile.objects.select_related("user").all().order_by(
-        "user__last_name",
-        "user__first_name",
-        "user__username",
-    )
+    page_size = CUSTOMER_LIST_PAGE_SIZE
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except (TypeError, ValueError):
+        page = 1
+    offset = (page - 1) * page_size
 
     if query:
-        customers = customers.filter(
-            Q(user__first_name__icontains=query)
-            | Q(user__last_name__icontains=query)
-            | Q(user__username__icontains=query)
-            | Q(email__icontains=query)
-            | Q(phone__icontains=query)
-            | Q(company__icontains=query)
-            | Q(billing_street_address__icontains=query)
-            | Q(billing_city__icontains=query)
-            | Q(billing_state__icontains=query)
-            | Q(billing_zipcode__icontains=query)
-            | Q(service_street_address__icontains=query)
-            | Q(service_city__icontains=query)
-            | Q(service_state__icontains=query)
-            | Q(service_zipcode__icontains=query)
+        customers = search_customers(
+            query, offset=offset, limit=page_size + 1)
+    else:
+        customers = list(
+            CustomerProfile.objects.select_related("user").order_by(
+                "user__last_name",
+                "user__first_name",
+                "user__username",
+            )[offset:offset + page_size + 1]
         )
 
-    paginator = Paginator(customers, 12)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    has_next = len(customers) > page_size
+    customers = customers[:page_size]
 
     return render(
         request,
         "customers/customer_list.html",
         {
-            "customers": page_obj,
-            "page_obj": page_obj,
+            "customers": customers,
             "query": query,
+            "page": page,
+            "has_previous": page > 1,
+            "has_next": has_next,
+            "start_index": offset + 1,
+            "end_index": offset + len(customers),
         },
     )
 
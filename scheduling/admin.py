@@ -1,6 +1,15 @@
 # scheduling/admin.py
 from django.contrib import admin
-from .models import ServiceCategory, TimeSlot, Employee, Booking, JobAssignment
+
+from core.admin_utils import LargeTableAdminMixin
+from .models import (
+    ServiceCategory,
+    TimeSlot,
+    Employee,
+    Booking,
+    JobAssignment,
+    SlotHold,
+)
 
 
 # Read-only mixin for staff views
@@ -23,10 +32,10 @@ class ServiceCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(TimeSlot)
 class TimeSlotAdmin(admin.ModelAdmin):
-    # label-only slots (e.g., "7:30-9:30")
-    list_display = ("id", "label")
+    # start/end times are filled from the label when left blank
+    list_display = ("id", "label", "start_time", "end_time")
     search_fields = ("label",)
-    ordering = ("label",)
+    ordering = ("start_time", "label")
 
 
 class JobAssignmentInline(admin.TabularInline):
@@ -40,21 +49,36 @@ class JobAssignmentInline(admin.TabularInline):
     autocomplete_fields = ("booking",)
     show_change_link = True
 
+    def get_queryset(self, request):
+        # JobAssignment.__str__ (shown per row) reads the employee and
+        # the booking's time slot.
+        return super().get_queryset(request).select_related(
+            "employee", "booking__time_slot")
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # The autocomplete widget renders each selected Booking's
+        # __str__, which touches user, category and time slot.
+        if db_field.name == "booking":
+            kwargs["queryset"] = Booking.objects.select_related(
+                "user", "service_category", "time_slot")
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
 
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "service_category", "home_address")
     list_filter = ("service_category",)
+    list_select_related = ("service_category",)
     search_fields = ("name", "home_address")
     inlines = [JobAssignmentInline]
 
 
 @admin.register(Booking)
-class BookingAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+class BookingAdmin(ReadOnlyAdminMixin, LargeTableAdminMixin,
+                   admin.ModelAdmin):
     """
-    Keep this aligned with label-only TimeSlot:
-    - do NOT reference start_time / end_time anywhere
-    - only use fields that actually exist on your uploaded model
+    `starts_at` is derived from date + TimeSlot.start_time on save,
+    so it is read-only here.
     """
     list_display = (
         "id",
@@ -62,11 +86,21 @@ class BookingAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
         "service_category",
         "date",
         "time_slot",
+        "starts_at",
         "status",
         "total_amount",
     )
     list_filter = ("status", "service_category", "date")
+    list_select_related = ("user", "service_category", "time_slot")
     search_fields = ("user__username", "service_address")
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("created_at", "updated_at", "starts_at")
     autocomplete_fields = ("user", "service_category", "time_slot", "employee")
     raw_id_fields = ("primary_payment_record",)
+
+
+@admin.register(SlotHold)
+class SlotHoldAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "employee", "date", "time_slot", "expires_at",
+                    "created_at")
+    list_filter = ("date",)
+    list_select_related = ("employee", "time_slot")
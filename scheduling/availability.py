@@ -6,7 +6,7 @@ import requests
 from django.conf import settings
 from django.core.cache import cache
 
-from .models import Booking, Employee, JobAssignment
+from .models import Booking, Employee, JobAssignment, SlotHold
 
 logger = logging.getLogger(__name__)
 
@@ -125,7 +125,8 @@ def get_available_employees(customer_address, date, time_slot,
     Important booking integrity rule:
     - An employee is NOT available if they already have:
       1) a JobAssignment for this exact date/slot, OR
-      2) a live Booking for this exact date/slot
+      2) a live Booking for this exact date/slot, OR
+      3) an unexpired SlotHold from a cart for this exact date/slot
 
     This prevents already-paid slots from reappearing in fresh searches.
     """
@@ -152,25 +153,31 @@ def get_available_employees(customer_address, date, time_slot,
     # -------------------------------------------------
     # 1) Precompute employees already blocked in this exact slot
     # -------------------------------------------------
-    # Source A: employees already assigned to a booking in this slot
+    # One UNION query over every source that blocks the slot:
+    #   A) a JobAssignment for a booking in this slot
+    #   B) a live Booking, even if no JobAssignment exists yet
+    #   C) an unexpired SlotHold from someone's cart
     booked_employee_ids = set(
         JobAssignment.objects.filter(
             employee_id__in=employee_ids,
             booking__date=date,
             booking__time_slot=time_slot,
-        ).values_list("employee_id", flat=True)
-    )
-
-    # Source B: employees already sold/booked in this slot, even if a
-    # JobAssignment record has not yet been created.
-    booked_employee_ids.update(
-        Booking.objects.filter(
-            employee_id__in=employee_ids,
-            date=date,
-            time_slot=time_slot,
+        ).order_by().values_list("employee_id", flat=True)
+        .union(
+            Booking.objects.filter(
+                employee_id__in=employee_ids,
+                date=date,
+                time_slot=time_slot,
+            )
+            .exclude(status="Cancelled")
+            .order_by()
+            .values_list("employee_id", flat=True),
+            SlotHold.objects.active().filter(
+                employee_id__in=employee_ids,
+                date=date,
+                time_slot=time_slot,
+            ).order_by().values_list("employee_id", flat=True),
         )
-        .exclude(status__iexact="Cancelled")
-        .values_list("employee_id", flat=True)
     )
 
     # -------------------------------------------------
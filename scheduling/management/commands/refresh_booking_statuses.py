@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from scheduling.models import Booking
+
+
+class Command(BaseCommand):
+    help = (
+        "Move bookings between Booked and Completed for all users with two "
+        "set-based UPDATEs. Run periodically (e.g. hourly from the "
+        "platform scheduler); page views no longer do this."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many bookings would change.",
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+
+        if options["dry_run"]:
+            # Roll back the UPDATEs; counts come from the same statements.
+            with transaction.atomic():
+                completed, reopened = Booking.objects.refresh_statuses(today)
+                transaction.set_rollback(True)
+        else:
+            completed, reopened = Booking.objects.refresh_statuses(today)
+
+        mode = "DRY RUN" if options["dry_run"] else "APPLIED"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done ({mode}). Completed={completed} Reopened={reopened}"
+            )
+        )
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def cancel_duplicate_bookings(apps, schema_editor):
+    """
+    Keep the first live booking per (employee, date, slot) and cancel
+    the later ones, so the unique constraint below can be added. The
+    cancelled ids are printed: their payments need a manual refund.
+    """
+    Booking = apps.get_model("scheduling", "Booking")
+
+    duplicated = (
+        Booking.objects.exclude(status="Cancelled")
+        .filter(employee__isnull=False)
+        .values("employee_id", "date", "time_slot_id")
+        .annotate(n=models.Count("id"))
+        .filter(n__gt=1)
+    )
+    cancelled = []
+    for slot in duplicated.iterator():
+        ids = list(
+            Booking.objects.exclude(status="Cancelled")
+            .filter(
+                employee_id=slot["employee_id"],
+                date=slot["date"],
+                time_slot_id=slot["time_slot_id"],
+            )
+            .order_by("created_at", "pk")
+            .values_list("pk", flat=True)
+        )
+        cancelled.extend(ids[1:])
+
+    if cancelled:
+        Booking.objects.filter(pk__in=cancelled).update(status="Cancelled")
+        print(
+            f"\n  Cancelled {len(cancelled)} double-booked booking(s); "
+            f"refund their payments by hand: {sorted(cancelled)}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0009_stripewebhookevent'),
+        ('scheduling', '0003_jobassignment_scheduling__employe_a488b8_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(
+            cancel_duplicate_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'Cancelled'), _negated=True), fields=('employee', 'date', 'time_slot'), name='unique_active_booking_per_slot'),
+        ),
+        migrations.AddField(
+            model_name='slothold',
+            name='cart_item',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='slot_hold', to='billing.cartitem'),
+        ),
+        migrations.AddField(
+            model_name='slothold',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='scheduling.employee'),
+        ),
+        migrations.AddField(
+            model_name='slothold',
+            name='time_slot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='scheduling.timeslot'),
+        ),
+        migrations.AddIndex(
+            model_name='slothold',
+            index=models.Index(fields=['date', 'time_slot', 'expires_at'], name='scheduling__date_cf8beb_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='slothold',
+            constraint=models.UniqueConstraint(fields=('employee', 'date', 'time_slot'), name='unique_slot_hold'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:45
+
+import re
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Frozen copy of scheduling.models.parse_slot_label as of this migration,
+# so later changes to the model code cannot change what it backfills.
+def parse_slot_label(label):
+    parts = re.split(r"\s*[–-]\s*", (label or "").strip())
+    times = []
+    for part in parts[:2]:
+        match = re.fullmatch(r"(\d{1,2})(?::(\d{2}))?", part)
+        if not match:
+            # Unparseable: left NULL. Such bookings have no start time
+            # and show as "Locked" (the old code assumed midnight).
+            times.append(None)
+            continue
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        # Labels are 12-hour without am/pm and the day starts at 7:00,
+        # so "1:00" to "6:59" are afternoon times.
+        if hour < 7:
+            hour += 12
+        times.append(time(hour, minute) if hour < 24 and minute < 60
+                     else None)
+    times += [None] * (2 - len(times))
+    return times[0], times[1]
+
+
+def backfill_slot_times(apps, schema_editor):
+    TimeSlot = apps.get_model("scheduling", "TimeSlot")
+    Booking = apps.get_model("scheduling", "Booking")
+
+    slot_starts = {}
+    for slot in TimeSlot.objects.all():
+        slot.start_time, slot.end_time = parse_slot_label(slot.label)
+        slot.save(update_fields=["start_time", "end_time"])
+        slot_starts[slot.pk] = slot.start_time
+
+    tz = timezone.get_current_timezone()
+    batch = []
+    for booking in Booking.objects.only("id", "date", "time_slot_id").iterator():
+        start_time = slot_starts.get(booking.time_slot_id)
+        if start_time is None:
+            continue
+        booking.starts_at = timezone.make_aware(
+            datetime.combine(booking.date, start_time), tz)
+        batch.append(booking)
+        if len(batch) >= 1000:
+            Booking.objects.bulk_update(batch, ["starts_at"])
+            batch = []
+    if batch:
+        Booking.objects.bulk_update(batch, ["starts_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0004_slothold_booking_unique_active_booking_per_slot_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='timeslot',
+            options={'ordering': ['start_time', 'id']},
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='starts_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Aware start of the booking (date + slot start time).', null=True),
+        ),
+        migrations.AddField(
+            model_name='timeslot',
+            name='end_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='timeslot',
+            name='start_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_slot_times, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0005_alter_timeslot_options_booking_starts_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'starts_at'], name='scheduling__status_eda4f6_idx'),
+        ),
+    ]
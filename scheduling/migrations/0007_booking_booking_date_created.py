@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0006_booking_scheduling__status_eda4f6_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['-date', '-created_at'], name='booking_date_created'),
+        ),
+    ]
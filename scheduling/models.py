@@ -1,9 +1,47 @@
-from datetime import datetime
+import re
+from datetime import datetime, time, timedelta
+from django.utils import timezone
 from django.utils.timezone import now
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 from decimal import Decimal
 
+# Slot labels use a 12-hour clock without am/pm ("3:00–5:00"). The working
+# day starts at 7:00, so any hour below this is an afternoon time.
+SLOT_DAY_START_HOUR = 7
+
+# Refund tiers by lead time before a booking starts (see
+# billing.utils.get_refund_policy).
+FULL_REFUND_HOURS = 72
+
+
+def parse_slot_label(label):
+    """
+    Return (start_time, end_time) for a label like '7:30–9:30'.
+    Either value is None when that part cannot be parsed.
+
+    A None start means the booking has no start time: refunds treat it as
+    "Locked" (see billing.utils.get_refund_policy), where the old label
+    parsing in the cancel view fell back to midnight of the booking date.
+    """
+    parts = re.split(r"\s*[–-]\s*", (label or "").strip())
+    times = []
+    for part in parts[:2]:
+        match = re.fullmatch(r"(\d{1,2})(?::(\d{2}))?", part)
+        if not match:
+            times.append(None)
+            continue
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        # No am/pm in labels: "3:00" can only mean 3 PM in a day that
+        # starts at 7:00. A slot starting before 7 AM would need a label
+        # format that says so.
+        if hour < SLOT_DAY_START_HOUR:
+            hour += 12
+        times.append(time(hour, minute) if hour < 24 and minute < 60
+                     else None)
+    times += [None] * (2 - len(times))
+    return times[0], times[1]
+
 
 class ServiceCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -14,10 +52,22 @@ class ServiceCategory(models.Model):
 
 class TimeSlot(models.Model):
     label = models.CharField(max_length=20, unique=True)  # e.g., "7:30-9:30"
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["start_time", "id"]
 
     def __str__(self):
         return self.label
 
+    def save(self, *args, **kwargs):
+        if self.start_time is None or self.end_time is None:
+            start, end = parse_slot_label(self.label)
+            self.start_time = self.start_time or start
+            self.end_time = self.end_time or end
+        super().save(*args, **kwargs)
+
 
 class Employee(models.Model):
     name = models.CharField(max_length=100)
@@ -78,6 +128,51 @@ class Employee(models.Model):
         return None
 
 
+class BookingQuerySet(models.QuerySet):
+    def upcoming(self, at=None):
+        return self.filter(starts_at__gt=at or now())
+
+    def with_refund_tier(self, at=None):
+        """
+        Annotate `refund_pct` (100 / 50 / 0) from `starts_at` in SQL,
+        matching billing.utils.get_refund_policy().
+        """
+        at = at or now()
+        return self.annotate(
+            refund_pct=models.Case(
+                models.When(
+                    starts_at__gte=at + timedelta(hours=FULL_REFUND_HOURS),
+                    then=models.Value(100),
+                ),
+                models.When(starts_at__gt=at, then=models.Value(50)),
+                default=models.Value(0),
+                output_field=models.IntegerField(),
+            )
+        )
+
+    def refresh_statuses(self, today=None):
+        """
+        Flip Booked -> Completed for bookings on past days and
+        Completed -> Booked for any that are (again) today or later.
+        Two set-based UPDATEs over the (status, starts_at) index;
+        cancelled bookings are never touched. Returns (completed, reopened).
+        """
+        today = today or timezone.localdate()
+        cutoff = timezone.make_aware(
+            datetime.combine(today, time.min),
+            timezone.get_current_timezone(),
+        )
+        past = models.Q(starts_at__lt=cutoff) | models.Q(
+            starts_at__isnull=True, date__lt=today)
+        stamp = now()
+
+        completed = self.filter(past, status="Booked").update(
+            status="Completed", updated_at=stamp)
+        reopened = self.filter(status="Completed").exclude(past).update(
+            status="Booked", updated_at=stamp)
+        return completed, reopened
+
+
 class Booking(models.Model):
     """
     Represents one booked service line item.
@@ -125,6 +220,12 @@ class Booking(models.Model):
         max_length=20, choices=STATUS_CHOICES, default="Booked")
     created_at = models.DateTimeField(default=now)
     updated_at = models.DateTimeField(auto_now=True)
+    starts_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Aware start of the booking (date + slot start time).",
+    )
 
     primary_payment_record = models.ForeignKey(
         "billing.PaymentHistory",
@@ -140,9 +241,24 @@ class Booking(models.Model):
         indexes = [
             models.Index(fields=["user", "date"]),
             models.Index(fields=["status"]),
+            models.Index(fields=["status", "starts_at"]),
+            # Admin changelist default ordering and date filter.
+            models.Index(fields=["-date", "-created_at"],
+                         name="booking_date_created"),
+        ]
+        constraints = [
+            # One live booking per employee and slot; enforced by the
+            # database so concurrent checkouts cannot double-book.
+            models.UniqueConstraint(
+                fields=["employee", "date", "time_slot"],
+                condition=~models.Q(status="Cancelled"),
+                name="unique_active_booking_per_slot",
+            ),
         ]
         ordering = ["-date", "-created_at"]
 
+    objects = BookingQuerySet.as_manager()
+
     def __str__(self):
         return (
             f"{self.user.username if self.user else 'Anonymous'} — "
@@ -167,23 +283,30 @@ class Booking(models.Model):
 
     @property
     def datetime_start(self):
-        """
-        Safe helper when TimeSlot has only a label like '7:30-9:30'.
-        Parses the first time in the label; returns None on failure.
-        """
-        try:
-            label = (self.time_slot.label or "").strip()  # e.g., "7:30-9:30"
-            start_part = label.split("-")[0].strip()      # "7:30"
-            # Try HH:MM, fall back to HH if needed
-            for fmt in ("%H:%M", "%I:%M", "%H", "%I"):
-                try:
-                    t = datetime.strptime(start_part, fmt).time()
-                    return datetime.combine(self.date, t)
-                except ValueError:
-                    continue
-            return None
-        except Exception:
+        """Aware start datetime; None when the slot has no start time."""
+        if self.starts_at is None and self.date and self.time_slot_id:
+            self.starts_at = Booking.start_for(self.date, self.time_slot)
+        return self.starts_at
+
+    @staticmethod
+    def start_for(date, time_slot):
+        """Aware start of a booking on `date` in `time_slot`."""
+        start_time = getattr(time_slot, "start_time", None)
+        if date is None or start_time is None:
             return None
+        return timezone.make_aware(
+            datetime.combine(date, start_time),
+            timezone.get_current_timezone(),
+        )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"date", "time_slot"} & set(
+                update_fields):
+            self.starts_at = Booking.start_for(self.date, self.time_slot)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "starts_at"}
+        super().save(*args, **kwargs)
 
 
 class JobAssignment(models.Model):
@@ -208,3 +331,82 @@ class JobAssignment(models.Model):
             f"({self.booking.time_slot})"
 
         )
+
+
+class SlotHoldManager(models.Manager):
+    def active(self):
+        return self.filter(expires_at__gt=now())
+
+    def acquire(self, cart_item, minutes=None):
+        """
+        Reserve the cart item's (employee, date, slot) until the TTL runs
+        out, or refresh the item's existing hold. Returns False when
+        another cart holds the slot; the unique constraint decides.
+        """
+        minutes = minutes or getattr(settings, "SLOT_HOLD_MINUTES", 15)
+        current = now()
+        slot = {
+            "employee_id": cart_item.employee_id,
+            "date": cart_item.date,
+            "time_slot_id": cart_item.time_slot_id,
+        }
+
+        with transaction.atomic():
+            # An expired hold on this slot no longer blocks anyone.
+            self.filter(**slot, expires_at__lte=current).exclude(
+                cart_item=cart_item).delete()
+            try:
+                with transaction.atomic():
+                    self.update_or_create(
+                        cart_item=cart_item,
+                        defaults={
+                            **slot,
+                            "expires_at": current + timedelta(minutes=minutes),
+                        },
+                    )
+            except IntegrityError:
+                return False
+        return True
+
+    def extend_for_cart(self, cart, minutes=None):
+        """Push out the expiry of every hold in a cart (e.g. at checkout)."""
+        minutes = minutes or getattr(settings, "SLOT_HOLD_MINUTES", 15)
+        return self.filter(cart_item__cart=cart).update(
+            expires_at=now() + timedelta(minutes=minutes))
+
+
+class SlotHold(models.Model):
+    """
+    Temporary reservation of an employee's slot by a cart item.
+    Deleted with the cart item; expired holds are ignored and replaced.
+    """
+
+    cart_item = models.OneToOneField(
+        "billing.CartItem",
+        on_delete=models.CASCADE,
+        related_name="slot_hold",
+    )
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    date = models.DateField()
+    time_slot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SlotHoldManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["employee", "date", "time_slot"],
+                name="unique_slot_hold",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["date", "time_slot", "expires_at"]),
+        ]
+
+    def __str__(self):
+        return (
+            f"Hold {self.employee} {self.date} {self.time_slot} "
+            f"until {self.expires_at:%H:%M}"
+        )
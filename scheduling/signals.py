@@ -49,6 +49,7 @@ def attach_session_cart_to_user(sender, request, user, **kwargs):
                 defaults={"unit_price": it.unit_price,
                           "quantity": it.quantity},
             )
+        user_cart.touch()
 
         # Remove the old session cart
         session_cart.delete()
@@ -320,6 +320,20 @@ STRIPE_PUBLISHABLE_KEY = env("STRIPE_PUBLISHABLE_KEY", default="")
 STRIPE_SECRET_KEY = env("STRIPE_SECRET_KEY", default="")
 STRIPE_WEBHOOK_SECRET = env("STRIPE_WEBHOOK_SECRET", default="")
 STRIPE_CURRENCY = env("STRIPE_CURRENCY", default="usd")
+# Outbound Stripe client (billing/gateway.py). Set STRIPE_API_BASE to a
+# stripe-mock URL such as http://localhost:12111 for tests/benchmarks.
+STRIPE_API_BASE = env("STRIPE_API_BASE", default="")
+STRIPE_MAX_RETRIES = env.int("STRIPE_MAX_RETRIES", default=2)
+STRIPE_TIMEOUT = env.int("STRIPE_TIMEOUT", default=30)
+STRIPE_HTTP_POOL_SIZE = env.int("STRIPE_HTTP_POOL_SIZE", default=10)
+
+# Minutes a slot stays reserved for a cart before others can take it.
+SLOT_HOLD_MINUTES = env.int("SLOT_HOLD_MINUTES", default=15)
+
+# Yearly summaries covering more payment chains than this are rendered
+# by `process_document_jobs` instead of inside the request.
+YEARLY_SUMMARY_INLINE_CHAINS = env.int(
+    "YEARLY_SUMMARY_INLINE_CHAINS", default=50)
 
 GOOGLE_MAPS_API_KEY = env("GOOGLE_MAPS_API_KEY", default="")
 GOOGLE_MAPS_BROWSER_KEY = env("GOOGLE_MAPS_BROWSER_KEY", default="")